@@ -0,0 +1,52 @@
+"""
+Measures how long a fresh process takes before it can answer internal metadata
+lookups, comparing the compiled memory-mapped snapshot with reading the sqlite
+database. Each sample runs in its own interpreter so nothing is cached.
+
+Run from the root of the repository:
+    python scripts/benchmarks/internal_metadata_startup.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+SAMPLE = """
+import time
+from swarmstar.utils.database import internal
+from swarmstar.utils.database.compiled_metadata import CompiledMetadata, compile_metadata
+
+start = time.perf_counter()
+if "{source}" == "compiled":
+    snapshot = internal.InternalMetadataSnapshot(internal._map_compiled_metadata())
+else:
+    snapshot = internal.InternalMetadataSnapshot(
+        CompiledMetadata(compile_metadata(internal.load_internal_metadata_from_sqlite()))
+    )
+loaded = time.perf_counter()
+for category in ("action_metadata", "memory_metadata"):
+    for key in snapshot._compiled.table(category):
+        snapshot.get(category, key)
+        snapshot.option_text(category, key)
+done = time.perf_counter()
+print(loaded - start, done - loaded)
+"""
+
+def sample(source: str) -> tuple:
+    env = dict(os.environ, SWARMSTAR_DATABASE="local", PYTHONPATH=os.getcwd())
+    output = subprocess.run(
+        [sys.executable, "-c", SAMPLE.format(source=source)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    load_time, lookup_time = output.split()
+    return float(load_time), float(lookup_time)
+
+def main(runs: int) -> None:
+    for source in ("compiled", "sqlite"):
+        samples = [sample(source) for _ in range(runs)]
+        load_ms = statistics.median(s[0] for s in samples) * 1000
+        lookup_ms = statistics.median(s[1] for s in samples) * 1000
+        print(f"{source:>8}: load {load_ms:.3f} ms, lookups {lookup_ms:.3f} ms (median of {runs})")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,14 @@
+"""
+Compiles the internal metadata sqlite database into swarmstar/internal_metadata.bin,
+the memory-mappable snapshot swarmstar loads at startup. Fails without writing if
+any node of the database is missing from the compiled file.
+
+update_internal_metadata.py rebuilds the sqlite database from the metadata trees
+and runs this, so run that after changing either tree. Run from the root of the
+repository:
+    python scripts/compile_internal_metadata.py
+"""
+from swarmstar.utils.database.internal import compile_internal_metadata
+
+if __name__ == "__main__":
+    compile_internal_metadata()
@@ -2,6 +2,8 @@ import sqlite3
 import json
 import os
 
+from swarmstar.utils.database.internal import compile_internal_metadata
+
 def create_or_open_kv_db(sqlite3_db_path: str, table_name: str) -> None:
     try:
         conn = sqlite3.connect(sqlite3_db_path)
@@ -39,4 +41,6 @@ memory_json_path = 'swarmstar/memory/memory_metadata_tree.json'
 action_json_path = 'swarmstar/actions/action_metadata_tree.json'
 
 move_json_to_sqlite3(action_json_path, sqlite3_db_path, "action_metadata")
-move_json_to_sqlite3(memory_json_path, sqlite3_db_path, "memory_metadata")
\ No newline at end of file
+move_json_to_sqlite3(memory_json_path, sqlite3_db_path, "memory_metadata")
+
+compile_internal_metadata()
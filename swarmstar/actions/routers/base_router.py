@@ -5,15 +5,18 @@ This is a base class to easily create routers over any MetadataTree,
 starting from any chosen root node.
 """
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from abc import ABC, abstractmethod
 
 from swarmstar.models.base_action import BaseAction
 from swarmstar.models import (
     BlockingOperation,
-    BaseNode
+    BaseNode,
+    NodeRef
 )
 from swarmstar.utils.ai.instructor_models import NextPath
+from swarmstar.utils.database import get_internal_metadata_snapshot
+from swarmstar.utils.database.compiled_metadata import render_options
 
 
 class BaseMetadataTreeRouter(BaseAction, BaseModel, ABC):
@@ -29,8 +32,8 @@ class BaseMetadataTreeRouter(BaseAction, BaseModel, ABC):
         """ This function repeatedly gets called until we reach a leaf node. """
         children_ids = context["children_ids"]
         if completion.index is not None:
-            next_node = BaseNode.read(children_ids[completion.index])
-            if next_node.is_folder:
+            next_node = BaseNode.read(children_ids[completion.index], fields=["is_folder"])
+            if next_node.get("is_folder"):
                 return self.route(next_node.id)
             else:
                 return self.handle_route_success(next_node.id)
@@ -48,11 +51,9 @@ class BaseMetadataTreeRouter(BaseAction, BaseModel, ABC):
         pass
 
     def route(self, node_id: str):
-        node = BaseNode.read(node_id)
-        children = self._get_children(node)
-        children_ids = [child.id for child in children]
-        children_descriptions = self._get_children_descriptions(children)
-        message = self._build_message(children_descriptions)
+        node = BaseNode.read_ref(node_id)
+        children_ids, options = self._get_options(node)
+        message = self._build_message(options)
         return BlockingOperation(
             node_id=self.node.id,
             blocking_type="instructor_completion",
@@ -61,17 +62,28 @@ class BaseMetadataTreeRouter(BaseAction, BaseModel, ABC):
             next_function_to_call="handle_routing_decision"
         )
 
-    def _get_children(self, node: BaseNode) -> List[BaseNode]:
-        """ Get the children of a node from the database. """
-        children = []
-        for child_id in node.children_ids:
-            children.append(BaseNode.read(child_id))
-        return children
+    def _get_options(self, node: NodeRef) -> Tuple[List[str], str]:
+        """
+        The ids of a node's children and the numbered options presenting them.
 
-    def _build_message(self, children: List[BaseNode]) -> str:
+        Internal folders that aren't portals never change, so their options were rendered
+        when the internal metadata was compiled. For anything else the children's names
+        and descriptions are read from the database in one batch.
+        """
+        if not node.children_ids:
+            return [], ""
+        node_class = BaseNode.import_node_class(node.children_ids[0])
+        if node.internal and not node.portal:
+            snapshot = get_internal_metadata_snapshot()
+            option_text = snapshot.option_text(node_class.collection, node.id)
+            if option_text is not None:
+                children_ids = [c for c in node.children_ids if snapshot.has(node_class.collection, c)]
+                return children_ids, option_text
+        children = node_class.batch_read(node.children_ids, fields=["name", "description"])
+        return node.children_ids, render_options(child.model_dump() for child in children)
+
+    def _build_message(self, options: str) -> str:
         """ Get the descriptions of the children of a node. """
-        options = [f"{i}. {child.name}: {child.description}" for i, child in enumerate(children)]
-        options = "\n".join(options)
         message = self.node.message
         return (
             f"{self.ROUTE_INSTRUCTIONS}\n\n"
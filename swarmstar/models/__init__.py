@@ -1,8 +1,13 @@
-from .base_node import BaseNode
+from .base_node import BaseNode, NodeRef, NodeView
 from .base_tree import BaseTree
 
 from .swarm.swarmstar_space import SwarmstarSpace
+from .swarm.swarm_stats import SwarmStats
+from .swarm.swarm_compactor import SwarmCompactor
+from .swarm.swarm_history import SwarmHistory
+from .swarm.swarm_tables import SwarmTables
 from .swarm.swarm_tree import SwarmTree
+from .swarm.swarm_tree_snapshot import SwarmTreeSnapshot
 from .swarm.swarm_nodes import SwarmNode
 from .swarm.swarm_operations import (
     SwarmOperation,
@@ -16,7 +16,8 @@ from abc import ABCMeta, abstractmethod
 from functools import wraps
 from typing import Any, Dict, List, Callable
 
-from swarmstar.models import SwarmOperation, SwarmNode, SpawnOperation, BaseNode, ActionMetadata, BlockingOperation
+from swarmstar.models import SwarmOperation, SwarmNode, SpawnOperation, BaseNode, BlockingOperation
+from swarmstar.models.metadata.action_registry import action_registry
 
 def error_handling_decorator(func):
     @wraps(func)
@@ -61,11 +62,13 @@ class BaseAction(metaclass=ErrorHandlingMeta):
     def get_node(self) -> SwarmNode:
         return SwarmNode.read(self.node.id)
     
+    # These write only the fields they change. Counters, children and alive are kept up to
+    # date by atomic writes elsewhere, and writing back a stale copy of the node would undo them.
     def report(self, report: str):
         if self.node.report is not None:
             raise ValueError(f"Node {self.node.id} already has a report: {self.node.report}. Cannot update with {report}.")
         self.node.report = report
-        SwarmNode.replace(self.node.id, self.node)
+        SwarmNode.update(self.node.id, {"report": report})
     
     def update_termination_policy(self, termination_policy: str, termination_handler: str = None):
         """
@@ -73,25 +76,25 @@ class BaseAction(metaclass=ErrorHandlingMeta):
         the termination handler will be set to the function name passed in the termination_handler parameter.
         """
         self.node.termination_policy = termination_policy
-        SwarmNode.replace(self.node.id, self.node)
+        SwarmNode.update(self.node.id, {"termination_policy": termination_policy})
         if termination_policy == "custom_termination_handler":
             self.replace_execution_memory(execution_memory={"__termination_handler__": termination_handler})
     
     def add_value_to_execution_memory(self, attribute: str, value: Any):
         self.node.execution_memory[attribute] = value
-        SwarmNode.replace(self.node.id, self.node)
+        SwarmNode.update(self.node.id, {"execution_memory": self.node.execution_memory})
     
     def remove_value_from_execution_memory(self, attribute: str):
         del self.node.execution_memory[attribute]
-        SwarmNode.replace(self.node.id, self.node)
+        SwarmNode.update(self.node.id, {"execution_memory": self.node.execution_memory})
 
     def replace_execution_memory(self, execution_memory: Dict[str, Any]):
         self.node.execution_memory = execution_memory
-        SwarmNode.replace(self.node.id, self.node)
+        SwarmNode.update(self.node.id, {"execution_memory": execution_memory})
 
     def clear_execution_memory(self):
         self.node.execution_memory = {}
-        SwarmNode.replace(self.node.id, self.node)
+        SwarmNode.update(self.node.id, {"execution_memory": {}})
 
     @staticmethod
     def custom_termination_handler(func: Callable):
@@ -144,9 +147,8 @@ class BaseAction(metaclass=ErrorHandlingMeta):
                 raise ValueError(f"instructor_model_name and completion are required parameters for receive_instructor_completion_handler. Error in {self.node.id} at function {func.__name__}")
 
             if type(completion) is dict and instructor_model_name:
-                models_module = ActionMetadata.get_action_module(self.node.type)
-                instructor_model = getattr(models_module, instructor_model_name)
-                completion = instructor_model.model_validate(completion)
+                instructor_model = action_registry.get_instructor_model(self.node.type, instructor_model_name)
+                completion = instructor_model.validate(completion)
 
             if context:
                 return func(self, completion, context)
@@ -4,17 +4,84 @@ Base class for nodes.
 Swarm nodes, action metadata nodes and memory metadata nodes are all derived from this class.
 """
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any, TypeVar
+from typing import List, Optional, Dict, Any, Type, TypeVar
 from importlib import import_module
 
-from swarmstar.utils.database import MongoDBWrapper
-from swarmstar.utils.database.internal import get_internal_sqlite
+from swarmstar.utils.database import get_database
+from swarmstar.utils.database.internal import (
+    get_internal_metadata,
+    get_many_internal_metadata,
+    is_internal_metadata
+)
+from swarmstar.utils.database.node_resolution import (
+    node_resolution_cache,
+    INTERNAL,
+    PORTAL,
+    EXTERNAL
+)
 from swarmstar.context import swarm_id_var
 
-db = MongoDBWrapper()
+db = get_database()
 
 T = TypeVar('T', bound='BaseNode')
 
+class NodeView:
+    """
+    A read-only partial view of a node, holding only the fields that were projected.
+
+    Tree walks usually need a handful of fields like children_ids or alive. Reading
+    those into a view skips transferring and validating the rest of the document.
+    Accessing a field that wasn't projected raises an AttributeError.
+    """
+    __slots__ = ("_fields",)
+
+    def __init__(self, fields: Dict[str, Any]):
+        object.__setattr__(self, "_fields", fields)
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> 'NodeView':
+        return cls(document)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._fields[name]
+        except KeyError:
+            raise AttributeError(f"Field {name} was not projected in this view of node {self._fields.get('id')}.")
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Node views are read-only.")
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._fields})"
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self._fields.get(name, default)
+
+    def model_dump(self) -> Dict[str, Any]:
+        return dict(self._fields)
+
+class NodeRef(NodeView):
+    """
+    A view of a node's structure, for tree walks.
+
+    Holds what a walk needs to find its way: id, parent, children, type and alive,
+    plus the internal and portal flags metadata trees use to tell where a node is
+    stored. Structural fields missing from the document read as their defaults.
+    """
+    FIELDS = ["parent_id", "children_ids", "type", "alive", "internal", "portal"]
+    __slots__ = ()
+
+    def __init__(self, fields: Dict[str, Any]):
+        super().__init__({
+            "parent_id": None,
+            "type": None,
+            "alive": True,
+            "internal": False,
+            "portal": False,
+            **fields,
+            "children_ids": fields.get("children_ids") or [],
+        })
+
 class BaseNode(BaseModel):
     """ Base class for nodes. """
     id: str 
@@ -27,47 +94,147 @@ class BaseNode(BaseModel):
 
 
     @staticmethod
-    def read(node_id: str):
-        """ Retrieve a node from the database and return an instance of the correct class. """
-        node_class = BaseNode.get_node_class_from_id(node_id)
-        module_path, class_name = node_class.rsplit(".", 1)
-        module = import_module(module_path)
-        node_class = getattr(module, class_name)
+    def read(node_id: str, fields: Optional[List[str]] = None):
+        """
+        Retrieve a node from the database and return an instance of the correct class.
+        If fields are given, return a NodeView of just those fields instead.
+        """
+        node_class = BaseNode.import_node_class(node_id)
+        if fields is not None:
+            return NodeView(node_class.get_node_dict(node_id, fields))
         return node_class.read(node_id)
 
+    @staticmethod
+    def read_ref(node_id: str) -> NodeRef:
+        """ Retrieve just the structure of a node, for walking the tree it's in. """
+        return NodeRef.from_document(BaseNode.import_node_class(node_id).get_node_dict(node_id, NodeRef.FIELDS))
+
+    @staticmethod
+    def import_node_class(node_id: str) -> Type['BaseNode']:
+        module_path, class_name = BaseNode.get_node_class_from_id(node_id).rsplit(".", 1)
+        return getattr(import_module(module_path), class_name)
+
     @classmethod
-    def get_node_dict(cls, node_id: str) -> Dict[str, Any]:
+    def batch_read(cls, node_ids: List[str], fields: Optional[List[str]] = None) -> List[Any]:
+        """
+        Retrieve multiple nodes of this class in the order of node_ids.
+        If fields are given, return NodeViews of just those fields instead of validated nodes.
+        """
+        node_dicts = cls.get_node_dicts(node_ids, fields)
+        if fields is not None:
+            return [NodeView(node_dicts[node_id]) for node_id in node_ids]
+        return [cls(**node_dicts[node_id]) for node_id in node_ids]
+
+    @classmethod
+    def get_node_dicts(cls, node_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Like get_node_dict for many ids.
+
+        Internal nodes come from the internal metadata snapshot in one call and
+        everything stored in the database is fetched in one round trip.
+        """
+        if cls.collection == "swarm_nodes":
+            node_dicts = db.batch_read(cls.collection, node_ids, fields)
+            missing_ids = [node_id for node_id in node_ids if node_id not in node_dicts]
+            if missing_ids:
+                raise ValueError(f"Nodes {missing_ids} not found in {cls.collection}")
+            return node_dicts
+
+        swarm_id = swarm_id_var.get(None)
+        stores = {}
+        for node_id in node_ids:
+            stores[node_id] = node_resolution_cache.get(swarm_id, cls.collection, node_id) \
+                or cls._resolve_store(node_id)
+
+        keys = {
+            f"{swarm_id}_{node_id}" if store == PORTAL else node_id: node_id
+            for node_id, store in stores.items() if store != INTERNAL
+        }
+        node_dicts = {}
+        if keys:
+            for key, node in db.batch_read(cls.collection, list(keys), fields).items():
+                node_dicts[keys[key]] = node
+
+        # Portals nothing was attached to yet are only in the internal metadata
+        internal_ids = [
+            node_id for node_id, store in stores.items()
+            if store == INTERNAL or (store == PORTAL and node_id not in node_dicts)
+        ]
+        for node_id, node in get_many_internal_metadata(cls.collection, internal_ids).items():
+            node_dicts[node_id] = cls._project(node, fields)
+
+        missing_ids = [node_id for node_id in stores if node_id not in node_dicts]
+        for node_id in missing_ids:
+            node_resolution_cache.invalidate(cls.collection, node_id)
+        if missing_ids:
+            raise ValueError(f"Nodes {missing_ids} not found in {cls.collection}")
+        for node_id, store in stores.items():
+            node_resolution_cache.set(swarm_id, cls.collection, node_id, store)
+        return node_dicts
+
+    @classmethod
+    def get_node_dict(cls, node_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         The base class returns a dict. Perform validation in the derived classes.
 
         If the collection is "swarm_nodes", retrieve from the external database.
 
-        Otherwise, it is a metadata node, which means it can be internal or external.
-        Try to retrieve from the internal sqlite database. If not found,
-        check the mongodb database. If not found in either, raise an error.
+        Otherwise, it is a metadata node, which means it can be internal, portal or external.
+        Internal nodes are read from the internal metadata snapshot and external nodes
+        from the database. Portal nodes are internal nodes that get a swarm copy, stored
+        under {swarm_id}_{node_id}, once an external node is attached to them. Until
+        then they're read from the internal metadata snapshot too.
+
+        Which store holds an id is remembered per swarm, so after the first lookup
+        each node is read straight from its store.
 
-        If found internally and of type "portal", prepend the node_id with
-        the swarm_id and retrieve from the mongodb database.
+        If fields are given, only those fields (and id) are returned.
         """
         if cls.collection == "swarm_nodes":
-            return db.read(cls.collection, node_id)
+            return db.read(cls.collection, node_id, fields)
+
+        swarm_id = swarm_id_var.get(None)
+        store = node_resolution_cache.get(swarm_id, cls.collection, node_id)
+        if store is None:
+            store = cls._resolve_store(node_id)
+
+        if store == INTERNAL:
+            node = cls._project(get_internal_metadata(cls.collection, node_id), fields)
         else:
+            key = f"{swarm_id}_{node_id}" if store == PORTAL else node_id
             try:
-                node = get_internal_sqlite(cls.collection, node_id)
-                if node.get("portal", False):
-                    node_id = f"{swarm_id_var.get()}_{node_id}"
-                    node = db.read(cls.collection, node_id)
-                return node
-            except:
-                try:
-                    return db.read(cls.collection, node_id)
-                except:
+                node = db.read(cls.collection, key, fields)
+            except ValueError:
+                if store != PORTAL:
+                    node_resolution_cache.invalidate(cls.collection, node_id)
                     raise ValueError(f"Node {node_id} not found in {cls.collection}")
+                # Nothing was attached to this portal yet, so it's only in the internal metadata
+                node = cls._project(get_internal_metadata(cls.collection, node_id), fields)
+
+        node_resolution_cache.set(swarm_id, cls.collection, node_id, store)
+        return node
+
+    @staticmethod
+    def _project(node: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        if fields is None:
+            return node
+        return {**{field: node[field] for field in fields if field in node}, "id": node["id"]}
+
+    @classmethod
+    def _resolve_store(cls, node_id: str) -> str:
+        """ Works out whether a metadata node is internal, portal or external. """
+        if not is_internal_metadata(cls.collection, node_id):
+            return EXTERNAL
+        if get_internal_metadata(cls.collection, node_id).get("portal", False):
+            return PORTAL
+        return INTERNAL
 
     @classmethod
     def delete(cls, node_id: str) -> None:
         """ Deletes node from the database."""
         db.delete(cls.collection, node_id)
+        if cls.collection != "swarm_nodes":
+            node_resolution_cache.invalidate(cls.collection, node_id)
 
     @classmethod
     def update(cls, node_id: str, updated_values: Dict[str, Any]) -> None:
@@ -82,6 +249,8 @@ class BaseNode(BaseModel):
     def create(self) -> None:
         """ Inserts a node to the database. Raises an error if the node already exists. """
         db.create(self.collection, self.id, self.model_dump())
+        if self.collection != "swarm_nodes":
+            node_resolution_cache.invalidate(self.collection, self.id)
 
     def clone(self, swarm_id: str) -> None:
         """ Clones this node under a new swarm id and saves it to the database. """
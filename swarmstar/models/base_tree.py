@@ -1,10 +1,12 @@
 from pydantic import BaseModel
 from abc import ABC
+from typing import ClassVar, Iterator, List, Type, Union
 
-from swarmstar.utils.database import MongoDBWrapper
-from swarmstar.models.base_node import BaseNode
+from swarmstar.utils.database import get_database
+from swarmstar.models.base_node import BaseNode, NodeRef, NodeView
+from swarmstar.utils.database.internal import is_internal_metadata
 
-db = MongoDBWrapper()
+db = get_database()
 
 class BaseTree(ABC, BaseModel):
     """
@@ -16,8 +18,42 @@ class BaseTree(ABC, BaseModel):
     This class just provides some common functions that are shared by all trees.
     """
     collection: str # Collection name in the database
+    node_class: ClassVar[Type[BaseNode]] # Class of the nodes in this tree
+    # Tree walks only need the structure of each node, so that's all they read
+    STRUCTURE_FIELDS: ClassVar[List[str]] = NodeRef.FIELDS
 
-    def is_external(node: BaseNode):
+    @classmethod
+    def read_structure(cls, node_id: str) -> NodeRef:
+        return NodeRef.from_document(cls.node_class.get_node_dict(node_id, cls.STRUCTURE_FIELDS))
+
+    @classmethod
+    def read_structures(cls, node_ids: List[str]) -> List[NodeRef]:
+        node_dicts = cls.node_class.get_node_dicts(node_ids, cls.STRUCTURE_FIELDS)
+        return [NodeRef.from_document(node_dicts[node_id]) for node_id in node_ids]
+
+    @classmethod
+    def walk_levels(cls, root_node_id: str) -> Iterator[List[NodeRef]]:
+        """
+        Breadth first walk that yields the tree one level at a time.
+
+        Each level is read in a single batch, so a walk costs one round of
+        lookups per level rather than per node, and deep trees can't hit
+        the recursion limit.
+        """
+        seen = {root_node_id}
+        level_ids = [root_node_id]
+        while level_ids:
+            nodes = cls.read_structures(level_ids)
+            yield nodes
+            level_ids = []
+            for node in nodes:
+                for child_id in node.children_ids:
+                    if child_id not in seen:
+                        seen.add(child_id)
+                        level_ids.append(child_id)
+
+    @classmethod
+    def is_external(cls, node: Union[BaseNode, NodeView]) -> bool:
         """
         Checks if this node is external, meaning it's stored in the database, not inside the package.
         Internal refers to stuff stored inside the swarmstar package, in a file or internal sqlite database.
@@ -25,9 +61,13 @@ class BaseTree(ABC, BaseModel):
         The base tree could contain swarm or metadata nodes.
         Swarm nodes are always stored externally, tied to an instance of the swarm.
         Metadata nodes can be internal and portal nodes close the gap between internal and external.
+        Portal nodes are only copied to the database once something is attached to them,
+        the copy carries the swarm id in its id while the internal node doesn't.
         """
-        if node.collection == "swarm_nodes": return True
-        return not node.read("internal", False) or node.get("portal", False)
+        if cls.collection == "swarm_nodes": return True
+        if node.get("portal", False):
+            return not is_internal_metadata(cls.collection, node.id)
+        return not node.get("internal", False)
 
     @classmethod
     def get_root_node_id(cls, swarm_id: str) -> str:
@@ -46,33 +86,27 @@ class BaseTree(ABC, BaseModel):
         batch_copy_payload = [[], []] # [old_ids, new_ids]
         batch_update_payload = {} # {new_id: {parent_id: "", children_ids: []}} 
 
-        def recursive_helper(node_id):
-            node = BaseNode.read(node_id)
-            is_external = cls.is_external(node)
-
-            if node.children_ids:
-                for i, child_id in enumerate(node.children_ids):
-                    recursive_helper(child_id)
-                    if is_external:
-                        parts = child_id.split("_", 1)
-                        node.children_ids[i] = f"{swarm_id}_{parts[1]}"
-
-            if is_external:
-                old_id = node.id
-                parts = node.id.split("_", 1)
-                node.id = f"{swarm_id}_{parts[1]}"
+        def new_id(old_id):
+            # Only ids stored under the old swarm move, internal ids stay as they are
+            if old_id.startswith(f"{old_swarm_id}_"):
+                return f"{swarm_id}_{old_id.split('_', 1)[1]}"
+            return old_id
+
+        for level in cls.walk_levels(root_node_id):
+            for node in level:
+                if not cls.is_external(node):
+                    continue
+                parent_id = node.parent_id
                 # If the node has a parent and is not a portal node, change the parent id
-                if node.parent_id and not node.get("portal", False):
-                    parts = node.parent_id.split("_", 1)
-                    node.parent_id = f"{swarm_id}_{parts[1]}"
-                batch_copy_payload[0].append(old_id)
-                batch_copy_payload[1].append(node.id)
-                batch_update_payload[node.id] = {"parent_id": node.parent_id, "children_ids": node.children_ids}
-
-        recursive_helper(root_node_id)
-
-        if batch_copy_payload:
-            db.batch_copy(cls.collection, batch_copy_payload)
+                if parent_id and not node.portal:
+                    parent_id = new_id(parent_id)
+                children_ids = [new_id(child_id) for child_id in node.children_ids]
+                batch_copy_payload[0].append(node.id)
+                batch_copy_payload[1].append(new_id(node.id))
+                batch_update_payload[new_id(node.id)] = {"parent_id": parent_id, "children_ids": children_ids}
+
+        if batch_copy_payload[0]:
+            db.batch_copy(cls.collection, batch_copy_payload[0], batch_copy_payload[1])
         if batch_update_payload:
             db.batch_update(cls.collection, batch_update_payload)
 
@@ -80,18 +114,10 @@ class BaseTree(ABC, BaseModel):
     def delete(cls, swarm_id: str) -> None:
         """ Deletes every node in the tree from the database. """
         root_node_id = cls.get_root_node_id(swarm_id)
-        
+
         batch_delete_payload = []
-        
-        def recursive_helper(node_id):
-            node = BaseNode.read(node_id)
-            if node.children_ids:                    
-                for child_id in node.children_ids:
-                    recursive_helper(child_id)
-            if cls.is_external(node):
-                batch_delete_payload.append(node.id)
+        for level in cls.walk_levels(root_node_id):
+            batch_delete_payload.extend(node.id for node in level if cls.is_external(node))
 
-        recursive_helper(root_node_id)
-        
         if batch_delete_payload:
             db.batch_delete(cls.collection, batch_delete_payload)
@@ -13,9 +13,9 @@ from typing import List, Optional, Type, TypeVar, ClassVar
 from pydantic import Field
 from enum import Enum
 from typing_extensions import Literal
-from importlib import import_module
 
 from swarmstar.models.metadata.metadata_node import MetadataNode
+from swarmstar.models.metadata.action_registry import action_registry
 from swarmstar.utils.misc.ids import get_available_id
 
 T = TypeVar('T', bound='ActionMetadata')
@@ -45,31 +45,12 @@ class ActionMetadata(MetadataNode):
     @staticmethod
     def get_action_class(action_id: str):
         """ Returns an uninstantiated action class. """
-        action_metadata = ActionMetadata.get(action_id)
-        if action_metadata.is_folder:
-            raise ValueError(f"You tried to get the action class of a folder {action_id}.")
-        
-        if action_metadata.internal:
-            internal_file_path = action_metadata.internal_file_path
-            action_class = getattr(import_module(internal_file_path), "Action")
-            return action_class
-        else:
-            # TODO: Implement this when we have a better idea of how external actions will work.
-            raise ValueError(f"External actions are not supported yet.")
+        return action_registry.get(action_id).action_class
 
     @staticmethod
     def get_action_module(action_id: str):
         """ Returns the module of the action. """
-        action_metadata = ActionMetadata.get(action_id)
-        if action_metadata.is_folder:
-            raise ValueError(f"You tried to get the action module of a folder {action_id}.")
-        
-        if action_metadata.internal:
-            internal_file_path = action_metadata.internal_file_path
-            module = import_module(internal_file_path)
-            return module
-        else:
-            raise ValueError(f"External actions are not supported yet.")
+        return action_registry.get(action_id).module
 
 class InternalActionMetadata(ActionMetadata):
     is_folder: Literal[False] = Field(default=False)
@@ -1,9 +1,11 @@
 """
 The action metadata tree allows the swarm to find actions to take.
 """
-from typing import ClassVar
+from typing import ClassVar, Type
 
 from swarmstar.models.metadata.metadata_tree import MetadataTree
+from swarmstar.models.metadata.action_metadata import ActionMetadata
 
 class ActionMetadataTree(MetadataTree):
     collection: ClassVar[str] = "action_metadata"
+    node_class: ClassVar[Type[ActionMetadata]] = ActionMetadata
@@ -0,0 +1,155 @@
+"""
+The action registry maps action ids to everything needed to run them: the
+action class, its module and the instructor models the module defines.
+Instructor models are resolved together with their JSON schema and validator
+when the action's module is loaded.
+
+Internal actions never change while the package is running, so they're all
+registered the first time the registry is used, straight from the internal
+metadata. Each action's module is imported the first time the action runs.
+After that, dispatching an action needs no metadata lookups or imports.
+
+External action metadata doesn't say where the action's code lives, so external
+actions can't be loaded from metadata. Whoever provides one has to register it
+with its module through action_registry.register() before it runs.
+"""
+import threading
+from importlib import import_module
+from types import ModuleType
+from typing import Any, Dict, Optional, Type
+
+from instructor import openai_schema
+from pydantic import BaseModel, TypeAdapter
+
+from swarmstar.utils.database.internal import get_internal_metadata_snapshot
+
+class InstructorModel:
+    """
+    An instructor model resolved once per process, along with its JSON schema
+    and a validator for completions that come back as plain dicts.
+
+    Instructor wraps a plain pydantic model and rebuilds its schema on every
+    call. response_model is that wrapper built once, with the schema pinned to
+    it, so pass it to Instructor.completion instead of the model.
+    """
+    __slots__ = ("name", "model", "response_model", "json_schema", "validator")
+
+    def __init__(self, name: str, model: Type[BaseModel]):
+        self.name = name
+        self.model = model
+        self.response_model = openai_schema(model)
+        self.json_schema = self.response_model.openai_schema
+        self.response_model.openai_schema = self.json_schema
+        self.validator = TypeAdapter(model)
+
+    def validate(self, completion: Dict[str, Any]) -> BaseModel:
+        return self.validator.validate_python(completion)
+
+class RegisteredAction:
+    __slots__ = ("action_id", "name", "termination_policy", "module_path", "_module", "_action_class", "_instructor_models")
+
+    def __init__(self, action_id: str, name: str, termination_policy: str, module_path: str, module: Optional[ModuleType] = None):
+        self.action_id = action_id
+        self.name = name
+        self.termination_policy = termination_policy
+        self.module_path = module_path
+        self._module = None
+        if module is not None:
+            self._load(module)
+
+    def _load(self, module: ModuleType) -> None:
+        self._action_class = getattr(module, "Action")
+        # Instructor models are looked up by name, so index every pydantic model the module
+        # holds, leaving out swarmstar's own nodes and operations
+        self._instructor_models = {
+            attribute_name: InstructorModel(attribute_name, value) for attribute_name, value in vars(module).items()
+            if isinstance(value, type) and issubclass(value, BaseModel) and value is not BaseModel
+            and not value.__module__.startswith("swarmstar.models")
+        }
+        self._module = module
+
+    @property
+    def module(self) -> ModuleType:
+        if self._module is None:
+            self._load(import_module(self.module_path))
+        return self._module
+
+    @property
+    def action_class(self) -> type:
+        self.module
+        return self._action_class
+
+    @property
+    def instructor_models(self) -> Dict[str, InstructorModel]:
+        self.module
+        return self._instructor_models
+
+    def get_instructor_model(self, instructor_model_name: str) -> InstructorModel:
+        try:
+            return self.instructor_models[instructor_model_name]
+        except KeyError:
+            raise ValueError(f"Action {self.action_id} has no instructor model named {instructor_model_name}.")
+
+class ActionRegistry:
+    def __init__(self):
+        self._actions: Dict[str, RegisteredAction] = {}
+        self._internal_registered = False
+        self._lock = threading.RLock()
+
+    def get(self, action_id: str) -> RegisteredAction:
+        """ Returns the registered action, registering it first if needed. """
+        registered_action = self._actions.get(action_id)
+        if registered_action is None:
+            with self._lock:
+                if not self._internal_registered:
+                    self._register_internal_actions()
+                registered_action = self._actions.get(action_id) or self._register_external_action(action_id)
+        return registered_action
+
+    def get_instructor_model(self, action_id: str, instructor_model_name: str) -> InstructorModel:
+        """ Returns the action's instructor model, resolved with its schema and validator. """
+        return self.get(action_id).get_instructor_model(instructor_model_name)
+
+    def register(self, action_id: str, metadata: Dict[str, Any], module: Optional[ModuleType] = None) -> RegisteredAction:
+        """
+        Register an action from its metadata. Without a module, the module is
+        imported from internal_file_path the first time the action is used, so
+        external actions have to be registered with their module.
+        """
+        registered_action = RegisteredAction(
+            action_id=action_id,
+            name=metadata["name"],
+            termination_policy=metadata.get("termination_policy") or "simple",
+            module_path=metadata.get("internal_file_path") or getattr(module, "__name__", None),
+            module=module
+        )
+        with self._lock:
+            self._actions[action_id] = registered_action
+        return registered_action
+
+    def _register_internal_actions(self) -> None:
+        snapshot = get_internal_metadata_snapshot()
+        for action_id in snapshot.keys("action_metadata"):
+            metadata = snapshot.get("action_metadata", action_id)
+            if not metadata.get("is_folder") and metadata.get("internal_file_path"):
+                self.register(action_id, metadata)
+        self._internal_registered = True
+
+    def _register_external_action(self, action_id: str) -> RegisteredAction:
+        """ External actions aren't loadable from metadata, this only explains why the lookup failed. """
+        from swarmstar.models.metadata.action_metadata import ActionMetadata
+
+        action_metadata = ActionMetadata.get(action_id)
+        if action_metadata.is_folder:
+            raise ValueError(f"You tried to get the action of a folder {action_id}.")
+        raise ValueError(
+            f"External action {action_id} isn't registered. Its metadata doesn't say where its code lives, "
+            f"register it with its module through action_registry.register() first."
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._actions.clear()
+            self._internal_registered = False
+
+action_registry = ActionRegistry()
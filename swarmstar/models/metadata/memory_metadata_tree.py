@@ -1,12 +1,14 @@
 """
 The memory metadata tree allows the swarm to find answers to questions.
 """
-from typing import ClassVar
+from typing import ClassVar, Type
 
 from swarmstar.models.metadata.metadata_tree import MetadataTree
+from swarmstar.models.metadata.memory_metadata import MemoryMetadata
 
 class MemoryMetadataTree(MetadataTree):
     collection: ClassVar[str] = "memory_metadata"
+    node_class: ClassVar[Type[MemoryMetadata]] = MemoryMetadata
 
     # @classmethod
     # def instantiate(cls, swarm_id: str) -> None:
@@ -11,3 +11,14 @@ class MetadataNode(BaseNode):
     internal: Optional[bool] = Field(default=None)
     portal: Optional[bool] = Field(default=None)
     description: str
+
+    def create(self) -> None:
+        """
+        Inserts an external metadata node and attaches it to its parent folder.
+        A portal parent is copied into the swarm first if nothing was attached to it yet.
+        """
+        from swarmstar.models.metadata.metadata_tree import MetadataTree
+
+        super().create()
+        if self.parent_id:
+            MetadataTree.for_collection(self.collection).add_child(self.parent_id, self.id)
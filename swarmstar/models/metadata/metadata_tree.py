@@ -5,54 +5,70 @@ are all labeled with descriptions and other metadata.
 In swarmstar we have two metadata trees: action and memory. 
 This allows us to find actions to take, and answers to questions.
 """
+from typing import Type
+
 from swarmstar.models.base_tree import BaseTree
-from swarmstar.utils.database.internal import get_internal_sqlite
-from swarmstar.utils.database import MongoDBWrapper
+from swarmstar.utils.database.internal import get_internal_metadata, is_internal_metadata
+from swarmstar.utils.database.node_resolution import node_resolution_cache
+from swarmstar.utils.database import get_database
+from swarmstar.context import swarm_id_var
 
-db = MongoDBWrapper()
+db = get_database()
 
 class MetadataTree(BaseTree):
-    @classmethod
-    def instantiate(cls, swarm_id: str) -> None:
-        """
-        Only call this once when a swarm instance is created.
-        
-        Swarmstar comes with a default action and memory metadata tree. When 
-        a swarm instance is created, it'll need to be able to access the default 
-        action and memory metadata tree but also be able to dynamically add 
-        actions and memories. 
-        
-        It would be wasteful to copy the entire default action and memory 
-        metadata tree each time, as they're immutable. Rather, a select 
-        few nodes, coined "portal nodes", which are folder nodes where we may 
-        attach connections to external nodes, will be cloned.
-        
-        Skip this if not interested in the details:
-        Portal nodes are the internal nodes that we want to be able to add
-        external node ids to. However we can't change internal nodes. Portal nodes
-        are stored in the internal sqlite database like all other internal nodes. But
-        in this instantiation process, each of them will be cloned and stored in the
-        external database with id {swarm_id}_{node_id}. This way, we can add external
-        node ids to the cloned portal nodes without changing the original internal nodes.
-        And whenever we see a portal node, we'll know, just prepend the swarm_id and check
-        the external database.
-        """
-        print(f"Instantiating {cls.collection} tree for swarm {swarm_id}...")
-        
-        internal_root_node_id = "root"
-        node = get_internal_sqlite(cls.collection, internal_root_node_id)
+    """
+    Swarmstar comes with a default action and memory metadata tree. Every swarm
+    instance needs to be able to access them but also be able to dynamically add
+    actions and memories.
 
-        batch_create_payload = {} # {new_node_id: new_node}
+    It would be wasteful to copy the default trees for each swarm, as they're
+    immutable. Rather, a select few nodes, coined "portal nodes", which are folder
+    nodes where we may attach connections to external nodes, get copied.
 
-        def recursive_helper(node):
-            if "type" in node and node.get("portal", False):
-                node_id = f"{swarm_id}_{node['id']}"
-                batch_create_payload[node_id] = node
-            if node.get("children_ids", None):
-                for child_id in node["children_ids"]:
-                    child_node = get_internal_sqlite(cls.collection, child_id)
-                    recursive_helper(child_node)
+    Skip this if not interested in the details:
+    Portal nodes are the internal nodes that we want to be able to add
+    external node ids to. However we can't change internal nodes. Portal nodes
+    are stored in the internal metadata like all other internal nodes. The first
+    time an external node is attached to a portal node in a swarm, the portal node
+    is copied to the external database with id {swarm_id}_{node_id}. This way, we
+    can add external node ids to the copied portal nodes without changing the
+    original internal nodes. And whenever we see a portal node, we'll know, just
+    prepend the swarm_id and check the external database. If there's no copy yet,
+    nothing was attached and the internal node is still accurate.
 
-        recursive_helper(node)
+    Most swarms never attach anything under most portals, so copying on the first
+    attachment rather than when the swarm is created keeps instantiation, storage
+    and cleanup per swarm small.
+    """
+    @staticmethod
+    def for_collection(collection: str) -> Type["MetadataTree"]:
+        """ Returns the metadata tree stored in the collection. """
+        for tree_class in MetadataTree.__subclasses__():
+            if tree_class.collection == collection:
+                return tree_class
+        raise ValueError(f"No metadata tree is stored in the collection {collection}.")
 
-        if batch_create_payload: db.batch_create(cls.collection, batch_create_payload)
+    @classmethod
+    def add_child(cls, parent_id: str, child_id: str) -> None:
+        """
+        Attach an external node to a folder node, copying the folder into the swarm
+        first if it's a portal node nothing was attached to yet.
+        """
+        if is_internal_metadata(cls.collection, parent_id):
+            parent = get_internal_metadata(cls.collection, parent_id)
+            if not parent.get("portal", False):
+                raise ValueError(f"Can't attach {child_id} to internal node {parent_id}, it isn't a portal node.")
+            parent_id = cls.materialize_portal(swarm_id_var.get(), parent_id)
+        db.append_to_array(cls.collection, parent_id, "children_ids", child_id)
+
+    @classmethod
+    def materialize_portal(cls, swarm_id: str, node_id: str) -> str:
+        """
+        Copy a portal node into the swarm unless it already was. The copy is inserted
+        only if absent, so concurrent attachments agree on one copy.
+        Returns the id of the copy.
+        """
+        portal_id = f"{swarm_id}_{node_id}"
+        db.create_if_absent(cls.collection, portal_id, get_internal_metadata(cls.collection, node_id))
+        node_resolution_cache.invalidate(cls.collection, node_id)
+        return portal_id
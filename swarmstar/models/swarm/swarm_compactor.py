@@ -0,0 +1,198 @@
+"""
+Once a subtree of the swarm has terminated, its nodes' working state is never read
+again. The compactor strips that state from nodes whose whole subtree is dead, once
+they've been dead for a grace period:
+    - execution_memory, context and developer_logs of the nodes
+    - args and context of the nodes' blocking operations
+
+Reports, names, types, messages and the tree structure are kept. Pass archive=True
+to move the stripped fields to the swarm_archive collection instead of dropping them.
+
+Dead nodes never come back to life or get new children, so a compacted node's
+subtree is final and later passes don't walk into it.
+
+The first pass walks the whole tree and every operation. After that, each pass
+only follows the swarm's change feed from where the last one stopped: nodes whose
+alive flag was written become candidates, and new blocking operations are indexed
+by their node. Dead nodes that can't be compacted yet are kept for the next pass.
+That state lives in the swarm_compaction collection, and a lease on it keeps
+concurrent passes on the same swarm from overwriting each other.
+
+    asyncio.create_task(SwarmCompactor.maintain(swarm_id, grace_period=3600))
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+
+from swarmstar.models.swarm.swarm_nodes import SwarmNode
+from swarmstar.utils.database import get_database
+from swarmstar.utils.database.lease import Lease
+
+db = get_database()
+
+ARCHIVE_CATEGORY = "swarm_archive"
+COMPACTION_CATEGORY = "swarm_compaction"
+COMPACTION_STATE_FIELDS = ["cursor", "dead_ids", "blocking_ids"]
+TRANSIENT_NODE_FIELDS: Dict[str, Any] = {"execution_memory": {}, "context": {}, "developer_logs": []}
+TRANSIENT_OPERATION_FIELDS: Dict[str, Any] = {"args": {}, "context": {}}
+COMPACTION_FIELDS = ["children_ids", "alive", "terminated_at", "compacted"]
+OPERATION_BATCH_SIZE = 1000
+EVENT_BATCH_SIZE = 5000
+LEASE_TTL = 600.0 # Seconds, long enough for the first pass to walk a big swarm
+
+class SwarmCompactor:
+    @staticmethod
+    def compact(swarm_id: str, grace_period: float = 3600.0, archive: bool = False) -> List[str]:
+        """
+        Strip the transient fields of every node whose whole subtree has been dead
+        for at least grace_period seconds. Returns the ids of the nodes compacted.
+        Returns nothing while another pass on the swarm is running.
+        """
+        admin = db.read("admin", swarm_id, ["node_count", "operation_count", "fork_ids"])
+        if admin.get("fork_ids") or not admin.get("node_count"):
+            return [] # Forked swarms are read-only
+
+        db.create_if_absent(COMPACTION_CATEGORY, swarm_id, {"cursor": None, "dead_ids": [], "blocking_ids": {}})
+        lease = Lease(COMPACTION_CATEGORY, swarm_id, ttl=LEASE_TTL)
+        if not lease.try_acquire():
+            return []
+        try:
+            state = db.read(COMPACTION_CATEGORY, swarm_id, COMPACTION_STATE_FIELDS)
+            if state.get("cursor") is None:
+                state = SwarmCompactor._initial_state(swarm_id, admin.get("operation_count", 0))
+            SwarmCompactor._follow_feed(swarm_id, state)
+
+            node_ids, dead_ids = SwarmCompactor._find_compactable(state["dead_ids"], time.time() - grace_period)
+            operations = [
+                operation_id for node_id in node_ids for operation_id in state["blocking_ids"].pop(node_id, [])
+            ]
+            if archive and node_ids:
+                SwarmCompactor._archive(node_ids, operations)
+            if operations:
+                db.batch_update("swarm_operations", {
+                    operation_id: {**TRANSIENT_OPERATION_FIELDS, "compacted": True} for operation_id in operations
+                })
+            if node_ids:
+                db.batch_update(SwarmNode.collection, {
+                    node_id: {**TRANSIENT_NODE_FIELDS, "compacted": True} for node_id in node_ids
+                })
+            state["dead_ids"] = dead_ids
+            db.update(COMPACTION_CATEGORY, swarm_id, {
+                field: state[field] for field in COMPACTION_STATE_FIELDS
+            }, fencing_token=lease.token)
+            return node_ids
+        finally:
+            lease.release()
+
+    @staticmethod
+    async def maintain(swarm_id: str, grace_period: float = 3600.0, interval: float = 600.0, archive: bool = False) -> None:
+        """ Compact the swarm every interval seconds, forever. A failed pass is retried on the next one. """
+        while True:
+            try:
+                await asyncio.to_thread(SwarmCompactor.compact, swarm_id, grace_period, archive)
+            except Exception as e:
+                print(f"Error compacting swarm {swarm_id}: {e}")
+            await asyncio.sleep(interval)
+
+    @staticmethod
+    def _initial_state(swarm_id: str, operation_count: int) -> Dict[str, Any]:
+        """ Walk the tree and every operation once. Changes from here on are picked up from the feed. """
+        cursor = db.mutation_cursor(swarm_id)
+        dead_ids = []
+        level_ids = [f"{swarm_id}_n0"]
+        seen = set(level_ids)
+        while level_ids:
+            node_dicts = SwarmNode.get_node_dicts(level_ids, COMPACTION_FIELDS)
+            next_level_ids = []
+            for node_id in level_ids:
+                node = node_dicts[node_id]
+                if node.get("compacted"):
+                    continue # Already compacted, and so is everything under it
+                if not node.get("alive", True):
+                    dead_ids.append(node_id)
+                for child_id in node.get("children_ids") or []:
+                    if child_id not in seen:
+                        seen.add(child_id)
+                        next_level_ids.append(child_id)
+            level_ids = next_level_ids
+
+        blocking_ids: Dict[str, List[str]] = {}
+        for start in range(0, operation_count, OPERATION_BATCH_SIZE):
+            keys = [f"{swarm_id}_o{i}" for i in range(start, min(start + OPERATION_BATCH_SIZE, operation_count))]
+            for operation in db.batch_read("swarm_operations", keys, ["operation_type", "node_id", "compacted"]).values():
+                if operation.get("operation_type") == "blocking" and not operation.get("compacted"):
+                    blocking_ids.setdefault(operation["node_id"], []).append(operation["id"])
+        return {"cursor": cursor, "dead_ids": dead_ids, "blocking_ids": blocking_ids}
+
+    @staticmethod
+    def _follow_feed(swarm_id: str, state: Dict[str, Any]) -> None:
+        """ Pick up the nodes whose alive flag changed and the blocking operations created since the last pass. """
+        dead_ids = dict.fromkeys(state["dead_ids"])
+        while True:
+            events = db.read_mutations(swarm_id, state["cursor"], EVENT_BATCH_SIZE)
+            if not events:
+                break
+            for event in events:
+                if event["collection"] == SwarmNode.collection and "alive" in event["fields"]:
+                    dead_ids[event["id"]] = None
+                elif event["collection"] == "swarm_operations" and event["type"] == "create":
+                    values = event.get("values") or {}
+                    if values.get("operation_type") == "blocking":
+                        state["blocking_ids"].setdefault(values["node_id"], []).append(event["id"])
+            state["cursor"] = events[-1]["cursor"]
+        state["dead_ids"] = list(dead_ids)
+
+    @staticmethod
+    def _find_compactable(candidate_ids: List[str], dead_before: float) -> Tuple[List[str], List[str]]:
+        """
+        Work out bottom up which candidates head subtrees that are all dead.
+        Returns the nodes to compact and the dead nodes left for a later pass.
+        """
+        candidates = {
+            node_id: node for node_id, node in db.batch_read(SwarmNode.collection, candidate_ids, COMPACTION_FIELDS).items()
+            if not node.get("alive", True) and not node.get("compacted")
+        }
+        other_child_ids = [
+            child_id for node in candidates.values() for child_id in node.get("children_ids") or []
+            if child_id not in candidates
+        ]
+        # A node is only compacted along with everything under it, so compacted subtrees stay final
+        subtree_compactable: Dict[str, bool] = {
+            child_id: bool(child.get("compacted"))
+            for child_id, child in db.batch_read(SwarmNode.collection, other_child_ids, ["compacted"]).items()
+        } if other_child_ids else {}
+
+        compactable, dead_ids = [], []
+        # Children are created after their parents, so their ids count higher and get decided first
+        for node_id in sorted(candidates, key=lambda node_id: int(node_id.rsplit("_n", 1)[1]), reverse=True):
+            node = candidates[node_id]
+            terminated_at = node.get("terminated_at")
+            # Nodes killed before terminated_at was recorded have been dead for long enough
+            past_grace = terminated_at is None or terminated_at <= dead_before
+            compactable_here = past_grace and all(
+                subtree_compactable.get(child_id, False) for child_id in node.get("children_ids") or []
+            )
+            subtree_compactable[node_id] = compactable_here
+            (compactable if compactable_here else dead_ids).append(node_id)
+        return compactable, dead_ids
+
+    @staticmethod
+    def _archive(node_ids: List[str], operation_ids: List[str]) -> None:
+        """ Keep the fields about to be stripped in swarm_archive, one document per node. """
+        nodes = db.batch_read(SwarmNode.collection, node_ids, list(TRANSIENT_NODE_FIELDS))
+        operations = db.batch_read("swarm_operations", operation_ids, ["node_id", *TRANSIENT_OPERATION_FIELDS]) \
+            if operation_ids else {}
+        archives = {
+            node_id: {
+                "node": {field: nodes[node_id].get(field) for field in TRANSIENT_NODE_FIELDS},
+                "operations": {}
+            } for node_id in node_ids
+        }
+        for operation_id, operation in operations.items():
+            archives[operation["node_id"]]["operations"][operation_id] = {
+                field: operation.get(field) for field in TRANSIENT_OPERATION_FIELDS
+            }
+        existing = db.batch_read(ARCHIVE_CATEGORY, node_ids, [])
+        new_archives = {node_id: archive for node_id, archive in archives.items() if node_id not in existing}
+        if new_archives:
+            db.batch_create(ARCHIVE_CATEGORY, new_archives)
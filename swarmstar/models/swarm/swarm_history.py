@@ -0,0 +1,204 @@
+"""
+Swarm history rebuilds the swarm's nodes and operations as they were after any
+event in its mutation log, for scrubbing back and forth through a swarm's life.
+
+Node and operation events carry what they wrote, the document for creates and
+the changes for updates, so the state after event n is the log folded up to n. To keep that cheap, the state is snapshotted every
+SNAPSHOT_INTERVAL events. A rebuild starts from the nearest snapshot at or before
+the event, or from where the history currently is when that's closer, so it
+replays at most SNAPSHOT_INTERVAL events.
+
+Snapshots are zlib compressed JSON, split into chunks that fit in a document, and
+kept in the history_snapshots collection. They're written as replays pass them,
+and history.snapshot() catches up on the ones missing.
+
+    history = SwarmHistory(swarm_id)
+    nodes = history.seek(1500)["swarm_nodes"]
+
+A fork's history starts from its parent's state at the fork.
+"""
+import copy
+import json
+import zlib
+from typing import Any, Dict, List, Optional
+
+from swarmstar.utils.database import get_database
+from swarmstar.utils.database.forks import TOMBSTONE, rebase_ids
+from swarmstar.utils.misc.serialization import json_default
+
+db = get_database()
+
+SNAPSHOT_CATEGORY = "history_snapshots"
+SNAPSHOT_INTERVAL = 1000
+SNAPSHOT_CHUNK_SIZE = 4 * 1024 * 1024 # Bytes, well under MongoDB's document size limit
+EVENT_BATCH_SIZE = 5000
+
+SwarmState = Dict[str, Dict[str, Dict[str, Any]]] # {collection: {id: document}}
+
+class SwarmHistory:
+    def __init__(self, swarm_id: str):
+        self.swarm_id = swarm_id
+        self.cursor = 0
+        self.state: SwarmState = {}
+        self._index: Optional[Dict[str, Any]] = None
+
+    def seek(self, cursor: int) -> SwarmState:
+        """
+        Rebuild the state right after event cursor, 0 being the state before the first event.
+        The documents returned belong to the history, copy them before changing them.
+        """
+        latest_cursor = db.mutation_cursor(self.swarm_id)
+        if cursor < 0 or cursor > latest_cursor:
+            raise ValueError(f"Swarm {self.swarm_id} has no event {cursor}, its history ends at {latest_cursor}")
+
+        snapshot_cursor = max((c for c in self._snapshot_cursors() if c <= cursor), default=0)
+        if not snapshot_cursor <= self.cursor <= cursor or not self.state:
+            self._load(snapshot_cursor)
+        self._replay(cursor)
+        return self.state
+
+    def snapshot(self) -> None:
+        """ Write the snapshots missing up to the latest event. """
+        latest_cursor = db.mutation_cursor(self.swarm_id)
+        snapshot_cursors = self._snapshot_cursors()
+        last_snapshot = max(snapshot_cursors, default=0)
+        if latest_cursor - last_snapshot >= SNAPSHOT_INTERVAL:
+            self.seek(latest_cursor - latest_cursor % SNAPSHOT_INTERVAL)
+
+    @staticmethod
+    def clear(swarm_id: str) -> None:
+        """ Delete the swarm's snapshots. """
+        index_key = f"{swarm_id}_index"
+        if not db.exists(SNAPSHOT_CATEGORY, index_key):
+            return
+        index = db.read(SNAPSHOT_CATEGORY, index_key)
+        keys = [
+            SwarmHistory._chunk_key(swarm_id, cursor, chunk)
+            for cursor, chunks in index.get("snapshots", []) for chunk in range(chunks)
+        ]
+        existing_keys = list(db.batch_read(SNAPSHOT_CATEGORY, keys, [])) if keys else []
+        if existing_keys:
+            db.batch_delete(SNAPSHOT_CATEGORY, existing_keys)
+        db.delete(SNAPSHOT_CATEGORY, index_key)
+
+
+    """                     Rebuilding                     """
+    def _load(self, snapshot_cursor: int) -> None:
+        if snapshot_cursor == 0:
+            self.state = self._initial_state()
+        else:
+            chunks = dict(self._index["snapshots"])[snapshot_cursor]
+            keys = [self._chunk_key(self.swarm_id, snapshot_cursor, chunk) for chunk in range(chunks)]
+            found = db.batch_read(SNAPSHOT_CATEGORY, keys, ["data"])
+            if len(found) != chunks:
+                raise ValueError(f"Snapshot {snapshot_cursor} of swarm {self.swarm_id} is incomplete")
+            self.state = json.loads(zlib.decompress(b"".join(found[key]["data"] for key in keys)))
+        self.cursor = snapshot_cursor
+
+    def _initial_state(self) -> SwarmState:
+        state: SwarmState = {collection: {} for collection in db.HISTORY_CATEGORIES}
+        try:
+            admin = db.read("admin", self.swarm_id, ["parent_swarm_id", "fork_cursor"])
+        except ValueError:
+            return state # Deleted swarms keep no admin document, their history starts empty
+        parent_swarm_id = admin.get("parent_swarm_id")
+        if parent_swarm_id is None:
+            return state
+
+        parent_state = SwarmHistory(parent_swarm_id).seek(admin.get("fork_cursor") or 0)
+        old_prefix, new_prefix = f"{parent_swarm_id}_", f"{self.swarm_id}_"
+        for collection, documents in parent_state.items():
+            state[collection] = {
+                new_prefix + key[len(old_prefix):]: rebase_ids(document, old_prefix, new_prefix)
+                for key, document in documents.items()
+            }
+        return state
+
+    def _replay(self, cursor: int) -> None:
+        index_cursors = set(self._snapshot_cursors())
+        while self.cursor < cursor:
+            # Stop at every snapshot boundary so the ones missing get written on the way
+            boundary = (self.cursor // SNAPSHOT_INTERVAL + 1) * SNAPSHOT_INTERVAL
+            limit = min(cursor, boundary, self.cursor + EVENT_BATCH_SIZE) - self.cursor
+            events = db.read_mutations(self.swarm_id, self.cursor, limit)
+            if not events:
+                raise ValueError(f"Events {self.cursor + 1} to {cursor} of swarm {self.swarm_id} are missing")
+            for event in events:
+                self._apply(event)
+            self.cursor = events[-1]["cursor"]
+            if self.cursor % SNAPSHOT_INTERVAL == 0 and self.cursor not in index_cursors:
+                self._save()
+                index_cursors.add(self.cursor)
+
+    def _apply(self, event: Dict[str, Any]) -> None:
+        documents = self.state.get(event["collection"])
+        if documents is None:
+            return
+        key = event["id"]
+        if event["type"] == "delete":
+            documents.pop(key, None)
+            return
+        if event["type"] == "create":
+            if "values" not in event:
+                return # Copies record no values
+            documents[key] = copy.deepcopy(event["values"])
+        else:
+            if "ops" not in event:
+                return # Recorded before events carried ops
+            document = documents.setdefault(key, {})
+            for op in event["ops"]:
+                _apply_op(document, op)
+        if documents[key].get(TOMBSTONE):
+            del documents[key]
+
+
+    """                     Snapshots                     """
+    @staticmethod
+    def _chunk_key(swarm_id: str, cursor: int, chunk: int) -> str:
+        return f"{swarm_id}_s{cursor}_{chunk}"
+
+    def _snapshot_cursors(self) -> List[int]:
+        index_key = f"{self.swarm_id}_index"
+        if db.exists(SNAPSHOT_CATEGORY, index_key):
+            self._index = db.read(SNAPSHOT_CATEGORY, index_key)
+        else:
+            self._index = {"snapshots": []}
+        return [cursor for cursor, _ in self._index["snapshots"]]
+
+    def _save(self) -> None:
+        data = zlib.compress(json.dumps(self.state, separators=(",", ":"), default=json_default).encode())
+        chunks = [data[i:i + SNAPSHOT_CHUNK_SIZE] for i in range(0, len(data), SNAPSHOT_CHUNK_SIZE)] or [b""]
+        first_key = self._chunk_key(self.swarm_id, self.cursor, 0)
+        # Whoever writes the first chunk owns the snapshot, so concurrent replays don't both write it
+        if not db.create_if_absent(SNAPSHOT_CATEGORY, first_key, {"data": chunks[0]}):
+            return
+        if len(chunks) > 1:
+            db.batch_create(SNAPSHOT_CATEGORY, {
+                self._chunk_key(self.swarm_id, self.cursor, chunk): {"data": chunks[chunk]}
+                for chunk in range(1, len(chunks))
+            })
+        db.create_if_absent(SNAPSHOT_CATEGORY, f"{self.swarm_id}_index", {"snapshots": []})
+        db.append_to_array(SNAPSHOT_CATEGORY, f"{self.swarm_id}_index", "snapshots", [self.cursor, len(chunks)])
+
+
+def _apply_op(document: Dict[str, Any], op: Dict[str, Any]) -> None:
+    """ Apply one change of an update event, following its path of keys and list indices. """
+    *path, leaf = op["path"]
+    target = document
+    for part in path:
+        target = target[part] if isinstance(target, list) else target.setdefault(part, {})
+    if op["op"] == "set":
+        target[leaf] = copy.deepcopy(op["value"])
+    elif op["op"] == "unset":
+        if isinstance(target, dict):
+            target.pop(leaf, None)
+    elif op["op"] == "inc":
+        target[leaf] = target.get(leaf, 0) + op["amount"]
+    elif op["op"] == "push":
+        target.setdefault(leaf, []).append(copy.deepcopy(op["value"]))
+    elif op["op"] == "pull":
+        target[leaf] = [item for item in target.get(leaf, []) if item != op["value"]]
+    elif op["op"] == "remove_at":
+        del target[leaf][op["index"]]
+    else:
+        raise ValueError(f"History op {op['op']} not recognized")
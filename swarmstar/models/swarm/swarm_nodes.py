@@ -2,12 +2,19 @@
 The swarm consists of nodes. Each node is given a message 
 and a preassigned action they must execute.
 """
-from typing import Any, Dict, List, Optional, ClassVar
+import time
+from typing import Any, Dict, List, Optional, ClassVar, Union
 from enum import Enum
 from pydantic import Field
 
-from swarmstar.models.base_node import BaseNode
+from swarmstar.models.base_node import BaseNode, NodeView
+from swarmstar.models.swarm.swarm_stats import SwarmStats
 from swarmstar.utils.misc.ids import get_available_id
+from swarmstar.utils.database import get_database
+
+db = get_database()
+
+CONFIRM_DIRECTIVE_COMPLETION_ACTION_ID = "specific/managerial/confirm_directive_completion"
 
 # Each termination policy has a unique handler in swarmstar/swarm_operations/termination_operations/main.py
 class TerminationPolicies(Enum):
@@ -20,7 +27,12 @@ class SwarmNode(BaseNode):
     collection: ClassVar[str] = "swarm_nodes"
     type: str    # Swarm nodes are classified by their action id
     message: str
+    children_ids: List[str] = []                # Always a list so children can be pushed onto it atomically
     alive: bool = True
+    alive_children_count: int = 0               # Kept up to date by the writes that spawn and kill children
+    confirm_completion_child_terminated: bool = False   # Whether a confirm_directive_completion child has terminated
+    terminated_at: Optional[float] = None       # When the node was killed
+    compacted: bool = False                     # Whether the node's transient fields were stripped by SwarmCompactor
     termination_policy: TerminationPolicies = TerminationPolicies.SIMPLE
     developer_logs: List[Any] = []              # Logs storing all messages sent to and received from an ai throughout the action's execution.
     report: Optional[str] = None                    # We should look at the node and see like, "Okay, thats what this node did." 
@@ -28,10 +40,63 @@ class SwarmNode(BaseNode):
     context: Optional[Dict[str, Any]] = {}          # This is where certain nodes can store extra context about themselves.
 
     @classmethod
-    def read(cls, node_id: str) -> 'SwarmNode':
-        swarm_node_dict = super().get_node_dict(node_id)
+    def read(cls, node_id: str, fields: Optional[List[str]] = None) -> Union['SwarmNode', NodeView]:
+        """ If fields are given, returns a NodeView of just those fields instead of a full node. """
+        swarm_node_dict = super().get_node_dict(node_id, fields)
+        if fields is not None:
+            return NodeView(swarm_node_dict)
         return cls(**swarm_node_dict)
 
+    @staticmethod
+    def kill_writes(node_ids: List[str], parent_id: Optional[str] = None, node_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        The atomic_write entries marking nodes dead with one bulk update and moving them
+        between the swarm's node counters.
+
+        node_ids is a node followed by any ancestors dying with it, and parent_id and node_type
+        belong to the last of them. If parent_id is given, the last node is counted out of
+        the parent's alive children. The others' parents die in the same write.
+
+        The update only matches nodes still alive, so if any of them was already killed the
+        whole write is dropped and no counter moves twice.
+        """
+        writes = [
+            {
+                "type": "update_many",
+                "category": SwarmNode.collection,
+                "keys": node_ids,
+                "filter": {"alive": True},
+                "updated_fields": {"alive": False, "terminated_at": time.time()}
+            },
+            SwarmStats.increment_write(
+                db.get_swarm_id(SwarmNode.collection, node_ids[0]),
+                {"alive_nodes": -len(node_ids), "dead_nodes": len(node_ids)}
+            )
+        ]
+        if parent_id is not None:
+            writes.append({
+                "type": "increment",
+                "category": SwarmNode.collection,
+                "key": parent_id,
+                "amounts": {"alive_children_count": -1}
+            })
+            if node_type == CONFIRM_DIRECTIVE_COMPLETION_ACTION_ID:
+                writes.append({
+                    "type": "update",
+                    "category": SwarmNode.collection,
+                    "key": parent_id,
+                    "updated_fields": {"confirm_completion_child_terminated": True}
+                })
+        return writes
+
+    @staticmethod
+    def kill(node_ids: Union[str, List[str]], parent_id: Optional[str] = None, node_type: Optional[str] = None) -> bool:
+        """
+        Kill a node, or a node and the ancestors dying with it. See kill_writes.
+        Returns False, killing none of them, if one was already dead.
+        """
+        return db.atomic_write(SwarmNode.kill_writes([node_ids] if isinstance(node_ids, str) else node_ids, parent_id, node_type))
+
     def log(self, log_dict: Dict[str, Any], index_key: List[int] = None) -> List[int]:
         """
         This function appends a log to the developer_logs list in a node or a nested list 
@@ -42,6 +107,7 @@ class SwarmNode(BaseNode):
             "role": (swarmstar, system, ai or user),
             "content": "..."
         }
+        A timestamp is added to it when it's logged.
         
         If you are not doing parallel logs, you can ignore the index_key parameter.
         Parallel logs are logs that were performed in parallel. For example, if within 
@@ -73,9 +139,14 @@ class SwarmNode(BaseNode):
 
         :return: The index_key of the log that was added.
         """
+        log_dict = {**log_dict, "timestamp": log_dict.get("timestamp", time.time())}
+        # Only developer_logs is written, from a fresh read, so a stale node can't undo the
+        # children and counters other operations wrote in the meantime
+        self.developer_logs = db.read(SwarmNode.collection, self.id, ["developer_logs"]).get("developer_logs") or []
         if index_key is None:
             self.developer_logs.append(log_dict)
-            return_index_key = [len(self.developer_logs) - 1]
+            db.append_to_array(SwarmNode.collection, self.id, "developer_logs", log_dict)
+            return [len(self.developer_logs) - 1]
         else:
             nested_list = self.developer_logs
             for i, index in enumerate(index_key):
@@ -96,5 +167,5 @@ class SwarmNode(BaseNode):
                         nested_list = nested_list[index]
                     else:
                         raise ValueError("Invalid index_key. Cannot traverse non-list elements.")
-        SwarmNode.replace(self.id, self)
+        SwarmNode.update(self.id, {"developer_logs": self.developer_logs})
         return return_index_key
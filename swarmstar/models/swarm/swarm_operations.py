@@ -7,15 +7,16 @@ Nodes can perform 1 of 5 "SwarmOperations":
     - UserCommunicationOperation
 """
 from __future__ import annotations
-from typing import Any, Dict, Literal, Optional, Union
-from pydantic import BaseModel, Field
-from pydantic import ValidationError
+from typing import Any, Dict, List, Literal, Optional, Union
+from typing_extensions import Annotated
+from pydantic import BaseModel, Field, TypeAdapter
 from abc import ABC, abstractmethod
 
+from swarmstar.models.swarm.swarm_stats import SwarmStats
 from swarmstar.utils.misc.ids import generate_uuid, get_available_id, copy_under_new_swarm_id
-from swarmstar.utils.database import MongoDBWrapper
+from swarmstar.utils.database import get_database
 
-db = MongoDBWrapper()
+db = get_database()
 
 class SwarmOperation(BaseModel, ABC):
     id: Optional[str] = Field(default_factory=lambda: get_available_id("swarm_operations"))
@@ -28,24 +29,59 @@ class SwarmOperation(BaseModel, ABC):
     ]
 
     @classmethod
-    def model_validate(cls,data: Union[Dict[str, Any], 'SwarmOperation'], **kwargs) -> 'SwarmOperation':
+    def model_validate(cls, data: Union[Dict[str, Any], 'SwarmOperation'], **kwargs) -> 'SwarmOperation':
+        """
+        Validating against the base class dispatches on operation_type to the right subclass.
+        Subclasses validate as usual.
+        """
         if isinstance(data, SwarmOperation):
             return data
-        elif isinstance(data, dict):
-            operation_type = data.get('operation_type')
-            operation_mapping = {
-                "blocking": BlockingOperation,
-                "user_communication": UserCommunicationOperation,
-                "spawn": SpawnOperation,
-                "terminate": TerminationOperation,
-                "action": ActionOperation
-            }
-            return operation_mapping[operation_type].model_validate(**data)
+        if cls is SwarmOperation:
+            return _swarm_operation_adapter.validate_python(data, **kwargs)
         return super().model_validate(data, **kwargs)
 
     @staticmethod
     def create(operation: SwarmOperation) -> None:
-        db.create("swarm_operations", operation.id, operation.model_dump())
+        db.atomic_write(SwarmOperation.create_writes([operation]))
+
+    @staticmethod
+    def create_writes(operations: List[SwarmOperation]) -> List[Dict[str, Any]]:
+        """ The atomic_write entries inserting operations and counting them as pending """
+        if not operations:
+            return []
+        writes = [{
+            "type": "create",
+            "category": "swarm_operations",
+            "key": operation.id,
+            "value": operation.model_dump()
+        } for operation in operations]
+        amounts: Dict[str, int] = {}
+        for operation in operations:
+            counter = SwarmStats.operation_counter(operation.operation_type, "pending")
+            amounts[counter] = amounts.get(counter, 0) + 1
+        writes.append(SwarmStats.increment_write(db.get_swarm_id("swarm_operations", operations[0].id), amounts))
+        return writes
+
+    @staticmethod
+    def start(operation: SwarmOperation) -> None:
+        """ Count the operation as running """
+        swarm_id = db.get_swarm_id("swarm_operations", operation.id)
+        db.atomic_write([SwarmStats.operation_transition_write(swarm_id, [operation.operation_type], "pending", "running")])
+
+    @staticmethod
+    def release(operation: SwarmOperation) -> None:
+        """ Count a running operation that failed as pending again, so it can be retried """
+        swarm_id = db.get_swarm_id("swarm_operations", operation.id)
+        db.atomic_write([SwarmStats.operation_transition_write(swarm_id, [operation.operation_type], "running", "pending")])
+
+    @staticmethod
+    def complete(operation: SwarmOperation, next_operations: List[SwarmOperation]) -> None:
+        """ Insert the operations that follow a running one and count it as done, in one write """
+        swarm_id = db.get_swarm_id("swarm_operations", operation.id)
+        db.atomic_write([
+            *SwarmOperation.create_writes(next_operations),
+            SwarmStats.operation_transition_write(swarm_id, [operation.operation_type], "running", "done")
+        ])
 
     @staticmethod
     def replace(operation: SwarmOperation) -> None:
@@ -56,27 +92,12 @@ class SwarmOperation(BaseModel, ABC):
         operation = db.read("swarm_operations", operation_id)
         if operation is None:
             raise ValueError(f"Operation with id {operation_id} not found")
-        operation_type = operation["operation_type"]
-    
-        operation_mapping = {
-            "blocking": BlockingOperation,
-            "user_communication": UserCommunicationOperation,
-            "spawn": SpawnOperation,
-            "terminate": TerminationOperation,
-            "action": ActionOperation
-        }
-        
-        if operation_type in operation_mapping:
-            try:
-                OperationClass = operation_mapping[operation_type]
-                return OperationClass.model_validate(operation)
-            except ValidationError as e:
-                print(f"Error validating operation {operation} of type {operation_type}")
-                raise e
-            except Exception as e:
-                raise e
-        else:
-            raise ValueError(f"Operation type {operation_type} not recognized")
+        return _swarm_operation_adapter.validate_python(operation)
+
+    @staticmethod
+    def decode_many(operations: List[Dict[str, Any]]) -> List[SwarmOperation]:
+        """ Validate a batch of raw operation documents in a single pass. """
+        return _swarm_operation_list_adapter.validate_python(operations)
 
     @staticmethod
     def delete(operation_id: str) -> None:
@@ -136,13 +157,15 @@ class ActionOperation(SwarmOperation):
 class TerminationOperation(SwarmOperation):
     operation_type: Literal["terminate"] = Field(default="terminate")
     terminator_id: str
+    terminator_ids: List[str] = [] # Every terminator, when terminations of the same node were coalesced
     node_id: str
     context: Optional[Dict[str, Any]] = None
 
     def get_field_updates_on_copy(self, new_swarm_id: str) -> Dict[str, Any]:
         return {
             "node_id": copy_under_new_swarm_id(self.node_id, new_swarm_id),
-            "terminator_id": copy_under_new_swarm_id(self.terminator_id, new_swarm_id)
+            "terminator_id": copy_under_new_swarm_id(self.terminator_id, new_swarm_id),
+            "terminator_ids": [copy_under_new_swarm_id(terminator_id, new_swarm_id) for terminator_id in self.terminator_ids]
         }
 
 class UserCommunicationOperation(SwarmOperation):
@@ -153,4 +176,20 @@ class UserCommunicationOperation(SwarmOperation):
     next_function_to_call: str
 
     def get_field_updates_on_copy(self, new_swarm_id: str) -> Dict[str, Any]:
-        return {"node_id": copy_under_new_swarm_id(self.node_id, new_swarm_id)}
\ No newline at end of file
+        return {"node_id": copy_under_new_swarm_id(self.node_id, new_swarm_id)}
+
+# Operations are decoded on every queue pop, so the discriminated union's
+# validators are built once here rather than dispatching by hand per call.
+AnySwarmOperation = Annotated[
+    Union[
+        BlockingOperation,
+        UserCommunicationOperation,
+        SpawnOperation,
+        TerminationOperation,
+        ActionOperation
+    ],
+    Field(discriminator="operation_type")
+]
+
+_swarm_operation_adapter = TypeAdapter(AnySwarmOperation)
+_swarm_operation_list_adapter = TypeAdapter(List[AnySwarmOperation])
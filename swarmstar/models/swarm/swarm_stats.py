@@ -0,0 +1,73 @@
+"""
+Swarm stats are counters kept on the swarm's admin document, under "stats":
+    - alive and dead nodes
+    - operations of each type that are pending, running or done
+    - LLM calls in flight
+
+They're updated with $inc in the same atomic write that makes the change they
+count, so reading them never needs a scan of swarm_nodes or swarm_operations.
+
+    SwarmStats.read(swarm_id).operations["spawn"]["pending"]
+"""
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Literal
+
+from pydantic import BaseModel
+
+from swarmstar.utils.database import get_database
+
+db = get_database()
+
+OperationStatus = Literal["pending", "running", "done"]
+
+class SwarmStats(BaseModel):
+    alive_nodes: int = 0
+    dead_nodes: int = 0
+    in_flight_llm_calls: int = 0
+    operations: Dict[str, Dict[str, int]] = {} # {operation_type: {status: count}}
+
+    @staticmethod
+    def read(swarm_id: str) -> 'SwarmStats':
+        return SwarmStats(**db.read("admin", swarm_id, ["stats"]).get("stats", {}))
+
+    def operation_count(self, operation_type: str, status: OperationStatus) -> int:
+        return self.operations.get(operation_type, {}).get(status, 0)
+
+    @staticmethod
+    def increment_write(swarm_id: str, amounts: Dict[str, int]) -> Dict:
+        """ An atomic_write entry adding amounts to the swarm's counters, like {"alive_nodes": 1} """
+        return {
+            "type": "increment",
+            "category": "admin",
+            "key": swarm_id,
+            "amounts": {f"stats.{counter}": amount for counter, amount in amounts.items()}
+        }
+
+    @staticmethod
+    def increment(swarm_id: str, amounts: Dict[str, int]) -> None:
+        db.atomic_write([SwarmStats.increment_write(swarm_id, amounts)])
+
+    @staticmethod
+    def operation_counter(operation_type: str, status: OperationStatus) -> str:
+        return f"operations.{operation_type}.{status}"
+
+    @staticmethod
+    def operation_transition_write(swarm_id: str, operation_types: List[str], old_status: OperationStatus, new_status: OperationStatus) -> Dict:
+        """ An atomic_write entry moving operations of the given types from one status to another """
+        amounts: Dict[str, int] = {}
+        for operation_type in operation_types:
+            old_counter = SwarmStats.operation_counter(operation_type, old_status)
+            new_counter = SwarmStats.operation_counter(operation_type, new_status)
+            amounts[old_counter] = amounts.get(old_counter, 0) - 1
+            amounts[new_counter] = amounts.get(new_counter, 0) + 1
+        return SwarmStats.increment_write(swarm_id, amounts)
+
+    @staticmethod
+    @contextmanager
+    def in_flight_llm_call(swarm_id: str) -> Iterator[None]:
+        """ Counts an LLM call as in flight for the duration of the block """
+        SwarmStats.increment(swarm_id, {"in_flight_llm_calls": 1})
+        try:
+            yield
+        finally:
+            SwarmStats.increment(swarm_id, {"in_flight_llm_calls": -1})
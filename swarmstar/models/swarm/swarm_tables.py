@@ -0,0 +1,284 @@
+"""
+Swarm tables flatten swarms into columnar files for offline analysis, with one
+row per node, per operation and per developer log entry. Exporting many swarms
+into the same files turns questions like fan-out or failure rates per action
+type into vectorized scans:
+    - nodes.parquet: swarm_id, node_id, parent_id, type, name, depth, child_count,
+      alive, termination_policy, terminated_at, log_count, compacted
+    - operations.parquet: swarm_id, operation_id, operation_type, node_id, parent_id,
+      action_id, blocking_type, function, terminator_id, queued, compacted
+    - logs.parquet: swarm_id, node_id, node_type, position, path, role, content,
+      content_length, timestamp, prompt_tokens, completion_tokens, latency
+
+Token counts and latency, in seconds, are only set on the logs of LLM responses.
+
+Ids, types and other columns with few distinct values are dictionary encoded.
+Rows are written a batch at a time, so memory stays bounded however many swarms
+are exported. Each batch has dictionaries of its own, so call unify_dictionaries()
+on a table read back before grouping on them.
+
+Pass file_format="arrow" for Arrow IPC streams, read with pyarrow.ipc.open_stream,
+instead of Parquet files.
+
+Tables need pyarrow, which is an optional dependency:
+    pip install swarmstar[analytics]
+"""
+from __future__ import annotations
+
+import os
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from swarmstar.models.swarm.swarm_nodes import SwarmNode
+from swarmstar.utils.database import get_database
+
+db = get_database()
+
+TABLE_BATCH_SIZE = 10000
+NODE_FIELDS = [
+    "children_ids", "parent_id", "type", "name", "alive",
+    "termination_policy", "terminated_at", "compacted", "developer_logs",
+]
+OPERATION_FIELDS = [
+    "operation_type", "node_id", "parent_id", "action_id", "blocking_type",
+    "function_to_call", "next_function_to_call", "terminator_id", "compacted",
+]
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("Swarm tables need pyarrow. Install it with `pip install swarmstar[analytics]`.")
+
+
+def _schemas() -> Dict[str, pa.Schema]:
+    encoded = pa.dictionary(pa.int32(), pa.string())
+    return {
+        "nodes": pa.schema([
+            ("swarm_id", encoded),
+            ("node_id", encoded),
+            ("parent_id", encoded),
+            ("type", encoded),
+            ("name", pa.string()),
+            ("depth", pa.int32()),
+            ("child_count", pa.int32()),
+            ("alive", pa.bool_()),
+            ("termination_policy", encoded),
+            ("terminated_at", pa.float64()),
+            ("log_count", pa.int32()),
+            ("compacted", pa.bool_()),
+        ]),
+        "operations": pa.schema([
+            ("swarm_id", encoded),
+            ("operation_id", encoded),
+            ("operation_type", encoded),
+            ("node_id", encoded),
+            ("parent_id", encoded),
+            ("action_id", encoded),
+            ("blocking_type", encoded),
+            ("function", encoded),
+            ("terminator_id", encoded),
+            ("queued", pa.bool_()),
+            ("compacted", pa.bool_()),
+        ]),
+        "logs": pa.schema([
+            ("swarm_id", encoded),
+            ("node_id", encoded),
+            ("node_type", encoded),
+            ("position", pa.int32()),
+            ("path", pa.string()),
+            ("role", encoded),
+            ("content", pa.large_string()),
+            ("content_length", pa.int32()),
+            ("timestamp", pa.float64()),
+            ("prompt_tokens", pa.int32()),
+            ("completion_tokens", pa.int32()),
+            ("latency", pa.float64()),
+        ]),
+    }
+
+
+class SwarmTables:
+    def __init__(
+        self,
+        directory: str,
+        file_format: Literal["parquet", "arrow"] = "parquet",
+        batch_size: int = TABLE_BATCH_SIZE
+    ):
+        _require_pyarrow()
+        if file_format not in ("parquet", "arrow"):
+            raise ValueError(f"File format {file_format} is not supported, use parquet or arrow")
+        self.directory = directory
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.schemas = _schemas()
+        self._rows: Dict[str, Dict[str, List[Any]]] = {}
+        self._writers: Dict[str, Any] = {}
+
+    @staticmethod
+    def export(
+        swarm_ids: List[str],
+        directory: str,
+        file_format: Literal["parquet", "arrow"] = "parquet",
+        batch_size: int = TABLE_BATCH_SIZE
+    ) -> Dict[str, str]:
+        """ Write the swarms' nodes, operations and logs to one file per table. Returns their paths. """
+        with SwarmTables(directory, file_format, batch_size) as tables:
+            for swarm_id in swarm_ids:
+                tables.add_swarm(swarm_id)
+            return tables.paths()
+
+    def __enter__(self) -> 'SwarmTables':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def paths(self) -> Dict[str, str]:
+        extension = "parquet" if self.file_format == "parquet" else "arrows"
+        return {table: os.path.join(self.directory, f"{table}.{extension}") for table in self.schemas}
+
+    def add_swarm(self, swarm_id: str) -> None:
+        admin = db.read("admin", swarm_id, ["operation_count", "queued_operation_ids"])
+        for depth, node in self._walk_nodes(swarm_id):
+            self._add_node(swarm_id, depth, node)
+        queued_ids = set(admin.get("queued_operation_ids") or [])
+        operation_count = admin.get("operation_count", 0)
+        for start in range(0, operation_count, self.batch_size):
+            keys = [f"{swarm_id}_o{i}" for i in range(start, min(start + self.batch_size, operation_count))]
+            for operation_id, operation in db.batch_read("swarm_operations", keys, OPERATION_FIELDS).items():
+                self._add_operation(swarm_id, operation_id, operation, operation_id in queued_ids)
+
+    def close(self) -> None:
+        """ Write the rows left and close the files. Tables without any rows are still written. """
+        for table in self.schemas:
+            self._flush(table, force=True)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+
+    """                     Rows                     """
+    def _walk_nodes(self, swarm_id: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """ Nodes level by level, read in batches, with their depth. """
+        level_ids = [f"{swarm_id}_n0"]
+        if not db.exists(SwarmNode.collection, level_ids[0]):
+            return
+        seen = set(level_ids)
+        depth = 0
+        while level_ids:
+            next_level_ids = []
+            for start in range(0, len(level_ids), self.batch_size):
+                batch_ids = level_ids[start:start + self.batch_size]
+                node_dicts = SwarmNode.get_node_dicts(batch_ids, NODE_FIELDS)
+                for node_id in batch_ids:
+                    node = node_dicts[node_id]
+                    for child_id in node.get("children_ids") or []:
+                        if child_id not in seen:
+                            seen.add(child_id)
+                            next_level_ids.append(child_id)
+                    yield depth, node
+            level_ids = next_level_ids
+            depth += 1
+
+    def _add_node(self, swarm_id: str, depth: int, node: Dict[str, Any]) -> None:
+        logs = list(_flatten_logs(node.get("developer_logs") or []))
+        self._add_row("nodes", {
+            "swarm_id": swarm_id,
+            "node_id": node["id"],
+            "parent_id": node.get("parent_id"),
+            "type": node.get("type"),
+            "name": node.get("name"),
+            "depth": depth,
+            "child_count": len(node.get("children_ids") or []),
+            "alive": node.get("alive", True),
+            "termination_policy": _plain(node.get("termination_policy")),
+            "terminated_at": node.get("terminated_at"),
+            "log_count": len(logs),
+            "compacted": node.get("compacted", False),
+        })
+        for position, (path, entry) in enumerate(logs):
+            content = entry.get("content") if isinstance(entry, dict) else entry
+            entry = entry if isinstance(entry, dict) else {}
+            content = None if content is None else content if isinstance(content, str) else str(content)
+            self._add_row("logs", {
+                "swarm_id": swarm_id,
+                "node_id": node["id"],
+                "node_type": node.get("type"),
+                "position": position,
+                "path": ".".join(map(str, path)),
+                "role": entry.get("role"),
+                "content": content,
+                "content_length": None if content is None else len(content),
+                "timestamp": entry.get("timestamp"),
+                "prompt_tokens": entry.get("prompt_tokens"),
+                "completion_tokens": entry.get("completion_tokens"),
+                "latency": entry.get("latency"),
+            })
+
+    def _add_operation(self, swarm_id: str, operation_id: str, operation: Dict[str, Any], queued: bool) -> None:
+        self._add_row("operations", {
+            "swarm_id": swarm_id,
+            "operation_id": operation_id,
+            "operation_type": operation.get("operation_type"),
+            "node_id": operation.get("node_id"),
+            "parent_id": operation.get("parent_id"),
+            "action_id": operation.get("action_id"),
+            "blocking_type": operation.get("blocking_type"),
+            "function": operation.get("function_to_call") or operation.get("next_function_to_call"),
+            "terminator_id": operation.get("terminator_id"),
+            "queued": queued,
+            "compacted": operation.get("compacted", False),
+        })
+
+
+    """                     Writing                     """
+    def _add_row(self, table: str, row: Dict[str, Any]) -> None:
+        rows = self._rows.setdefault(table, {name: [] for name in self.schemas[table].names})
+        for name, column in rows.items():
+            column.append(row[name])
+        self._flush(table)
+
+    def _flush(self, table: str, force: bool = False) -> None:
+        schema = self.schemas[table]
+        rows = self._rows.get(table) or {name: [] for name in schema.names}
+        row_count = len(rows[schema.names[0]])
+        if row_count < self.batch_size and not (force and (row_count or table not in self._writers)):
+            return
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(rows[field.name], type=field.type) for field in schema],
+            schema=schema
+        )
+        self._writer(table).write_batch(batch)
+        self._rows[table] = {name: [] for name in schema.names}
+
+    def _writer(self, table: str) -> Any:
+        if table not in self._writers:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.paths()[table]
+            schema = self.schemas[table]
+            if self.file_format == "parquet":
+                self._writers[table] = pq.ParquetWriter(path, schema)
+            else:
+                # The IPC file format allows one dictionary per column, streams replace them per batch
+                self._writers[table] = pa.ipc.new_stream(path, schema)
+        return self._writers[table]
+
+
+def _flatten_logs(logs: List[Any], path: Tuple[int, ...] = ()) -> Iterator[Tuple[Tuple[int, ...], Any]]:
+    """ Developer logs nest parallel conversations in lists. Yields each entry with its index path. """
+    for index, entry in enumerate(logs):
+        if isinstance(entry, list):
+            yield from _flatten_logs(entry, (*path, index))
+        else:
+            yield (*path, index), entry
+
+
+def _plain(value: Optional[Any]) -> Optional[Any]:
+    return value.value if isinstance(value, Enum) else value
@@ -1,9 +1,41 @@
 """
 The action metadata tree allows the swarm to find actions to take.
 """
-from typing import ClassVar
+from typing import Any, ClassVar, Dict, List, Optional, Type
 
 from swarmstar.models.base_tree import BaseTree
+from swarmstar.models.swarm.swarm_nodes import SwarmNode
+from swarmstar.models.swarm.swarm_tree_snapshot import SwarmTreeSnapshot
+from swarmstar.utils.database import get_database
+
+db = get_database()
 
 class SwarmTree(BaseTree):
     collection: ClassVar[str] = "swarm_nodes"
+    node_class: ClassVar[Type[SwarmNode]] = SwarmNode
+
+    @staticmethod
+    def snapshot(swarm_id: str) -> SwarmTreeSnapshot:
+        """ Compact array backed copy of the swarm's tree. Needs numpy. """
+        return SwarmTreeSnapshot.build(swarm_id)
+
+    @classmethod
+    def ancestors(cls, node_id: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        The node's ancestors, nearest first, in one query. Each carries its distance
+        from the node in "depth". With fields, only those fields are returned.
+        """
+        return db.ancestors(cls.collection, node_id, fields)
+
+    @classmethod
+    def descendants(
+        cls,
+        node_id: str,
+        max_depth: Optional[int] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        The node's descendants, level by level, down to max_depth levels below it,
+        in one query. Each carries its distance from the node in "depth".
+        """
+        return db.descendants(cls.collection, node_id, max_depth, fields)
@@ -0,0 +1,232 @@
+"""
+A swarm tree snapshot is a compact, array backed copy of a swarm's tree for
+analysis and UI rendering of large swarms.
+
+Nodes are numbered in breadth first order, so every parent comes before its
+children. Each node is one entry in these arrays:
+    - parent: index of the parent node, -1 for the root
+    - depth: distance from the root
+    - alive: whether the node is alive
+    - type_code: index into the interned table of action ids
+Node ids are interned in a table of their own.
+
+Snapshots are saved to a single file that's memory-mapped on load, so opening a
+snapshot of a huge swarm doesn't read it into memory.
+
+Layout:
+    magic, format version, header length (little endian)
+    json header: node count, string tables and the offset of each array
+    arrays, each aligned to 64 bytes
+
+Snapshots need numpy, which is an optional dependency:
+    pip install swarmstar[snapshot]
+"""
+from __future__ import annotations
+
+import json
+import struct
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from swarmstar.models.swarm.swarm_nodes import SwarmNode
+
+MAGIC = b"SWTREE\x00\x00"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct("<8sII")
+ARRAY_DTYPES = {
+    "parent": "<i4",
+    "depth": "<i4",
+    "alive": "|b1",
+    "type_code": "<i4",
+}
+SNAPSHOT_FIELDS = ["children_ids", "alive", "type"]
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("Swarm tree snapshots need numpy. Install it with `pip install swarmstar[snapshot]`.")
+
+
+class SwarmTreeSnapshot:
+    def __init__(
+        self,
+        node_ids: List[str],
+        types: List[str],
+        parent: np.ndarray,
+        depth: np.ndarray,
+        alive: np.ndarray,
+        type_code: np.ndarray
+    ):
+        _require_numpy()
+        self.node_ids = node_ids
+        self.types = types
+        self.parent = parent
+        self.depth = depth
+        self.alive = alive
+        self.type_code = type_code
+        self._index: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    @staticmethod
+    def build(swarm_id: str) -> 'SwarmTreeSnapshot':
+        """ Read the swarm's tree one level at a time, projecting only what the snapshot holds. """
+        _require_numpy()
+        node_ids: List[str] = []
+        type_codes: Dict[str, int] = {}
+        parent: List[int] = []
+        depth: List[int] = []
+        alive: List[bool] = []
+        type_code: List[int] = []
+
+        level = [(f"{swarm_id}_n0", -1)]
+        seen = {level[0][0]}
+        current_depth = 0
+        while level:
+            node_dicts = SwarmNode.get_node_dicts([node_id for node_id, _ in level], SNAPSHOT_FIELDS)
+            next_level = []
+            for node_id, parent_index in level:
+                node = node_dicts[node_id]
+                index = len(node_ids)
+                node_ids.append(node_id)
+                parent.append(parent_index)
+                depth.append(current_depth)
+                alive.append(bool(node.get("alive", True)))
+                type_code.append(type_codes.setdefault(node.get("type"), len(type_codes)))
+                for child_id in node.get("children_ids") or []:
+                    if child_id not in seen:
+                        seen.add(child_id)
+                        next_level.append((child_id, index))
+            level = next_level
+            current_depth += 1
+
+        return SwarmTreeSnapshot(
+            node_ids=node_ids,
+            types=list(type_codes),
+            parent=np.array(parent, dtype=ARRAY_DTYPES["parent"]),
+            depth=np.array(depth, dtype=ARRAY_DTYPES["depth"]),
+            alive=np.array(alive, dtype=ARRAY_DTYPES["alive"]),
+            type_code=np.array(type_code, dtype=ARRAY_DTYPES["type_code"])
+        )
+
+    def save(self, path: str) -> None:
+        arrays = {name: getattr(self, name) for name in ARRAY_DTYPES}
+        offsets: Dict[str, int] = {}
+
+        def header_bytes() -> bytes:
+            return json.dumps({
+                "node_count": len(self),
+                "node_ids": self.node_ids,
+                "types": self.types,
+                "offsets": offsets,
+            }).encode()
+
+        # Offsets depend on the header length, which depends on the offsets,
+        # so reserve enough room for the largest offsets first
+        offsets = {name: 10 ** 18 for name in arrays}
+        data_start = _align(_PREAMBLE.size + len(header_bytes()))
+        position = data_start
+        for name, array in arrays.items():
+            offsets[name] = position
+            position = _align(position + array.nbytes)
+        header = header_bytes()
+
+        with open(path, "wb") as file:
+            file.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            file.write(header)
+            for name, array in arrays.items():
+                file.write(b"\x00" * (offsets[name] - file.tell()))
+                file.write(np.ascontiguousarray(array, dtype=ARRAY_DTYPES[name]).tobytes())
+
+    @staticmethod
+    def load(path: str) -> 'SwarmTreeSnapshot':
+        """ Open a saved snapshot. The arrays are read-only memory maps of the file. """
+        _require_numpy()
+        with open(path, "rb") as file:
+            magic, version, header_length = _PREAMBLE.unpack(file.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a swarm tree snapshot")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported swarm tree snapshot version {version}, expected {FORMAT_VERSION}")
+            header = json.loads(file.read(header_length))
+
+        node_count = header["node_count"]
+        arrays = {
+            name: np.memmap(path, dtype=dtype, mode="r", offset=header["offsets"][name], shape=(node_count,))
+            if node_count else np.empty(0, dtype=dtype)
+            for name, dtype in ARRAY_DTYPES.items()
+        }
+        return SwarmTreeSnapshot(node_ids=header["node_ids"], types=header["types"], **arrays)
+
+
+    """                     Lookups                     """
+    def index_of(self, node_id: str) -> int:
+        if self._index is None:
+            self._index = {node_id: index for index, node_id in enumerate(self.node_ids)}
+        try:
+            return self._index[node_id]
+        except KeyError:
+            raise ValueError(f"Node {node_id} is not in this snapshot")
+
+    def ids_at(self, indices: np.ndarray) -> List[str]:
+        return [self.node_ids[index] for index in indices]
+
+    def type_of(self, node_id: str) -> str:
+        return self.types[self.type_code[self.index_of(node_id)]]
+
+
+    """                     Tree wide queries                     """
+    def child_counts(self) -> np.ndarray:
+        return np.bincount(self.parent[self.parent >= 0], minlength=len(self))
+
+    def subtree_sizes(self) -> np.ndarray:
+        """ Number of nodes in each node's subtree, itself included. """
+        sizes = np.ones(len(self), dtype=np.int64)
+        # Fold each level into its parents, deepest first
+        for level in range(int(self.depth.max(initial=0)), 0, -1):
+            at_level = np.flatnonzero(self.depth == level)
+            np.add.at(sizes, self.parent[at_level], sizes[at_level])
+        return sizes
+
+    def depth_histogram(self) -> np.ndarray:
+        """ Number of nodes at each depth. """
+        return np.bincount(self.depth, minlength=1 if len(self) else 0)
+
+    def type_histogram(self) -> Dict[str, int]:
+        counts = np.bincount(self.type_code, minlength=len(self.types))
+        return {node_type: int(count) for node_type, count in zip(self.types, counts)}
+
+    def leaves(self) -> np.ndarray:
+        return np.flatnonzero(self.child_counts() == 0)
+
+    def alive_leaves(self) -> np.ndarray:
+        return np.flatnonzero((self.child_counts() == 0) & self.alive)
+
+    def subtree(self, node_id: str) -> np.ndarray:
+        """ Indices of every node in the subtree under node_id, itself included. """
+        inside = np.zeros(len(self), dtype=bool)
+        inside[self.index_of(node_id)] = True
+        # Parents come before their children, so one pass down the levels marks the subtree
+        for level in range(int(self.depth[self.index_of(node_id)]) + 1, int(self.depth.max(initial=0)) + 1):
+            at_level = np.flatnonzero(self.depth == level)
+            inside[at_level] = inside[self.parent[at_level]]
+        return np.flatnonzero(inside)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "nodes": len(self),
+            "alive": int(self.alive.sum()),
+            "max_depth": int(self.depth.max(initial=0)),
+            "types": self.type_histogram(),
+        }
+
+
+def _align(position: int) -> int:
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
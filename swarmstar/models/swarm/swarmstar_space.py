@@ -5,7 +5,7 @@ Swarmstar space describes the entirety of what makes up a swarm:
     - Memory tree
     - Action tree
 The SwarmstarSpace class is a model that provides a high level interface to instantiate,
-clone and delete swarmstar spaces.
+clone, delete, export and import swarmstar spaces.
 
 Every object in the swarmstar space follows a common format for their ids
     {swarm_id}_{x}{y}
@@ -17,18 +17,34 @@ where x is a marker for the type of object:
 and y is simply the number, taken in order of creation
 
 This id convention makes it easier to manage everything
+
+Forks are copy-on-write: a fork records its parent swarm and the parent's change feed
+cursor at the time of the fork, and reads documents it hasn't written from the parent.
+See swarmstar/utils/database/forks.py
 """
+import gzip
+import json
 from pydantic import BaseModel
-from typing import List
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 from swarmstar.models.metadata.memory_metadata_tree import MemoryMetadataTree
 from swarmstar.models.metadata.action_metadata_tree import ActionMetadataTree
 from swarmstar.models.swarm.swarm_tree import SwarmTree
 from swarmstar.models.swarm.swarm_operations import SwarmOperation
+from swarmstar.models.swarm.swarm_stats import SwarmStats
+from swarmstar.models.swarm.swarm_compactor import ARCHIVE_CATEGORY, COMPACTION_CATEGORY
+from swarmstar.models.swarm.swarm_history import SwarmHistory
+
+from swarmstar.utils.database import get_database, get_internal_metadata_snapshot
+from swarmstar.utils.database.forks import rebase_ids
+from swarmstar.utils.database.node_resolution import node_resolution_cache
+from swarmstar.utils.misc.serialization import json_default
 
-from swarmstar.utils.database import MongoDBWrapper
+db = get_database()
 
-db = MongoDBWrapper()
+EXPORT_FORMAT = "swarmstar_space"
+EXPORT_VERSION = 1
+EXPORT_BATCH_SIZE = 1000
 
 class SwarmstarSpace(BaseModel):
     node_count: int # The number of nodes in the swarmstar space
@@ -36,6 +52,10 @@ class SwarmstarSpace(BaseModel):
     memory_count: int # The number of external memories in the swarmstar space
     action_count: int # The number of external actions in the swarmstar space
     queued_operation_ids: List[str] = [] # Ids of operations that have not yet been executed
+    parent_swarm_id: Optional[str] = None # The swarm this one was forked from
+    fork_cursor: Optional[int] = None # The parent's change feed cursor at the time of the fork
+    fork_ids: List[str] = [] # Swarms forked from this one. While there are any, this swarm is read-only
+    stats: SwarmStats = SwarmStats() # Counters kept up to date by the writes that change them
 
     @staticmethod
     def read(swarm_id: str) -> 'SwarmstarSpace':
@@ -53,9 +73,7 @@ class SwarmstarSpace(BaseModel):
             "action_count": 0,
         }
 
-        MemoryMetadataTree.instantiate(swarm_id)
-        ActionMetadataTree.instantiate(swarm_id)
-
+        # Portal nodes are copied into the swarm when something is first attached to them
         db.create("admin", swarm_id, swarmstar_space)
 
     @staticmethod
@@ -73,19 +91,60 @@ class SwarmstarSpace(BaseModel):
 
         batch_copy_payload = [[], []] # [old_ids, new_ids]
         batch_update_payload = {} #{old_operation_id: {updated_fields}}
-        for i in range(old_swarmstar_space.operation_count):
-            old_op_id = f"{old_swarm_id}_o{i}"
-            operation = SwarmOperation.read(old_op_id)
+        old_op_ids = [f"{old_swarm_id}_o{i}" for i in range(old_swarmstar_space.operation_count)]
+        operations = SwarmOperation.decode_many(list(db.batch_read("swarm_operations", old_op_ids).values()))
+        for operation in operations:
+            old_op_id = operation.id
+            new_op_id = f"{new_swarm_id}_{old_op_id.split('_', 1)[1]}"
             updated_fields = operation.get_field_updates_on_copy(new_swarm_id)
             batch_copy_payload[0].append(old_op_id)
-            batch_copy_payload[1].append(f"{new_swarm_id}_o{i}")
-            batch_update_payload[f"{new_swarm_id}_o{i}"] = updated_fields
+            batch_copy_payload[1].append(new_op_id)
+            batch_update_payload[new_op_id] = updated_fields
         db.batch_copy("swarm_operations", batch_copy_payload[0], batch_copy_payload[1])
         db.batch_update("swarm_operations", batch_update_payload)
 
-        old_swarmstar_space.queued_operation_ids = [f"{new_swarm_id}_o{operation_id.split('_o')[1]}" \
-            for operation_id in old_swarmstar_space.queued_operation_ids]
-        db.create("admin", new_swarm_id, old_swarmstar_space)
+        # The clone stands on its own: no parent, no forks, and nothing of it running or in flight yet
+        stats = old_swarmstar_space.stats.model_copy(deep=True)
+        stats.in_flight_llm_calls = 0
+        for counts in stats.operations.values():
+            counts["pending"] = counts.get("pending", 0) + counts.pop("running", 0)
+        new_swarmstar_space = old_swarmstar_space.model_copy(update={
+            "queued_operation_ids": [f"{new_swarm_id}_o{operation_id.split('_o')[1]}" \
+                for operation_id in old_swarmstar_space.queued_operation_ids],
+            "parent_swarm_id": None,
+            "fork_cursor": None,
+            "fork_ids": [],
+            "stats": stats
+        })
+        db.create("admin", new_swarm_id, new_swarmstar_space.model_dump())
+
+    @staticmethod
+    def fork_swarmstar_space(parent_swarm_id: str, new_swarm_id: str):
+        """
+        Fork a swarmstar space without copying it.
+
+        Only the new admin document is written. The fork reads the parent's documents
+        until it writes to them, and the parent becomes read-only while it has forks.
+        Fork a swarm only while nothing is executing it.
+        """
+        if not db.exists("admin", parent_swarm_id):
+            raise ValueError(f"Swarmstar space with id {parent_swarm_id} does not exist")
+        if db.exists("admin", new_swarm_id):
+            raise ValueError(f"Swarmstar space with id {new_swarm_id} already exists")
+
+        parent_swarmstar_space = SwarmstarSpace.read(parent_swarm_id)
+        fork = parent_swarmstar_space.model_copy(update={
+            "queued_operation_ids": [f"{new_swarm_id}_{operation_id.split('_', 1)[1]}" \
+                for operation_id in parent_swarmstar_space.queued_operation_ids],
+            "parent_swarm_id": parent_swarm_id,
+            "fork_cursor": db.mutation_cursor(parent_swarm_id),
+            "fork_ids": []
+        })
+
+        db.atomic_write([
+            {"type": "create", "category": "admin", "key": new_swarm_id, "value": fork.model_dump()},
+            {"type": "append_to_array", "category": "admin", "key": parent_swarm_id, "field": "fork_ids", "value": new_swarm_id}
+        ])
 
     @staticmethod
     def delete_swarmstar_space(swarm_id: str):
@@ -93,11 +152,160 @@ class SwarmstarSpace(BaseModel):
             raise ValueError(f"Swarmstar space with id {swarm_id} does not exist")
 
         swarmstar_space = SwarmstarSpace.read(swarm_id)
+        if swarmstar_space.fork_ids:
+            raise ValueError(f"Swarmstar space {swarm_id} has forks {swarmstar_space.fork_ids}. Delete them first.")
         db.delete("admin", swarm_id)
-        
-        if swarmstar_space.node_count > 0: SwarmTree.delete(swarm_id)
-        if swarmstar_space.action_count > 0: ActionMetadataTree.delete(swarm_id)
-        if swarmstar_space.memory_count > 0: MemoryMetadataTree.delete(swarm_id)
-        
-        for i in range(swarmstar_space.operation_count):
-            SwarmOperation.delete(f"{swarm_id}_o{i}")
+
+        if swarmstar_space.parent_swarm_id is not None:
+            SwarmstarSpace._delete_fork_documents(swarm_id, swarmstar_space)
+            db.remove_value_from_array("admin", swarmstar_space.parent_swarm_id, "fork_ids", swarm_id)
+        else:
+            if swarmstar_space.node_count > 0: SwarmTree.delete(swarm_id)
+            if swarmstar_space.action_count > 0: ActionMetadataTree.delete(swarm_id)
+            if swarmstar_space.memory_count > 0: MemoryMetadataTree.delete(swarm_id)
+
+            for i in range(swarmstar_space.operation_count):
+                SwarmOperation.delete(f"{swarm_id}_o{i}")
+
+            archived_ids = list(db.batch_read(ARCHIVE_CATEGORY, [f"{swarm_id}_n{i}" for i in range(swarmstar_space.node_count)], []))
+            if archived_ids:
+                db.batch_delete(ARCHIVE_CATEGORY, archived_ids)
+            if db.exists(COMPACTION_CATEGORY, swarm_id):
+                db.delete(COMPACTION_CATEGORY, swarm_id)
+
+        db.clear_mutations(swarm_id)
+        SwarmHistory.clear(swarm_id)
+        node_resolution_cache.clear(swarm_id)
+
+    @staticmethod
+    def _delete_fork_documents(swarm_id: str, swarmstar_space: 'SwarmstarSpace'):
+        """
+        A fork owns only the documents it wrote, which all live under its own ids.
+        With the admin document gone they're no longer resolved against the parent,
+        so deleting whichever ids exist removes exactly the fork's copies and tombstones.
+        """
+        snapshot = get_internal_metadata_snapshot()
+        candidate_ids = {
+            "swarm_nodes": [f"{swarm_id}_n{i}" for i in range(swarmstar_space.node_count)],
+            ARCHIVE_CATEGORY: [f"{swarm_id}_n{i}" for i in range(swarmstar_space.node_count)],
+            "swarm_operations": [f"{swarm_id}_o{i}" for i in range(swarmstar_space.operation_count)],
+            "action_metadata": [f"{swarm_id}_a{i}" for i in range(swarmstar_space.action_count)] + \
+                [f"{swarm_id}_{node_id}" for node_id in snapshot.keys("action_metadata")],
+            "memory_metadata": [f"{swarm_id}_m{i}" for i in range(swarmstar_space.memory_count)] + \
+                [f"{swarm_id}_{node_id}" for node_id in snapshot.keys("memory_metadata")],
+        }
+        for collection, ids in candidate_ids.items():
+            existing_ids = list(db.batch_read(collection, ids, [])) if ids else []
+            if existing_ids:
+                db.batch_delete(collection, existing_ids)
+
+    @staticmethod
+    def subscribe(swarm_id: str, since: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Follow every change made to the swarmstar space as it happens.
+
+        Yields compact mutation events (collection, id, changed fields, version, timestamp)
+        after the since cursor. Consumers apply these deltas instead of re-reading documents,
+        and resume from the cursor of the last event they consumed. The admin document's
+        counters and stats aren't followed, read them with SwarmstarSpace.read.
+        """
+        return db.subscribe(swarm_id, since)
+
+    @staticmethod
+    def export(swarm_id: str, path: str) -> None:
+        """
+        Write the swarmstar space to a gzipped JSON lines file: a header line, the admin
+        document, then one line per node, operation, archive and external metadata document.
+        Documents are read and written a batch at a time, so memory stays bounded.
+        A fork is exported with everything it reads from its ancestors.
+        """
+        swarmstar_space = SwarmstarSpace.read(swarm_id)
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            def write_line(line: Dict[str, Any]) -> None:
+                file.write(json.dumps(line, separators=(",", ":"), default=json_default) + "\n")
+
+            write_line({"format": EXPORT_FORMAT, "version": EXPORT_VERSION, "swarm_id": swarm_id})
+            write_line({"collection": "admin", "id": swarm_id, "document": swarmstar_space.model_dump()})
+            for collection, ids in SwarmstarSpace._export_ids(swarm_id, swarmstar_space):
+                for start in range(0, len(ids), EXPORT_BATCH_SIZE):
+                    for key, document in db.batch_read(collection, ids[start:start + EXPORT_BATCH_SIZE]).items():
+                        document.pop("id", None)
+                        for field in db.BOOKKEEPING_FIELDS:
+                            document.pop(field, None)
+                        write_line({"collection": collection, "id": key, "document": document})
+
+    @staticmethod
+    def import_(path: str, swarm_id: Optional[str] = None) -> str:
+        """
+        Create a swarmstar space from a file written by export, under swarm_id if given.
+        Documents are inserted a batch at a time and the admin document last, so the swarm
+        only shows up once it's complete. Imported swarms stand on their own, without forks
+        or a parent. Returns the swarm id.
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            lines = (json.loads(line) for line in file)
+            header = next(lines, {})
+            if header.get("format") != EXPORT_FORMAT:
+                raise ValueError(f"{path} is not a swarmstar space export")
+            if header.get("version") != EXPORT_VERSION:
+                raise ValueError(f"Unsupported swarmstar space export version {header.get('version')}, expected {EXPORT_VERSION}")
+            admin = next(lines, {})
+            if admin.get("collection") != "admin":
+                raise ValueError(f"{path} is missing the admin document")
+
+            old_swarm_id = header["swarm_id"]
+            swarm_id = swarm_id or old_swarm_id
+            if db.exists("admin", swarm_id):
+                raise ValueError(f"Swarmstar space with id {swarm_id} already exists")
+
+            old_prefix, new_prefix = f"{old_swarm_id}_", f"{swarm_id}_"
+            batches: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            created: Dict[str, List[str]] = {}
+            try:
+                for line in lines:
+                    batch = batches.setdefault(line["collection"], {})
+                    key = new_prefix + line["id"][len(old_prefix):]
+                    batch[key] = rebase_ids(line["document"], old_prefix, new_prefix)
+                    if len(batch) >= EXPORT_BATCH_SIZE:
+                        SwarmstarSpace._import_batch(line["collection"], batch, created)
+                        batches[line["collection"]] = {}
+                for collection, batch in batches.items():
+                    if batch:
+                        SwarmstarSpace._import_batch(collection, batch, created)
+            except Exception:
+                # Without the admin document nothing would ever delete these, and a retry would collide with them
+                for collection, keys in created.items():
+                    existing_keys = list(db.batch_read(collection, keys, []))
+                    if existing_keys:
+                        db.batch_delete(collection, existing_keys)
+                raise
+
+        swarmstar_space = SwarmstarSpace(**rebase_ids(admin["document"], old_prefix, new_prefix)).model_copy(update={
+            "parent_swarm_id": None,
+            "fork_cursor": None,
+            "fork_ids": []
+        })
+        db.create("admin", swarm_id, swarmstar_space.model_dump())
+        return swarm_id
+
+    @staticmethod
+    def _import_batch(collection: str, batch: Dict[str, Dict[str, Any]], created: Dict[str, List[str]]) -> None:
+        """ Insert a batch of an import, noting its keys first so a failed import can remove them. """
+        existing_keys = list(db.batch_read(collection, list(batch), []))
+        if existing_keys:
+            raise ValueError(f"Documents {existing_keys[:10]} already exist in {collection}")
+        created.setdefault(collection, []).extend(batch)
+        db.batch_create(collection, batch)
+
+    @staticmethod
+    def _export_ids(swarm_id: str, swarmstar_space: 'SwarmstarSpace') -> Iterator[Tuple[str, List[str]]]:
+        """ The ids the swarm could have in each collection. Missing ones are skipped by the batch reads. """
+        snapshot = get_internal_metadata_snapshot()
+        node_ids = [f"{swarm_id}_n{i}" for i in range(swarmstar_space.node_count)]
+        yield "swarm_nodes", node_ids
+        yield "swarm_operations", [f"{swarm_id}_o{i}" for i in range(swarmstar_space.operation_count)]
+        yield ARCHIVE_CATEGORY, node_ids
+        yield "action_metadata", [f"{swarm_id}_a{i}" for i in range(swarmstar_space.action_count)] + \
+            [f"{swarm_id}_{node_id}" for node_id in snapshot.keys("action_metadata")]
+        yield "memory_metadata", [f"{swarm_id}_m{i}" for i in range(swarmstar_space.memory_count)] + \
+            [f"{swarm_id}_{node_id}" for node_id in snapshot.keys("memory_metadata")]
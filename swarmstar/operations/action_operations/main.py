@@ -6,23 +6,20 @@ from typing import List, Union
 from swarmstar.models import (
     SwarmOperation,
     ActionOperation,
-    SwarmNode,
-    ActionMetadata
+    SwarmNode
 )
-from swarmstar.operations.action_operations.internal_action import execute_action as execute_internal_action
+from swarmstar.models.metadata.action_registry import action_registry
 
 def execute_action(action_operation: ActionOperation) -> Union[SwarmOperation, List[SwarmOperation]]:
     """
     Handles the action and returns the next set of operations
     to perform.
     """
-    node_id = action_operation.node_id
-    node = SwarmNode.read(node_id)
-    action_metadata = ActionMetadata.get(node.type)
+    node = SwarmNode.read(action_operation.node_id)
+    action_class = action_registry.get(node.type).action_class
+    action_instance = action_class(node=node)
 
+    function_to_call = action_operation.function_to_call
+    args = action_operation.args
 
-    if action_metadata.internal:
-        return execute_internal_action(action_operation)
-    else:
-        raise NotImplementedError("External actions are not yet supported")
-
+    return getattr(action_instance, function_to_call)(**args)
@@ -4,25 +4,35 @@ a pydantic model and a list of messages, and will return a BlockingOperation
 which will call the next_function_to_call of the node's action with the completion
 and context.
 """
+import time
+
 from swarmstar.models import BlockingOperation, ActionOperation, BaseNode
-from swarmstar.utils.ai import Instructor
+from swarmstar.models.metadata.action_registry import InstructorModel
+from swarmstar.models.swarm.swarm_stats import SwarmStats
+from swarmstar.utils.database import get_database
+from swarmstar.utils.ai import Instructor, token_usage
 from swarmstar.utils.ai.instructor_models import AskQuestions
 from swarmstar.utils.ai.prompts import ASK_QUESTIONS_INSTRUCTIONS
 
+db = get_database()
 instructor = Instructor()
+ask_questions = InstructorModel("AskQuestions", AskQuestions)
 
 async def blocking(blocking_operation: BlockingOperation) -> BlockingOperation:
     node = BaseNode.read(blocking_operation.node_id)
 
     message = blocking_operation.args["message"]
 
-    response = await instructor.completion(
-        messages=[{
-            "role": "system",
-            "content": ASK_QUESTIONS_INSTRUCTIONS + "\n\n" + message
-        }],
-        instructor_model=AskQuestions
-    )
+    with SwarmStats.in_flight_llm_call(db.get_swarm_id("swarm_nodes", blocking_operation.node_id)):
+        started = time.monotonic()
+        response = await instructor.completion(
+            messages=[{
+                "role": "system",
+                "content": ASK_QUESTIONS_INSTRUCTIONS + "\n\n" + message
+            }],
+            instructor_model=ask_questions.response_model
+        )
+        latency = time.monotonic() - started
 
     log_index_key = blocking_operation.context.get("log_index_key", None)
 
@@ -32,7 +42,10 @@ async def blocking(blocking_operation: BlockingOperation) -> BlockingOperation:
     }, log_index_key)
     node.log({
         "role": "ai",
-        "content": response.model_dump_json(indent=2)
+        "content": response.model_dump_json(indent=2),
+        # instructor's usage adds up every attempt, retries included
+        **token_usage(getattr(response, "_raw_response", None)),
+        "latency": latency
     }, log_index_key)
 
     return ActionOperation(
@@ -4,9 +4,15 @@ a pydantic model and a list of messages, and will return a BlockingOperation
 which will call the next_function_to_call of the node's action with the completion
 and context.
 """
-from swarmstar.models import BlockingOperation, ActionOperation, BaseNode, ActionMetadata
-from swarmstar.utils.ai import Instructor
+import time
 
+from swarmstar.models import BlockingOperation, ActionOperation, BaseNode
+from swarmstar.models.metadata.action_registry import action_registry
+from swarmstar.models.swarm.swarm_stats import SwarmStats
+from swarmstar.utils.database import get_database
+from swarmstar.utils.ai import Instructor, token_usage
+
+db = get_database()
 instructor = Instructor()
 
 async def blocking(blocking_operation: BlockingOperation) -> BlockingOperation:
@@ -14,17 +20,18 @@ async def blocking(blocking_operation: BlockingOperation) -> BlockingOperation:
 
     message = blocking_operation.args["message"]
     instructor_model_name = blocking_operation.args["instructor_model_name"]
-    module = ActionMetadata.get_action_module(node.type)
-
-    instructor_model = getattr(module, instructor_model_name)
+    instructor_model = action_registry.get_instructor_model(node.type, instructor_model_name)
 
-    response = await instructor.completion(
-        messages=[{
-            "role": "system",
-            "content": message
-        }],
-        instructor_model=instructor_model
-    )
+    with SwarmStats.in_flight_llm_call(db.get_swarm_id("swarm_nodes", blocking_operation.node_id)):
+        started = time.monotonic()
+        response = await instructor.completion(
+            messages=[{
+                "role": "system",
+                "content": message
+            }],
+            instructor_model=instructor_model.response_model
+        )
+        latency = time.monotonic() - started
     
     log_index_key = blocking_operation.context.get("log_index_key", None)
 
@@ -34,7 +41,10 @@ async def blocking(blocking_operation: BlockingOperation) -> BlockingOperation:
     }, log_index_key)
     node.log({
         "role": "ai",
-        "content": response.model_dump_json(indent=2)
+        "content": response.model_dump_json(indent=2),
+        # instructor's usage adds up every attempt, retries included
+        **token_usage(getattr(response, "_raw_response", None)),
+        "latency": latency
     }, log_index_key)
 
     return ActionOperation(
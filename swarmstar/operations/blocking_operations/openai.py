@@ -4,20 +4,28 @@ a pydantic model and a list of messages, and will return a BlockingOperation
 which will call the next_function_to_call of the node's action with the completion
 and context.
 """
+import time
+
 from swarmstar.models import BlockingOperation, ActionOperation, BaseNode
+from swarmstar.models.swarm.swarm_stats import SwarmStats
+from swarmstar.utils.database import get_database
 from swarmstar.utils.ai import OpenAI
 
+db = get_database()
 openai = OpenAI()
 
 async def blocking(blocking_operation: BlockingOperation) -> BlockingOperation:
     message = blocking_operation.args["message"]
 
-    response = await openai.completion(
-        messages={
-            "role": "system",
-            "content": message
-        }
-    )
+    with SwarmStats.in_flight_llm_call(db.get_swarm_id("swarm_nodes", blocking_operation.node_id)):
+        started = time.monotonic()
+        response, usage = await openai.completion_with_usage(
+            messages={
+                "role": "system",
+                "content": message
+            }
+        )
+        latency = time.monotonic() - started
     
     node = BaseNode.read(blocking_operation.node_id)
     log_index_key = blocking_operation.context.get("log_index_key", None)
@@ -28,7 +36,9 @@ async def blocking(blocking_operation: BlockingOperation) -> BlockingOperation:
     }, log_index_key)
     node.log({
         "role": "ai",
-        "content": response
+        "content": response,
+        **usage,
+        "latency": latency
     }, log_index_key)
     
     return ActionOperation(
@@ -6,35 +6,41 @@ from typing import List
 from swarmstar.models import (
     SpawnOperation,
     SwarmNode,
-    ActionOperation,
-    ActionMetadata,
-    SwarmOperation
+    ActionOperation
 )
+from swarmstar.models.swarm.swarm_stats import SwarmStats
+from swarmstar.models.metadata.action_registry import action_registry
+from swarmstar.utils.database import get_database
+
+db = get_database()
 
 def spawn(spawn_operation: SpawnOperation) ->  List[ActionOperation]:
     """
     Swarmstar Spawn Operation handler
+
+    Inserting the node, linking it to its parent and recording it on the spawn
+    operation happen in a single atomic write, so a crash can't leave orphan nodes.
     """
-    node = _spawn_node(spawn_operation)
-    _update_parent(spawn_operation, node)
-    _update_spawn_operation(spawn_operation, node.id)
+    node = _build_node(spawn_operation)
+    db.atomic_write(_get_spawn_writes(spawn_operation, node))
+    spawn_operation.node_id = node.id
 
     return ActionOperation(
         node_id=node.id,
         function_to_call="main",
     )
 
-def _spawn_node(spawn_operation: SpawnOperation) -> SwarmNode:
+def _build_node(spawn_operation: SpawnOperation) -> SwarmNode:
     """
-    Spawns a new node in the swarm and saves it to database
+    Builds the new node from the spawn operation and the action's metadata
     """
     parent_id = spawn_operation.parent_id
     action_id = spawn_operation.action_id
-    action_metadata = ActionMetadata.get(action_id)
-    termination_policy = action_metadata.termination_policy
-    
-    node = SwarmNode(
-        name=action_metadata.name,
+    registered_action = action_registry.get(action_id)
+    termination_policy = registered_action.termination_policy
+
+    return SwarmNode(
+        name=registered_action.name,
         parent_id=parent_id,
         type=action_id,
         message=spawn_operation.message,
@@ -43,22 +49,36 @@ def _spawn_node(spawn_operation: SpawnOperation) -> SwarmNode:
         context=spawn_operation.context
     )
 
-    SwarmNode.create(node)
-    return node
-
-def _update_parent(spawn_operation: SpawnOperation, node: SwarmNode) -> None:
-    """
-    Update parent node's children_ids and termination_policy if necessary
-    """
-    parent_id = spawn_operation.parent_id
-    if parent_id is not None:
-        parent_node = SwarmNode.read(parent_id)
-        parent_node.children_ids.append(node.id)
-        SwarmNode.replace(parent_node)
-
-def _update_spawn_operation(spawn_operation: SpawnOperation, node_id: str) -> None:
+def _get_spawn_writes(spawn_operation: SpawnOperation, node: SwarmNode) -> List[dict]:
     """
-    Update node_id attr in spawn_operation
+    Insert the node, append it to the parent's children_ids and count it among the parent's
+    alive children, set node_id on the spawn operation and count the node as alive
     """
-    spawn_operation.node_id = node_id
-    SwarmOperation.replace(spawn_operation)
+    writes = [{
+        "type": "create",
+        "category": SwarmNode.collection,
+        "key": node.id,
+        "value": node.model_dump()
+    }]
+    if spawn_operation.parent_id is not None:
+        writes.append({
+            "type": "append_to_array",
+            "category": SwarmNode.collection,
+            "key": spawn_operation.parent_id,
+            "field": "children_ids",
+            "value": node.id
+        })
+        writes.append({
+            "type": "increment",
+            "category": SwarmNode.collection,
+            "key": spawn_operation.parent_id,
+            "amounts": {"alive_children_count": 1}
+        })
+    writes.append({
+        "type": "update",
+        "category": "swarm_operations",
+        "key": spawn_operation.id,
+        "updated_fields": {"node_id": node.id}
+    })
+    writes.append(SwarmStats.increment_write(db.get_swarm_id(SwarmNode.collection, node.id), {"alive_nodes": 1}))
+    return writes
@@ -17,38 +17,39 @@ from swarmstar.models import (
     TerminationOperation,
     SwarmNode
 )
+from swarmstar.models.swarm.swarm_nodes import CONFIRM_DIRECTIVE_COMPLETION_ACTION_ID
 
 
 def terminate(termination_operation: TerminationOperation) -> Union[TerminationOperation, None]:
+    """
+    Children are counted out of alive_children_count in the same write that kills them,
+    so one read of the target node answers whether every child has terminated.
+    """
     node_id = termination_operation.node_id
-    target_node = SwarmNode.read(node_id)
+    target_node = SwarmNode.read(node_id, fields=[
+        "type", "parent_id", "alive_children_count", "confirm_completion_child_terminated"
+    ])
 
     if target_node.type != "general/decompose_directive":
         raise ValueError("Review directive termination policy can only be applied to nodes of type 'decompose directive'") 
-    
-    mission_completion = False
 
-    for child_id in target_node.children_ids:
-        child = SwarmNode.read(child_id)
-        if child.alive:
-            return None
-        if child.type == "specific/managerial/confirm_directive_completion":
-            mission_completion = True
+    if target_node.get("alive_children_count", 0) > 0:
+        return None
 
-    if mission_completion == False:
+    if not target_node.get("confirm_completion_child_terminated", False):
         return SpawnOperation(
             parent_id=node_id,
-            action_id="specific/managerial/confirm_directive_completion",
+            action_id=CONFIRM_DIRECTIVE_COMPLETION_ACTION_ID,
             message="",
         )
     else:
-        target_node.alive = False
-        SwarmNode.replace(target_node)
+        # A duplicate termination finds the node already dead and stops here
+        if not SwarmNode.kill(node_id, target_node.parent_id, target_node.type):
+            return None
         if target_node.parent_id is None:
             return None
         else:
-            parent_node = SwarmNode.read(target_node.parent_id)
             return TerminationOperation(
                 terminator_id=node_id,
-                node_id=parent_node.id,
+                node_id=target_node.parent_id,
             )
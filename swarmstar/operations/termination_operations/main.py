@@ -1,37 +1,110 @@
+"""
+Termination operations are coalesced per target node. When several children of a node
+terminate together, the first TerminationOperation to reach the node lets the others
+dispatched alongside it catch up. If any do, it waits COALESCE_WINDOW seconds for
+stragglers. The node's termination policy then runs once, with every terminator id on
+the operation's terminator_ids. A termination with nothing else pending for its node
+runs straight away.
+
+The operations that joined return nothing once the policy has run, so they're only
+completed after the operation that ran it. If the policy fails they fail with it, and
+are released to be retried.
+
+Custom termination handlers are action code expecting one terminator at a time, so
+nodes with that policy still get one handler call per terminator.
+
+Coalescing happens within one process. Operations for the same node executed by other
+processes are handled separately, just as they were before.
+"""
+import asyncio
 from importlib import import_module
-from typing import Union
+from typing import Dict, List, Union
 
 from swarmstar.models import (
     SwarmNode,
+    SwarmOperation,
     TerminationOperation,
 )
 
-def terminate(termination_operation: TerminationOperation) -> Union[TerminationOperation, None]:
-    termination_policy_map = {
-        "simple": "swarmstar.utils.swarm_operations.termination_operations.simple",
-        "confirm_directive_completion": "swarmstar.utils.swarm_operations.termination_operations.confirm_directive_completion",
-        "custom_termination_handler": "swarmstar.utils.swarm_operations.termination_operations.custom_termination_handler",
-    }
+COALESCE_WINDOW = 0.05 # Seconds a termination waits for stragglers once others have joined it
+
+termination_policy_map = {
+    "simple": "swarmstar.operations.termination_operations.simple",
+    "confirm_directive_completion": "swarmstar.operations.termination_operations.confirm_directive_completion",
+    "custom_termination_handler": "swarmstar.operations.termination_operations.custom_action_termination",
+}
+
+class _TerminationBatch:
+    __slots__ = ("operations", "done")
 
+    def __init__(self, termination_operation: TerminationOperation):
+        self.operations = [termination_operation]
+        self.done = asyncio.get_running_loop().create_future()
+
+_pending_terminations: Dict[str, _TerminationBatch] = {} # {node_id: operations gathered for the node}
+
+async def terminate(termination_operation: TerminationOperation) -> Union[SwarmOperation, List[SwarmOperation], None]:
     node_id = termination_operation.node_id
-    node = SwarmNode.read(node_id)
-    termination_policy = node.termination_policy
+    batch = _pending_terminations.get(node_id)
+    if batch is not None:
+        batch.operations.append(termination_operation)
+        await batch.done # Raises if the policy failed, so this operation is released too
+        return None
+
+    batch = _pending_terminations[node_id] = _TerminationBatch(termination_operation)
+    try:
+        try:
+            # Terminations dispatched together reach the node before this one resumes
+            await asyncio.sleep(0)
+            if len(batch.operations) > 1:
+                await asyncio.sleep(COALESCE_WINDOW)
+        finally:
+            del _pending_terminations[node_id]
+        output = _run_termination_policy(batch.operations)
+    except asyncio.CancelledError:
+        batch.done.set_exception(RuntimeError(f"Termination of node {node_id} was cancelled"))
+        batch.done.exception() # Marks it retrieved when nothing joined
+        raise
+    except Exception as e:
+        batch.done.set_exception(e)
+        batch.done.exception()
+        raise
+    batch.done.set_result(None)
+    return output
+
+def _run_termination_policy(batch: List[TerminationOperation]) -> Union[SwarmOperation, List[SwarmOperation], None]:
+    termination_operation = batch[0]
+    node = SwarmNode.read(termination_operation.node_id, fields=["termination_policy"])
+    termination_policy = node.get("termination_policy", "simple")
 
     if termination_policy not in termination_policy_map:
         raise ValueError(
             f"Termination policy: `{termination_policy}` is not supported."
         )
-    else:
-        pass
 
     termination_policy_module = import_module(
         termination_policy_map[termination_policy]
     )
-    
-    try:
-        output = termination_policy_module.terminate(termination_operation)
-    except Exception as e:
-        print(f"Error in termination policy module: {e}")
-        output = None
-    
-    return output
+
+    if termination_policy == "custom_termination_handler":
+        operations = batch
+    else:
+        operations = [termination_operation.model_copy(update={
+            "terminator_ids": [operation.terminator_id for operation in batch]
+        })]
+
+    output = []
+    for operation in operations:
+        try:
+            result = termination_policy_module.terminate(operation)
+        except Exception as e:
+            print(f"Error in termination policy module: {e}")
+            result = None
+        if isinstance(result, list):
+            output.extend(result)
+        elif result is not None:
+            output.append(result)
+
+    if not output:
+        return None
+    return output[0] if len(output) == 1 else output
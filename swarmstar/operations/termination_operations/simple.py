@@ -1,23 +1,54 @@
 """
 Simple termination terminates the given node and returns a TerminationOperation for the parent node.
+
+A parent with the simple policy would terminate as soon as that operation reached it, so
+rather than hopping one operation per level, termination walks up through every simple
+ancestor in one pass. It stops at the first ancestor that needs its own termination
+policy to run, kills everything below it in one write, and hands that ancestor a single
+TerminationOperation.
 """
-from typing import Union
+from typing import List, Optional, Tuple, Union
+
+from swarmstar.models import TerminationOperation, SwarmNode, SwarmTree, NodeView
 
-from swarmstar.models import TerminationOperation, SwarmNode
+# Only the last node of the chain hands its context on, so that's read once the chain is decided
+CHAIN_FIELDS = ["parent_id", "type", "alive", "termination_policy"]
 
 def terminate(termination_operation: TerminationOperation) -> Union[TerminationOperation, None]:
+    """
+    The kill only applies if every node of the chain is still alive. If a concurrent
+    termination killed one of them first, the chain is walked again from the node.
+    """
     node_id = termination_operation.node_id
-    node = SwarmNode.read(node_id)
-    node.alive = False
-    SwarmNode.replace(node)
+    while True:
+        node = SwarmNode.read(node_id, fields=CHAIN_FIELDS)
+        if not node.get("alive", True):
+            return None # Already terminated by an earlier operation
+        chain, parent = _walk_chain(node)
+        last = chain[-1]
+        surviving_parent_id = parent.id if parent is not None and parent.get("alive", True) else None
+        # Only the surviving parent's alive children count matters, the rest die in the same write
+        if SwarmNode.kill([n.id for n in chain], surviving_parent_id, last.get("type")):
+            break
 
-    try:
-        parent_node = SwarmNode.read(node.parent_id)
-    except:
+    if surviving_parent_id is None:
         return None
 
     return TerminationOperation(
-        terminator_id=node_id,
-        node_id=parent_node.id, 
-        context=node.context
+        terminator_id=last.id,
+        node_id=surviving_parent_id,
+        context=SwarmNode.read(last.id, fields=["context"]).get("context")
     )
+
+def _walk_chain(node: NodeView) -> Tuple[List[NodeView], Optional[NodeView]]:
+    """
+    The node and its simple ancestors dying with it, and the first parent that doesn't.
+    The ancestors come back in one query rather than one read per level.
+    """
+    chain: List[NodeView] = [node]
+    for ancestor in SwarmTree.ancestors(node.id, CHAIN_FIELDS):
+        parent = NodeView.from_document(ancestor)
+        if not parent.get("alive", True) or parent.get("termination_policy", "simple") != "simple":
+            return chain, parent
+        chain.append(parent)
+    return chain, None
@@ -8,13 +8,14 @@ Following that, just keep feeding operations into the execute function and it wi
 Keep in mind that you shouldn't pass UserCommunication operations into the execute function. 
 I've provided a template for how you may handle those in the user_communication_examples folder.
 """
-from typing import List, Union
+from typing import Any, AsyncIterator, Dict, List, Union
 import inspect
 
 from swarmstar.models import (
     SwarmOperation,
     SpawnOperation,
-    SwarmstarSpace
+    SwarmstarSpace,
+    SwarmCompactor
 )
 from swarmstar.operations import (
     blocking,
@@ -54,6 +55,7 @@ class Swarmstar:
         }
 
         if swarm_operation.operation_type in operation_mapping:
+            SwarmOperation.start(swarm_operation)
             try:
                 operation_handler = operation_mapping[swarm_operation.operation_type]
                 
@@ -63,6 +65,7 @@ class Swarmstar:
                     output = operation_handler(swarm_operation)   
      
             except Exception as e:
+                SwarmOperation.release(swarm_operation)
                 print(f"Error in execute_swarmstar_operation: {e}")
                 raise e
         else:
@@ -71,17 +74,37 @@ class Swarmstar:
             )
 
         if output is None:
+            SwarmOperation.complete(swarm_operation, [])
             return None
         elif isinstance(output, SwarmOperation):
             output = [output]
         elif not isinstance(output, list):
+            SwarmOperation.release(swarm_operation)
             raise ValueError(f"Unexpected return type from operation_func: {type(output)}")
 
-        for operation in output:
-            SwarmOperation.create(operation)
+        # The next operations are created in the same write that marks this one done
+        SwarmOperation.complete(swarm_operation, output)
 
         return output        
 
+    def fork(self, new_swarm_id: str) -> None:
+        """
+        Fork this swarm under a new id without copying it. This swarm becomes read-only
+        while the fork exists. Continue the fork with Swarmstar(new_swarm_id).
+        """
+        SwarmstarSpace.fork_swarmstar_space(swarm_id_var.get(), new_swarm_id)
+
+    def subscribe(self, since: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """ Async iterator over changes to this swarm, starting after the since cursor """
+        return SwarmstarSpace.subscribe(swarm_id_var.get(), since)
+
+    def compact(self, grace_period: float = 3600.0, archive: bool = False) -> List[str]:
+        """
+        Strip the working state of subtrees that have been dead for grace_period seconds.
+        Run it periodically, or in the background with SwarmCompactor.maintain.
+        """
+        return SwarmCompactor.compact(swarm_id_var.get(), grace_period, archive)
+
     def delete(self):
         """ Only call this function once at the end of each swarm """
         SwarmstarSpace.delete_swarmstar_space(swarm_id_var.get())
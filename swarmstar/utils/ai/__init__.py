@@ -1,2 +1,2 @@
 from .instructor import Instructor
-from .openai import OpenAI
\ No newline at end of file
+from .openai import OpenAI, token_usage
\ No newline at end of file
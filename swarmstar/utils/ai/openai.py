@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 import os
 from dotenv import load_dotenv
 
@@ -20,6 +20,14 @@ class OpenAI:
         self,
         messages: List[Dict[str, str]]
     ) -> str:
+        content, _ = await self.completion_with_usage(messages)
+        return content
+
+    async def completion_with_usage(
+        self,
+        messages: List[Dict[str, str]]
+    ) -> Tuple[str, Dict[str, Optional[int]]]:
+        """ The completion along with the tokens it used. """
         task = self.aclient.chat.completions.create(
             model="gpt-4-1106-preview",
             messages=messages,
@@ -28,4 +36,12 @@ class OpenAI:
         )
 
         completion = await task
-        return completion.choices[0].message.content
+        return completion.choices[0].message.content, token_usage(completion)
+
+def token_usage(completion: Any) -> Dict[str, Optional[int]]:
+    """ Prompt and completion tokens of a chat completion, None where they weren't reported. """
+    usage = getattr(completion, "usage", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+    }
@@ -1,2 +1,16 @@
+from .abstract_database import Database
 from .mongodb_wrapper import MongoDBWrapper
-from .internal import get_internal_sqlite, get_internal_file_as_string
\ No newline at end of file
+from .local_database import LocalDatabase
+from .forks import ForkAwareDatabase
+from .backend import get_database
+from .compiled_metadata import CompiledMetadata, compile_metadata
+from .internal import (
+    InternalMetadataSnapshot,
+    get_internal_metadata_snapshot,
+    get_internal_metadata,
+    get_many_internal_metadata,
+    is_internal_metadata,
+    get_internal_file_as_string
+)
+from .lease import Lease
+from .node_resolution import NodeResolutionCache, node_resolution_cache
@@ -1,7 +1,21 @@
+import asyncio
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+class FilterMismatch(Exception):
+    """ Raised by backends inside atomic_write when a write's filter doesn't match, to abort the batch. """
 
 class Database(ABC):
+    # Categories whose writes aren't recorded in the change feed. Admin documents are only
+    # counters and stats, bumped on nearly every operation, so they'd flood it. The compactor's
+    # state follows the feed, so recording it would feed the compactor its own writes.
+    UNTRACKED_CATEGORIES = {"mutations", "mutation_counters", "history_snapshots", "admin", "swarm_compaction"}
+    # Categories whose mutation events also carry the values written, so history can be replayed
+    HISTORY_CATEGORIES = {"swarm_nodes", "swarm_operations"}
+    # Fields the backends keep on documents for their own bookkeeping
+    BOOKKEEPING_FIELDS = {"_id", "version", "lock", "lock_token"}
+
     def __init__(self, *args, **kwargs):
         # Initialization can be arbitrary and flexible for subclass implementations.
         super().__init__()
@@ -13,13 +27,27 @@ class Database(ABC):
         pass
 
     @abstractmethod
-    def read(self, category: str, key: str) -> Dict[str, Any]:
-        """Read the value associated with a key."""
+    def create_if_absent(self, category: str, key: str, value: Dict[str, Any]) -> bool:
+        """Insert a key-value pair unless the key exists, atomically. Returns whether it was inserted."""
+        pass
+
+    @abstractmethod
+    def read(self, category: str, key: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Read the value associated with a key. If fields are given, only those fields (and id) are returned."""
         pass
 
     @abstractmethod
-    def update(self, category: str, key: str, updated_fields: Dict[str, Any]) -> None:
-        """Update the specified fields for a given key. Raise error if key does not exist."""
+    def update(
+        self,
+        category: str,
+        key: str,
+        updated_fields: Dict[str, Any],
+        fencing_token: Optional[int] = None
+    ) -> None:
+        """
+        Update the specified fields for a given key. Raise error if key does not exist.
+        With the fencing_token of a lease on the key, raise instead if a newer lease was taken since.
+        """
         pass
 
     @abstractmethod
@@ -45,17 +73,47 @@ class Database(ABC):
         """Rollback a transaction session."""
         pass
 
+    @abstractmethod
+    def atomic_write(self, writes: List[Dict[str, Any]]) -> bool:
+        """
+        Apply a list of writes, possibly across categories, in order and all-or-nothing.
+        A backend without transactions undoes the writes it applied when a later one fails,
+        so others may briefly see part of the batch.
+        Each write is a dict with a "type" and the arguments of the matching single-document operation:
+            {"type": "create", "category": ..., "key": ..., "value": {...}}
+            {"type": "update", "category": ..., "key": ..., "updated_fields": {...}}
+            {"type": "update_many", "category": ..., "keys": [...], "updated_fields": {...}}
+            {"type": "append_to_array", "category": ..., "key": ..., "field": ..., "value": ...}
+            {"type": "increment", "category": ..., "key": ..., "amounts": {field: amount}}
+        Increment fields may be dotted paths into nested documents, like "stats.alive_nodes".
+
+        An update_many may also carry a "filter" of field values, like {"alive": True}, that every
+        key must match when it's written. Any write but a create may carry the "fencing_token" of
+        a lease on its key, which fails once a newer lease was taken. If a filter or token fails,
+        nothing is written and False is returned. Otherwise returns True.
+        """
+        pass
+
 
 
     """                     Locks                     """
     @abstractmethod
-    def lock(self, category: str, key: str) -> None:
-        """ Lock a key. Raise error if key is already locked. """
+    def lock(self, category: str, key: str, owner: str, ttl: float = 30.0) -> Optional[int]:
+        """
+        Take a lease on a key for ttl seconds. Succeeds if the key is unlocked, the previous
+        lease expired or owner already holds it. Returns a fencing token that increases with
+        every acquisition, or None if another owner holds an unexpired lease.
+        """
+        pass
+
+    @abstractmethod
+    def renew_lock(self, category: str, key: str, owner: str, ttl: float = 30.0) -> bool:
+        """ Extend owner's unexpired lease by ttl seconds. Returns False if owner no longer holds it. """
         pass
 
     @abstractmethod
-    def unlock(self, category: str, key: str) -> None:
-        """Unlock a key."""
+    def unlock(self, category: str, key: str, owner: str) -> None:
+        """ Release owner's lease on a key. Does nothing if owner doesn't hold it. """
         pass
 
 
@@ -67,8 +125,17 @@ class Database(ABC):
         pass
 
     @abstractmethod
-    def replace(self, category: str, key: str, new_value: Dict[str, Any]) -> None:
-        """ Replace a key-value pair with a new value. Raise error if key does not exist. """
+    def replace(
+        self,
+        category: str,
+        key: str,
+        new_value: Dict[str, Any],
+        fencing_token: Optional[int] = None
+    ) -> None:
+        """
+        Replace a key-value pair with a new value. Raise error if key does not exist.
+        With the fencing_token of a lease on the key, raise instead if a newer lease was taken since.
+        """
         pass
 
     @abstractmethod
@@ -127,8 +194,11 @@ class Database(ABC):
         pass
 
     @abstractmethod
-    def batch_read(self, category: str, keys: List[str]) -> Dict[str, Dict[str, Any]]:
-        """ Read multiple values associated with the keys. Returns a dictionary of key-value pairs. """
+    def batch_read(self, category: str, keys: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Read multiple values associated with the keys. Returns a dictionary of key-value pairs.
+        If fields are given, only those fields (and id) are returned for each value.
+        """
         pass
 
     @abstractmethod
@@ -145,3 +215,187 @@ class Database(ABC):
     def batch_copy(self, category: str, keys: List[str], new_keys: List[str]) -> None:
         """ Copy multiple key-value pairs to new keys. Raise error if any key does not exist. """
         pass
+
+
+
+    """                     Tree queries                     """
+    def ancestors(self, category: str, key: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Return the ancestors of a document linked by parent_id, nearest first.
+        Each one carries its distance from the document in "depth", 1 for the parent.
+
+        Backends override this with a single query. This default reads one document per level.
+        """
+        projection = None if fields is None else [*fields, "parent_id"]
+        ancestors, seen = [], {key}
+        parent_id = self.read(category, key, ["parent_id"]).get("parent_id")
+        while parent_id is not None and parent_id not in seen:
+            seen.add(parent_id)
+            try:
+                ancestor = self.read(category, parent_id, projection)
+            except ValueError:
+                break
+            next_parent_id = ancestor.get("parent_id")
+            if fields is not None and "parent_id" not in fields:
+                ancestor.pop("parent_id", None)
+            ancestor["depth"] = len(ancestors) + 1
+            ancestors.append(ancestor)
+            parent_id = next_parent_id
+        return ancestors
+
+    def descendants(
+        self,
+        category: str,
+        key: str,
+        max_depth: Optional[int] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the descendants of a document linked by children_ids, level by level,
+        down to max_depth levels below it. Each one carries its distance from the
+        document in "depth", 1 for its children.
+
+        Backends override this with a single query. This default reads one batch per level.
+        """
+        projection = None if fields is None else [*fields, "children_ids"]
+        descendants, seen = [], {key}
+        level_ids = [child_id for child_id in self.read(category, key, ["children_ids"]).get("children_ids") or []]
+        depth = 1
+        while level_ids and (max_depth is None or depth <= max_depth):
+            level_ids = [child_id for child_id in dict.fromkeys(level_ids) if child_id not in seen]
+            seen.update(level_ids)
+            found = self.batch_read(category, level_ids, projection)
+            next_level_ids = []
+            for child_id in level_ids:
+                if child_id not in found:
+                    continue
+                descendant = found[child_id]
+                next_level_ids.extend(descendant.get("children_ids") or [])
+                if fields is not None and "children_ids" not in fields:
+                    descendant.pop("children_ids", None)
+                descendant["depth"] = depth
+                descendants.append(descendant)
+            level_ids = next_level_ids
+            depth += 1
+        return descendants
+
+
+    """                     Change feed                     """
+    @abstractmethod
+    def read_mutations(self, swarm_id: str, since: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Return the swarm's mutation events with a cursor greater than since, in cursor order.
+
+        Every write to a tracked category appends one event per document written:
+            {"cursor": int, "swarm_id": str, "collection": str, "id": str, "type": str,
+             "fields": [changed field names], "version": int | None, "timestamp": float}
+        Cursors start at 1 and increase by one per event within a swarm. Events are returned
+        up to the first cursor that was claimed by a write but isn't stored yet, so a reader
+        never skips past an event that is about to land.
+
+        Events in HISTORY_CATEGORIES also carry what was written, so history can be replayed:
+        creates carry the document in "values", updates carry "ops", a list of changes
+        applied in order, each addressing a path of keys and list indices into the document:
+            {"op": "set", "path": [...], "value": ...}
+            {"op": "unset", "path": [...]}
+            {"op": "inc", "path": [...], "amount": int}
+            {"op": "push", "path": [...], "value": ...}
+            {"op": "pull", "path": [...], "value": ...}
+            {"op": "remove_at", "path": [...], "index": int}
+        Array writes are recorded as the change they make, never as the whole array.
+        """
+        pass
+
+    @abstractmethod
+    def mutation_cursor(self, swarm_id: str) -> int:
+        """ Return the cursor of the swarm's latest mutation event, or 0 if there are none. """
+        pass
+
+    @abstractmethod
+    def clear_mutations(self, swarm_id: str) -> None:
+        """ Delete a swarm's mutation log. """
+        pass
+
+    async def subscribe(
+        self,
+        swarm_id: str,
+        since: int = 0,
+        poll_interval: float = 0.25,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the swarm's mutation events after the since cursor, forever.
+        Remember the cursor of the last event consumed to resume later without gaps.
+        """
+        while True:
+            events = self.read_mutations(swarm_id, since, batch_size)
+            for event in events:
+                since = event["cursor"]
+                yield event
+            if len(events) < batch_size:
+                await asyncio.sleep(poll_interval)
+
+    @staticmethod
+    def get_swarm_id(category: str, key: str) -> str:
+        """ Admin documents are keyed by swarm id, everything else by {swarm_id}_{suffix}. """
+        if category == "admin":
+            return key
+        return key.split("_", 1)[0]
+
+    @classmethod
+    def mutation_event(
+        cls,
+        category: str,
+        key: str,
+        mutation_type: str,
+        fields: List[str],
+        version: Optional[int],
+        values: Optional[Dict[str, Any]] = None,
+        ops: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """ values is the document created, ops the changes an update made. Only history categories keep them. """
+        event = {
+            "collection": category,
+            "id": key,
+            "type": mutation_type,
+            "fields": fields,
+            "version": version,
+            "timestamp": time.time()
+        }
+        if category in cls.HISTORY_CATEGORIES:
+            if mutation_type == "create" and values is not None:
+                event["values"] = {field: value for field, value in values.items() if field not in cls.BOOKKEEPING_FIELDS}
+            elif mutation_type == "update" and ops is not None:
+                event["ops"] = ops
+        return event
+
+    @staticmethod
+    def set_ops(updated_fields: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """ The ops of setting fields, which may be dotted paths into nested documents. """
+        return [{"op": "set", "path": field.split("."), "value": value} for field, value in updated_fields.items()]
+
+    @staticmethod
+    def diff_ops(old: Any, new: Any, path: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+        """
+        The ops turning old into new, descending into documents and lists so a change deep
+        inside a field, or a list growing at the end, doesn't record the whole field.
+        """
+        if old == new:
+            return []
+        if isinstance(old, dict) and isinstance(new, dict):
+            ops = [{"op": "unset", "path": [*path, field]} for field in old if field not in new]
+            for field, value in new.items():
+                if field in old:
+                    ops.extend(Database.diff_ops(old[field], value, (*path, field)))
+                else:
+                    ops.append({"op": "set", "path": [*path, field], "value": value})
+            return ops
+        if isinstance(old, list) and isinstance(new, list) and path and len(new) >= len(old):
+            ops = []
+            for index, value in enumerate(old):
+                ops.extend(Database.diff_ops(value, new[index], (*path, index)))
+            ops.extend({"op": "push", "path": list(path), "value": value} for value in new[len(old):])
+            # When most elements changed, setting the list is smaller than changing each one
+            if len(ops) <= len(new):
+                return ops
+        return [{"op": "set", "path": list(path), "value": new}]
@@ -0,0 +1,19 @@
+import os
+
+from swarmstar.utils.database.abstract_database import Database
+from swarmstar.utils.database.mongodb_wrapper import MongoDBWrapper
+from swarmstar.utils.database.local_database import LocalDatabase
+from swarmstar.utils.database.forks import ForkAwareDatabase
+
+def get_database() -> Database:
+    """
+    Returns the database backend singleton selected by the SWARMSTAR_DATABASE
+    environment variable: "mongodb" (default) or "local", wrapped to resolve
+    documents of forked swarms.
+    """
+    backend = os.getenv("SWARMSTAR_DATABASE", "mongodb")
+    if backend == "mongodb":
+        return ForkAwareDatabase(MongoDBWrapper())
+    elif backend == "local":
+        return ForkAwareDatabase(LocalDatabase())
+    raise ValueError(f"Database backend {backend} not recognized.")
@@ -0,0 +1,223 @@
+"""
+Compiled internal metadata is a compact binary snapshot of the internal metadata
+trees, meant to be memory-mapped at startup. Every worker process on a host maps
+the same file, so they share a single physical copy of it.
+
+Next to each node the compiler stores what would otherwise take a traversal:
+    - depth and ancestor ids (root first)
+    - preorder position and subtree size, so a subtree is one slice of the preorder
+    - children adjacency, including nodes that only name their parent through parent_id
+    - the rendered option text routers show for a folder's listed children
+
+Layout (little endian):
+    header:     magic, format version, table count
+    per table:  name, node count, offset and length of the preorder list,
+                then per node its key and the offset and length of its node
+                record and its index record
+    data:       json encoded records
+"""
+import json
+import mmap
+import struct
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+MAGIC = b"SWMETA\x00\x00"
+FORMAT_VERSION = 2
+
+_HEADER = struct.Struct("<8sII")
+_NAME_LENGTH = struct.Struct("<H")
+_TABLE = struct.Struct("<IQI")
+_ENTRY = struct.Struct("<QIQI")
+
+Buffer = Union[bytes, memoryview, mmap.mmap]
+
+
+def render_options(children: Iterable[Dict[str, Any]]) -> str:
+    """ The numbered option list routers present to choose between a folder's children. """
+    return "\n".join(
+        f"{i}. {child.get('name')}: {child.get('description')}" for i, child in enumerate(children)
+    )
+
+
+def _index_table(nodes: Dict[str, Dict[str, Any]]) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+    """ Computes the preorder and the per node index records of one table. """
+    adjacency = {key: [c for c in node.get("children_ids") or [] if c in nodes] for key, node in nodes.items()}
+    for key, node in nodes.items():
+        parent_id = node.get("parent_id")
+        if parent_id in adjacency and key not in adjacency[parent_id]:
+            adjacency[parent_id].append(key)
+
+    roots = [key for key, node in nodes.items() if node.get("parent_id") not in nodes]
+    preorder: List[str] = []
+    info: Dict[str, Dict[str, Any]] = {}
+
+    def visit(root: str) -> None:
+        stack = [(root, [])]
+        while stack:
+            key, ancestor_ids = stack.pop()
+            if key in info:
+                continue
+            info[key] = {
+                "depth": len(ancestor_ids),
+                "ancestor_ids": ancestor_ids,
+                "children_ids": adjacency[key],
+                "preorder": len(preorder),
+            }
+            preorder.append(key)
+            path = ancestor_ids + [key]
+            stack.extend((child_id, path) for child_id in reversed(adjacency[key]))
+
+    for root in roots:
+        visit(root)
+    # Anything left over sits on a cycle; give it a place rather than dropping it
+    for key in nodes:
+        visit(key)
+
+    subtree_size = {key: 1 for key in preorder}
+    for key in reversed(preorder):
+        ancestor_ids = info[key]["ancestor_ids"]
+        if ancestor_ids:
+            subtree_size[ancestor_ids[-1]] += subtree_size[key]
+
+    for key, node in nodes.items():
+        info[key]["subtree_size"] = subtree_size[key]
+        if node.get("is_folder"):
+            # Routers index into children_ids, so only listed children are options
+            listed_children_ids = [c for c in node.get("children_ids") or [] if c in nodes]
+            info[key]["option_text"] = render_options(nodes[c] for c in listed_children_ids)
+    return preorder, info
+
+
+def compile_metadata(tables: Dict[str, Dict[str, Dict[str, Any]]]) -> bytes:
+    """
+    Compiles metadata tables into the binary format.
+
+    :param tables: {table_name: {node_id: node}}
+    :return: The compiled bytes, ready to be written to disk or read directly.
+    """
+    encoded_tables = []
+    for name, nodes in tables.items():
+        preorder, info = _index_table(nodes)
+        records = [
+            (key.encode(), json.dumps(node).encode(), json.dumps(info[key]).encode())
+            for key, node in nodes.items()
+        ]
+        encoded_tables.append((name.encode(), json.dumps(preorder).encode(), records))
+
+    directory_size = _HEADER.size
+    for name, _, records in encoded_tables:
+        directory_size += _NAME_LENGTH.size + len(name) + _TABLE.size
+        directory_size += sum(_NAME_LENGTH.size + len(key) + _ENTRY.size for key, _, _ in records)
+
+    directory = [_HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded_tables))]
+    data = []
+    offset = directory_size
+
+    def place(blob: bytes) -> Tuple[int, int]:
+        nonlocal offset
+        data.append(blob)
+        offset += len(blob)
+        return offset - len(blob), len(blob)
+
+    for name, preorder, records in encoded_tables:
+        directory.append(_NAME_LENGTH.pack(len(name)) + name)
+        directory.append(_TABLE.pack(len(records), *place(preorder)))
+        for key, node, node_info in records:
+            directory.append(_NAME_LENGTH.pack(len(key)) + key)
+            directory.append(_ENTRY.pack(*place(node), *place(node_info)))
+
+    return b"".join(directory + data)
+
+
+class CompiledMetadata:
+    """
+    Reader over compiled metadata.
+
+    Only the directory is parsed up front. Records stay in the buffer, which is
+    normally a read-only mmap, and are decoded into fresh dicts on access.
+    """
+    def __init__(self, buffer: Buffer):
+        self._buffer = buffer
+        self._tables: Dict[str, Dict[str, Tuple[int, int, int, int]]] = {}
+        self._preorder_locations: Dict[str, Tuple[int, int]] = {}
+        self._preorders: Dict[str, List[str]] = {}
+
+        magic, version, table_count = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a compiled swarmstar metadata file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled metadata version {version}, expected {FORMAT_VERSION}")
+
+        position = _HEADER.size
+        for _ in range(table_count):
+            name, position = self._read_string(position)
+            node_count, preorder_offset, preorder_length = _TABLE.unpack_from(buffer, position)
+            position += _TABLE.size
+            entries = {}
+            for _ in range(node_count):
+                key, position = self._read_string(position)
+                entries[key] = _ENTRY.unpack_from(buffer, position)
+                position += _ENTRY.size
+            self._tables[name] = entries
+            self._preorder_locations[name] = (preorder_offset, preorder_length)
+
+    def _read_string(self, position: int) -> Tuple[str, int]:
+        (length,) = _NAME_LENGTH.unpack_from(self._buffer, position)
+        position += _NAME_LENGTH.size
+        return bytes(self._buffer[position:position + length]).decode(), position + length
+
+    def _decode(self, offset: int, length: int) -> Any:
+        return json.loads(bytes(self._buffer[offset:offset + length]))
+
+    def _entry(self, category: str, key: str) -> Tuple[int, int, int, int]:
+        try:
+            return self.table(category)[key]
+        except KeyError:
+            raise ValueError(f"No value found for key: {key}")
+
+    def _info(self, category: str, key: str) -> Dict[str, Any]:
+        _, _, offset, length = self._entry(category, key)
+        return self._decode(offset, length)
+
+    def table(self, category: str) -> Dict[str, Tuple[int, int, int, int]]:
+        try:
+            return self._tables[category]
+        except KeyError:
+            raise ValueError(f"No internal metadata table named {category}")
+
+    def tables(self) -> List[str]:
+        return list(self._tables)
+
+    def get(self, category: str, key: str) -> Dict[str, Any]:
+        offset, length, _, _ = self._entry(category, key)
+        return self._decode(offset, length)
+
+    def depth(self, category: str, key: str) -> int:
+        return self._info(category, key)["depth"]
+
+    def ancestors(self, category: str, key: str) -> List[str]:
+        """ Ancestor ids from the root down to the node's parent. """
+        return self._info(category, key)["ancestor_ids"]
+
+    def children(self, category: str, key: str) -> List[str]:
+        return self._info(category, key)["children_ids"]
+
+    def descendants(self, category: str, key: str, max_depth: Optional[int] = None) -> List[str]:
+        """ Descendant ids in preorder, optionally only down to max_depth levels below the node. """
+        info = self._info(category, key)
+        start = info["preorder"] + 1
+        descendant_ids = self._preorder(category)[start:start + info["subtree_size"] - 1]
+        if max_depth is None:
+            return descendant_ids
+        limit = info["depth"] + max_depth
+        return [d for d in descendant_ids if self.depth(category, d) <= limit]
+
+    def option_text(self, category: str, key: str) -> Optional[str]:
+        """ The pre-rendered option list for a folder's children. None for non folders. """
+        return self._info(category, key).get("option_text")
+
+    def _preorder(self, category: str) -> List[str]:
+        if category not in self._preorders:
+            self.table(category)
+            self._preorders[category] = self._decode(*self._preorder_locations[category])
+        return self._preorders[category]
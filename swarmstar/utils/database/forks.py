@@ -0,0 +1,464 @@
+"""
+Copy-on-write forks of swarmstar spaces.
+
+A fork is a swarm whose admin document names a parent swarm. Forking only
+writes that admin document, so it takes constant time and space no matter how
+big the parent is. The parent is sealed from then on and becomes a read-only
+base shared by all of its forks.
+
+Reads of a document the fork hasn't written yet fall through to the nearest
+ancestor that has it, with ids under the ancestor's prefix rebased onto the
+fork's. The first write to such a document copies it into the fork's namespace
+before applying the write. Deleting an inherited document leaves a tombstone
+in the fork so the ancestor's copy stops showing through.
+
+A swarm's ancestors never change, so they're read from the admin documents
+once per swarm per process. Whether a swarm is sealed is cached too, and
+forgotten whenever this process writes the swarm's fork_ids. A fork made by
+another process seals the swarm here within SEAL_RECHECK_INTERVAL seconds.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from swarmstar.utils.database.abstract_database import Database
+
+TOMBSTONE = "fork_tombstone"
+LINEAGE_FIELDS = ["parent_swarm_id", "fork_ids"]
+# Fields tied to a single document that a copy must not inherit
+DOCUMENT_FIELDS = ["lock", "lock_token"]
+# Fields holding ids under the swarm's prefix, rebased when a document moves to another swarm
+ID_FIELDS = {
+    "id", "parent_id", "children_ids", "node_id", "action_id",
+    "terminator_id", "terminator_ids", "queued_operation_ids"
+}
+# Fields holding documents keyed by id, like the operations of an archived node
+ID_KEYED_FIELDS = {"operations"}
+SEAL_RECHECK_INTERVAL = 1.0 # Seconds a cached sealed flag is trusted before the admin document is read again
+
+def rebase_ids(document: Dict[str, Any], old_prefix: str, new_prefix: str) -> Dict[str, Any]:
+    """ Move the ids in a document's ID_FIELDS from one swarm's prefix to another's. Other fields are left alone. """
+    def rebase(value: Any) -> Any:
+        if isinstance(value, str) and value.startswith(old_prefix):
+            return new_prefix + value[len(old_prefix):]
+        if isinstance(value, list):
+            return [rebase(item) for item in value]
+        return value
+
+    rebased = {}
+    for field, value in document.items():
+        if field in ID_FIELDS:
+            value = rebase(value)
+        elif field in ID_KEYED_FIELDS and isinstance(value, dict):
+            value = {rebase(key): rebase_ids(item, old_prefix, new_prefix) if isinstance(item, dict) else item
+                     for key, item in value.items()}
+        rebased[field] = value
+    return rebased
+
+class ForkAwareDatabase(Database):
+    """
+    Wraps a database backend and resolves reads and writes across fork lineages.
+
+    Documents of swarms without a parent are passed straight to the backend.
+    """
+    _instances: Dict[int, 'ForkAwareDatabase'] = {}
+
+    def __new__(cls, backend: Database):
+        if id(backend) not in cls._instances:
+            cls._instances[id(backend)] = super().__new__(cls)
+        return cls._instances[id(backend)]
+
+    def __init__(self, backend: Database):
+        if not hasattr(self, 'backend'):
+            self.backend = backend
+            self._lineages: Dict[str, List[str]] = {} # {swarm_id: ancestors nearest first}
+            self._seals: Dict[str, Tuple[bool, float]] = {} # {swarm_id: (sealed, when it was read)}
+            self._materialized: Dict[str, Set[Tuple[str, str]]] = {} # {swarm_id: {(category, key)}}
+            self._lock = threading.Lock()
+
+
+    """                     Lineage                     """
+    def _lineage(self, swarm_id: str) -> List[str]:
+        lineage = self._lineages.get(swarm_id)
+        if lineage is None:
+            lineage, current = [], swarm_id
+            while True:
+                try:
+                    parent_swarm_id = self.backend.read("admin", current, ["parent_swarm_id"]).get("parent_swarm_id")
+                except ValueError:
+                    break
+                if not parent_swarm_id or parent_swarm_id in lineage:
+                    break
+                lineage.append(parent_swarm_id)
+                current = parent_swarm_id
+            with self._lock:
+                self._lineages[swarm_id] = lineage
+        return lineage
+
+    def _sealed(self, swarm_id: str) -> bool:
+        seal = self._seals.get(swarm_id)
+        now = time.monotonic()
+        if seal is not None and now - seal[1] < SEAL_RECHECK_INTERVAL:
+            return seal[0]
+        try:
+            sealed = bool(self.backend.read("admin", swarm_id, ["fork_ids"]).get("fork_ids"))
+        except ValueError:
+            sealed = False
+        with self._lock:
+            self._seals[swarm_id] = (sealed, now)
+        return sealed
+
+    def _scoped(self, category: str) -> bool:
+        return category != "admin" and category not in self.UNTRACKED_CATEGORIES
+
+    def _ancestors(self, category: str, key: str) -> List[str]:
+        if not self._scoped(category):
+            return []
+        return self._lineage(self.get_swarm_id(category, key))
+
+    def _check_writable(self, category: str, key: str, fields: Optional[List[str]] = None) -> None:
+        if category == "admin":
+            # Counters are written constantly and never change the lineage
+            if fields is None or any(field.split(".")[0] in LINEAGE_FIELDS for field in fields):
+                self._forget(key)
+        elif self._scoped(category):
+            swarm_id = self.get_swarm_id(category, key)
+            if self._sealed(swarm_id):
+                raise ValueError(f"Swarm {swarm_id} has been forked and is read-only.")
+
+    def _forget(self, swarm_id: str) -> None:
+        """ Drop what's cached about a swarm after its admin document is written. """
+        with self._lock:
+            self._lineages.pop(swarm_id, None)
+            self._seals.pop(swarm_id, None)
+            self._materialized.pop(swarm_id, None)
+
+
+
+    """                     Resolution                     """
+    def _resolve_many(
+        self,
+        category: str,
+        keys: List[str],
+        fields: Optional[List[str]] = None,
+        inherited_only: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Read keys of one forked swarm, walking up its lineage for the ones it hasn't written.
+        Each generation is read in one batch. Tombstoned and missing keys are left out.
+        With inherited_only, the fork's own documents are skipped.
+        """
+        if not keys:
+            return {}
+        swarm_id = self.get_swarm_id(category, keys[0])
+        owners = [*self._lineage(swarm_id)] if inherited_only else [swarm_id, *self._lineage(swarm_id)]
+        projection = None if fields is None else [*fields, TOMBSTONE]
+        documents, remaining = {}, list(keys)
+        for owner in owners:
+            owner_keys = {f"{owner}_{key.split('_', 1)[1]}": key for key in remaining}
+            found = self.backend.batch_read(category, list(owner_keys), projection)
+            for owner_key, document in found.items():
+                if document.pop(TOMBSTONE, False):
+                    continue
+                if owner != swarm_id:
+                    document = rebase_ids(document, f"{owner}_", f"{swarm_id}_")
+                    for field in DOCUMENT_FIELDS:
+                        document.pop(field, None)
+                documents[owner_keys[owner_key]] = document
+            # A tombstone hides everything above it just like a document does
+            remaining = [key for key, owner_key in zip(remaining, owner_keys) if owner_key not in found]
+            if not remaining:
+                break
+        return documents
+
+    def _read_own(self, category: str, key: str) -> Optional[Dict[str, Any]]:
+        """ The fork's own copy of a document, raising if it was deleted in the fork. """
+        own = self.backend.batch_read(category, [key], [TOMBSTONE]).get(key)
+        if own is not None and own.get(TOMBSTONE):
+            raise ValueError(f"_id {key} not found in the collection {category}.")
+        return own
+
+    def _materialize(self, category: str, key: str) -> None:
+        """ Copy an inherited document into the fork's namespace before it's written to. """
+        swarm_id = self.get_swarm_id(category, key)
+        if (category, key) in self._materialized.get(swarm_id, ()):
+            return
+        if self._read_own(category, key) is None:
+            document = self._resolve_many(category, [key], inherited_only=True).get(key)
+            if document is None:
+                return # Let the backend raise its usual not found error
+            document.pop("id", None)
+            try:
+                self.backend.create(category, key, document)
+            except ValueError:
+                pass # Someone else copied it first
+        with self._lock:
+            self._materialized.setdefault(swarm_id, set()).add((category, key))
+
+    def _prepare_write(self, category: str, key: str, fields: Optional[List[str]] = None) -> None:
+        self._check_writable(category, key, fields)
+        if self._ancestors(category, key):
+            self._materialize(category, key)
+
+    def _clear_tombstones(self, category: str, keys: List[str]) -> None:
+        """ Remove the fork's tombstones among keys so they can be created again. """
+        tombstones = [
+            key for key, document in self.backend.batch_read(category, keys, [TOMBSTONE]).items()
+            if document.get(TOMBSTONE)
+        ]
+        if tombstones:
+            self.backend.batch_delete(category, tombstones)
+
+
+    """                      CRUD operations                         """
+    def create(self, category: str, key: str, value: Dict[str, Any]) -> None:
+        self._check_writable(category, key)
+        if self._ancestors(category, key):
+            if self._resolve_many(category, [key], []):
+                raise ValueError(f"A document with _id {key} already exists in collection {category}.")
+            self._clear_tombstones(category, [key])
+        self.backend.create(category, key, value)
+
+    def create_if_absent(self, category: str, key: str, value: Dict[str, Any]) -> bool:
+        self._check_writable(category, key)
+        if self._ancestors(category, key):
+            if self._resolve_many(category, [key], []):
+                return False
+            self._clear_tombstones(category, [key])
+        return self.backend.create_if_absent(category, key, value)
+
+    def read(self, category: str, key: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        if not self._ancestors(category, key):
+            return self.backend.read(category, key, fields)
+        document = self._resolve_many(category, [key], fields).get(key)
+        if document is None:
+            raise ValueError(f"_id {key} not found in the collection {category}.")
+        return document
+
+    def update(
+        self,
+        category: str,
+        key: str,
+        updated_fields: Dict[str, Any],
+        fencing_token: Optional[int] = None
+    ) -> None:
+        self._prepare_write(category, key)
+        self.backend.update(category, key, updated_fields, fencing_token)
+
+    def delete(self, category: str, key: str) -> None:
+        self._check_writable(category, key)
+        if not self._ancestors(category, key):
+            self.backend.delete(category, key)
+            return
+        own = self._read_own(category, key)
+        if own is not None:
+            self.backend.delete(category, key)
+        if self._resolve_many(category, [key], [], inherited_only=True):
+            self.backend.create(category, key, {TOMBSTONE: True})
+        elif own is None:
+            raise ValueError(f"_id {key} not found in the collection {category}.")
+        with self._lock:
+            self._materialized.get(self.get_swarm_id(category, key), set()).discard((category, key))
+
+
+
+    """              Managing transaction sessions for atomicity              """
+    def begin_transaction(self) -> Any:
+        return self.backend.begin_transaction()
+
+    def commit_transaction(self, session: Any) -> None:
+        self.backend.commit_transaction(session)
+
+    def rollback_transaction(self, session: Any) -> None:
+        self.backend.rollback_transaction(session)
+
+    def atomic_write(self, writes: List[Dict[str, Any]]) -> bool:
+        for write in writes:
+            if write["type"] == "update_many":
+                for key in write["keys"]:
+                    self._prepare_write(write["category"], key)
+                continue
+            category, key = write["category"], write["key"]
+            if write["type"] == "create":
+                self._check_writable(category, key)
+                if self._ancestors(category, key):
+                    self._clear_tombstones(category, [key])
+            elif write["type"] == "increment":
+                self._prepare_write(category, key, list(write["amounts"]))
+            else:
+                self._prepare_write(category, key)
+        return self.backend.atomic_write(writes)
+
+
+
+    """                     Locks                     """
+    def lock(self, category: str, key: str, owner: str, ttl: float = 30.0) -> Optional[int]:
+        self._prepare_write(category, key)
+        return self.backend.lock(category, key, owner, ttl)
+
+    def renew_lock(self, category: str, key: str, owner: str, ttl: float = 30.0) -> bool:
+        return self.backend.renew_lock(category, key, owner, ttl)
+
+    def unlock(self, category: str, key: str, owner: str) -> None:
+        self.backend.unlock(category, key, owner)
+
+
+
+    """                     Other common operations.                     """
+    def copy(self, category: str, key: str, new_key: str) -> None:
+        if not self._ancestors(category, key) and not self._ancestors(category, new_key):
+            self._check_writable(category, new_key)
+            self.backend.copy(category, key, new_key)
+            return
+        document = self.read(category, key)
+        document.pop("id", None)
+        for field in DOCUMENT_FIELDS:
+            document.pop(field, None)
+        self.create(category, new_key, document)
+
+    def replace(
+        self,
+        category: str,
+        key: str,
+        new_value: Dict[str, Any],
+        fencing_token: Optional[int] = None
+    ) -> None:
+        self._prepare_write(category, key)
+        self.backend.replace(category, key, new_value, fencing_token)
+
+    def get_field(self, category: str, key: str, field: str) -> Any:
+        if not self._ancestors(category, key):
+            return self.backend.get_field(category, key, field)
+        return self.read(category, key, [field]).get(field)
+
+    def exists(self, category: str, key: str) -> bool:
+        if not self._ancestors(category, key):
+            return self.backend.exists(category, key)
+        return bool(self._resolve_many(category, [key], []))
+
+    def increment(self, category: str, key: str, field: str, amount: int = 1) -> int:
+        self._prepare_write(category, key, [field])
+        return self.backend.increment(category, key, field, amount)
+
+    def pop_field(self, category: str, key: str, field: str) -> Any:
+        self._prepare_write(category, key)
+        return self.backend.pop_field(category, key, field)
+
+
+
+    """                     List operations                     """
+    def append_to_array(self, category: str, key: str, field: str, value: Any) -> None:
+        self._prepare_write(category, key)
+        self.backend.append_to_array(category, key, field, value)
+
+    def remove_from_array_at_index(self, category: str, key: str, field: str, index: int) -> None:
+        self._prepare_write(category, key)
+        self.backend.remove_from_array_at_index(category, key, field, index)
+
+    def remove_value_from_array(self, category: str, key: str, field: str, value: Any) -> None:
+        self._prepare_write(category, key)
+        self.backend.remove_value_from_array(category, key, field, value)
+
+    def pop_array(self, category: str, key: str, field: str, index: int = -1) -> Any:
+        self._prepare_write(category, key)
+        return self.backend.pop_array(category, key, field, index)
+
+    def array_length(self, category: str, key: str, field: str) -> int:
+        if not self._ancestors(category, key):
+            return self.backend.array_length(category, key, field)
+        return len(self.read(category, key, [field]).get(field) or [])
+
+
+    """                     Batch operations                     """
+    def _group_by_swarm(self, category: str, keys: List[str]) -> Tuple[List[str], Dict[str, List[str]]]:
+        """ Splits keys into those passed straight through and those of forked swarms, by swarm. """
+        plain, forked = [], {}
+        for key in keys:
+            if self._ancestors(category, key):
+                forked.setdefault(self.get_swarm_id(category, key), []).append(key)
+            else:
+                plain.append(key)
+        return plain, forked
+
+    def batch_create(self, category: str, keys: Dict[str, Dict[str, Any]]) -> None:
+        for key in keys:
+            self._check_writable(category, key)
+        _, forked = self._group_by_swarm(category, list(keys))
+        for swarm_keys in forked.values():
+            existing = self._resolve_many(category, swarm_keys, [])
+            if existing:
+                raise ValueError(f"Documents {list(existing)} already exist in collection {category}.")
+            self._clear_tombstones(category, swarm_keys)
+        self.backend.batch_create(category, keys)
+
+    def batch_read(self, category: str, keys: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        plain, forked = self._group_by_swarm(category, keys)
+        documents = self.backend.batch_read(category, plain, fields) if plain else {}
+        for swarm_keys in forked.values():
+            documents.update(self._resolve_many(category, swarm_keys, fields))
+        return documents
+
+    def batch_update(self, category: str, updated_fields: Dict[str, Dict[str, Any]]) -> None:
+        for key in updated_fields:
+            self._prepare_write(category, key)
+        self.backend.batch_update(category, updated_fields)
+
+    def batch_delete(self, category: str, keys: List[str]) -> None:
+        for key in keys:
+            self._check_writable(category, key)
+        plain, forked = self._group_by_swarm(category, keys)
+        for swarm_keys in forked.values():
+            for key in swarm_keys:
+                self.delete(category, key)
+        if plain:
+            self.backend.batch_delete(category, plain)
+
+    def batch_copy(self, category: str, keys: List[str], new_keys: List[str]) -> None:
+        if not any(self._ancestors(category, key) for key in [*keys, *new_keys]):
+            for new_key in new_keys:
+                self._check_writable(category, new_key)
+            self.backend.batch_copy(category, keys, new_keys)
+            return
+        documents = self.batch_read(category, keys)
+        if len(documents) != len(set(keys)):
+            raise ValueError(f"One or more _ids not found in the collection {category}.")
+        copies = {}
+        for key, new_key in zip(keys, new_keys):
+            document = {**documents[key]}
+            document.pop("id", None)
+            for field in DOCUMENT_FIELDS:
+                document.pop(field, None)
+            copies[new_key] = document
+        self.batch_create(category, copies)
+
+
+
+    """                     Tree queries                     """
+    def ancestors(self, category: str, key: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        # The backend's single query can't see through to ancestors, so forks walk level by level
+        if not self._ancestors(category, key):
+            return self.backend.ancestors(category, key, fields)
+        return super().ancestors(category, key, fields)
+
+    def descendants(
+        self,
+        category: str,
+        key: str,
+        max_depth: Optional[int] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        if not self._ancestors(category, key):
+            return self.backend.descendants(category, key, max_depth, fields)
+        return super().descendants(category, key, max_depth, fields)
+
+
+
+    """                     Change feed                     """
+    def read_mutations(self, swarm_id: str, since: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.backend.read_mutations(swarm_id, since, limit)
+
+    def mutation_cursor(self, swarm_id: str) -> int:
+        return self.backend.mutation_cursor(swarm_id)
+
+    def clear_mutations(self, swarm_id: str) -> None:
+        self.backend.clear_mutations(swarm_id)
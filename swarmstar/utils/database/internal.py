@@ -1,37 +1,155 @@
 """
 This file provides methods to retrieve data internal to the swarmstar package.
 
-Sources include the internal sqlite database and internal files.
+Sources include the internal metadata and internal files.
+
+The internal action and memory metadata trees never change while the package is
+running. They're compiled ahead of time into internal_metadata.bin (see
+scripts/compile_internal_metadata.py), which every process memory-maps once at
+startup. If the compiled file is missing, the sqlite database is read once and
+compiled in memory instead.
 """
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+import mmap
 import sqlite3
 import json
 from importlib import resources
 
+from swarmstar.utils.database.compiled_metadata import CompiledMetadata, compile_metadata
+
+COMPILED_METADATA_FILE = 'internal_metadata.bin'
+SQLITE_METADATA_FILE = 'internal_metadata.sqlite3'
+
+
+class InternalMetadataSnapshot:
+    """
+    Immutable, indexed view of the internal metadata tables.
 
-def get_internal_sqlite(category: str, key: str) -> Dict[str, Any]:
+    Getters hand out fresh dicts, so callers are free to modify what they receive.
+    Ancestor, descendant and depth queries are answered from precomputed indexes,
+    and folders' router option text is precomputed.
     """
-    Retrieves a key-value pair from the internal sqlite database.
-    
+    def __init__(self, compiled: CompiledMetadata):
+        self._compiled = compiled
+
+    def has(self, category: str, key: str) -> bool:
+        return key in self._compiled.table(category)
+
+    def keys(self, category: str) -> List[str]:
+        return list(self._compiled.table(category))
+
+    def get(self, category: str, key: str) -> Dict[str, Any]:
+        return self._compiled.get(category, key)
+
+    def get_many(self, category: str, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """ Returns the nodes that exist among keys. Missing keys are left out. """
+        table = self._compiled.table(category)
+        return {key: self._compiled.get(category, key) for key in keys if key in table}
+
+    def depth(self, category: str, key: str) -> int:
+        return self._compiled.depth(category, key)
+
+    def ancestors(self, category: str, key: str) -> List[str]:
+        """ Ancestor ids from the root down to the node's parent. """
+        return self._compiled.ancestors(category, key)
+
+    def children(self, category: str, key: str) -> List[str]:
+        return self._compiled.children(category, key)
+
+    def descendants(self, category: str, key: str, max_depth: Optional[int] = None) -> List[str]:
+        """ Descendant ids in preorder, down to max_depth levels below the node if given. """
+        return self._compiled.descendants(category, key, max_depth)
+
+    def option_text(self, category: str, key: str) -> Optional[str]:
+        return self._compiled.option_text(category, key)
+
+
+def _map_compiled_metadata() -> Optional[CompiledMetadata]:
+    resource = resources.files('swarmstar') / COMPILED_METADATA_FILE
+    if not resource.is_file():
+        return None
+    with resources.as_file(resource) as path, open(path, 'rb') as file:
+        # The mapping stays valid after the file is closed
+        return CompiledMetadata(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def load_internal_metadata_from_sqlite() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """ Reads every internal metadata table from the sqlite database with a single connection. """
+    tables = {}
+    with resources.as_file(resources.files('swarmstar') / SQLITE_METADATA_FILE) as db_path:
+        conn = sqlite3.connect(str(db_path))
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            for (category,) in cursor.fetchall():
+                nodes = {}
+                for key, value in cursor.execute(f'SELECT _id, value FROM {category}'):
+                    node = json.loads(value)
+                    node['id'] = key
+                    # Everything in the package is internal by definition
+                    node.setdefault('internal', True)
+                    nodes[key] = node
+                tables[category] = nodes
+        finally:
+            conn.close()
+    return tables
+
+
+@lru_cache(maxsize=None)
+def get_internal_metadata_snapshot() -> InternalMetadataSnapshot:
+    """ Maps the compiled internal metadata, once per process. """
+    compiled = _map_compiled_metadata()
+    if compiled is None:
+        compiled = CompiledMetadata(compile_metadata(load_internal_metadata_from_sqlite()))
+    return InternalMetadataSnapshot(compiled)
+
+
+def compile_internal_metadata() -> None:
+    """
+    Compiles the sqlite database into internal_metadata.bin, the file every process maps.
+    Raises a ValueError, leaving the old file in place, if the compiled tables don't
+    hold exactly the nodes in the sqlite database.
+    """
+    tables = load_internal_metadata_from_sqlite()
+    compiled_bytes = compile_metadata(tables)
+    compiled = CompiledMetadata(compiled_bytes)
+    if sorted(compiled.tables()) != sorted(tables):
+        raise ValueError(f"Compiled tables {compiled.tables()} don't match the sqlite tables {list(tables)}")
+    for category, nodes in tables.items():
+        if set(compiled.table(category)) != set(nodes):
+            raise ValueError(
+                f"Compiled {category} has {len(compiled.table(category))} nodes, the sqlite database has {len(nodes)}"
+            )
+    with resources.as_file(resources.files('swarmstar') / COMPILED_METADATA_FILE) as path, open(path, 'wb') as file:
+        file.write(compiled_bytes)
+
+
+def get_internal_metadata(category: str, key: str) -> Dict[str, Any]:
+    """
+    Retrieves a node from the internal metadata.
+
     :param category: The table to retrieve the value from.
     :param key: The key to retrieve the value for.
     :return: The value for the key.
     """
-    try:
-        with resources.path('swarmstar', f'internal_metadata.sqlite3') as db_path:
-            conn = sqlite3.connect(str(db_path))
-            cursor = conn.cursor()
-            key = key
-            cursor.execute(f'SELECT value FROM {category} WHERE _id = ?', (key,))
-            result = cursor.fetchone()
-            if result:
-                result = json.loads(result[0])
-                result['id'] = key
-                return result
-            else:
-                raise ValueError(f'No value found for key: {key}')
-    except Exception as e:
-        raise ValueError(f'Failed to retrieve kv value: {str(e)} at {db_path}')
+    return get_internal_metadata_snapshot().get(category, key)
+
+
+def get_many_internal_metadata(category: str, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Retrieves the nodes among keys that exist in the internal metadata.
+
+    :param category: The table to retrieve the values from.
+    :param keys: The keys to retrieve the values for.
+    :return: A dictionary of key-value pairs. Keys that aren't internal are left out.
+    """
+    return get_internal_metadata_snapshot().get_many(category, keys)
+
+
+def is_internal_metadata(category: str, key: str) -> bool:
+    """ Checks whether a key exists in the internal metadata. """
+    return get_internal_metadata_snapshot().has(category, key)
 
 
 def get_internal_file_as_string(file_name: str) -> str:
@@ -0,0 +1,79 @@
+"""
+Leases are locks that expire on their own.
+
+A worker takes a lease on a document for a limited time and renews it while
+it's still working. If the worker crashes the lease lapses after its ttl and
+someone else can take it, so there's nothing to clean up by hand.
+
+Every acquisition returns a fencing token that is larger than any token handed
+out before for that document. Passing it as the fencing_token of update, replace
+or an atomic_write entry rejects the write if the lease expired and someone else
+took it in the meantime.
+
+    lease = Lease("swarm_nodes", node_id)
+    async with lease as token:
+        db.update("swarm_nodes", node_id, {...}, fencing_token=token)
+"""
+import asyncio
+import random
+import time
+import uuid
+from typing import Optional
+
+from swarmstar.utils.database.backend import get_database
+
+class Lease:
+    def __init__(self, category: str, key: str, owner: Optional[str] = None, ttl: float = 30.0):
+        self.category = category
+        self.key = key
+        self.owner = owner or str(uuid.uuid4())
+        self.ttl = ttl
+        self.token: Optional[int] = None
+        self.db = get_database()
+
+    def try_acquire(self) -> bool:
+        """ Take the lease if it's free. Returns whether it was taken. """
+        self.token = self.db.lock(self.category, self.key, self.owner, self.ttl)
+        return self.token is not None
+
+    async def acquire(
+        self,
+        timeout: Optional[float] = None,
+        initial_backoff: float = 0.01,
+        max_backoff: float = 1.0
+    ) -> int:
+        """
+        Wait until the lease is taken and return its fencing token.
+
+        Retries with jittered exponential backoff so waiters don't hammer the
+        database. Raises TimeoutError if timeout seconds pass first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        backoff = initial_backoff
+        while not self.try_acquire():
+            delay = random.uniform(0, backoff)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Timed out waiting for lease on {self.category}/{self.key}")
+                delay = min(delay, remaining)
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, max_backoff)
+        return self.token
+
+    def renew(self) -> bool:
+        """ Extend the lease by another ttl. Returns False if it was lost in the meantime. """
+        renewed = self.db.renew_lock(self.category, self.key, self.owner, self.ttl)
+        if not renewed:
+            self.token = None
+        return renewed
+
+    def release(self) -> None:
+        self.db.unlock(self.category, self.key, self.owner)
+        self.token = None
+
+    async def __aenter__(self) -> int:
+        return await self.acquire()
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
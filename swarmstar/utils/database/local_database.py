@@ -0,0 +1,481 @@
+"""
+An in-process database for running swarmstar without MongoDB.
+
+Documents live in memory for the lifetime of the process, so this backend is
+meant for local development, single process swarms and tests. It mirrors the
+semantics of the MongoDB wrapper: documents carry a version, reads return
+copies keyed by id, leases expire and every write lands in the change feed.
+
+Set SWARMSTAR_DATABASE=local to use it.
+"""
+import copy
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from swarmstar.utils.database.abstract_database import Database, FilterMismatch
+
+class LocalDatabase(Database):
+    """
+    Singleton in-memory implementation of the abstract database.
+
+    All operations take a single reentrant lock, which makes every operation
+    atomic with respect to other threads.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, 'collections'):
+            self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            self.mutations: Dict[str, List[Dict[str, Any]]] = {}
+            self._lock = threading.RLock()
+
+    def _collection(self, category: str) -> Dict[str, Dict[str, Any]]:
+        return self.collections.setdefault(category, {})
+
+    def _document(self, category: str, key: str) -> Dict[str, Any]:
+        document = self._collection(category).get(key)
+        if document is None:
+            raise ValueError(f"_id {key} not found in the collection {category}.")
+        return document
+
+    @staticmethod
+    def _output(key: str, document: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        if fields is None:
+            result = copy.deepcopy(document)
+            result.pop("version", None)
+        else:
+            result = {field: copy.deepcopy(document[field]) for field in fields if field in document}
+        result["id"] = key
+        return result
+
+
+    """                      CRUD operations                         """
+    def create(self, category: str, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            collection = self._collection(category)
+            if key in collection:
+                raise ValueError(f"A document with _id {key} already exists in collection {category}.")
+            value.pop("id", None)
+            collection[key] = {"version": 1, **copy.deepcopy(value)}
+            self._record_mutations(category, [self.mutation_event(category, key, "create", list(value), 1, values=value)])
+
+    def create_if_absent(self, category: str, key: str, value: Dict[str, Any]) -> bool:
+        with self._lock:
+            if key in self._collection(category):
+                return False
+            self.create(category, key, value)
+            return True
+
+    def read(self, category: str, key: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        with self._lock:
+            return self._output(key, self._document(category, key), fields)
+
+    def update(
+        self,
+        category: str,
+        key: str,
+        updated_fields: Dict[str, Any],
+        fencing_token: Optional[int] = None
+    ) -> None:
+        with self._lock:
+            document = self._document(category, key)
+            self._check_fencing_token(category, key, document, fencing_token)
+            updated_fields.pop("id", None)
+            document.update(copy.deepcopy(updated_fields))
+            document["version"] = document.get("version", 0) + 1
+            self._record_mutations(category, [
+                self.mutation_event(
+                    category, key, "update", list(updated_fields), document["version"], ops=self.set_ops(updated_fields)
+                )
+            ])
+
+    def delete(self, category: str, key: str) -> None:
+        with self._lock:
+            if self._collection(category).pop(key, None) is None:
+                raise ValueError(f"_id {key} not found in the collection {category}.")
+            self._record_mutations(category, [self.mutation_event(category, key, "delete", [], None)])
+
+
+
+    """              Managing transaction sessions for atomicity              """
+    def begin_transaction(self) -> Dict[str, Any]:
+        """ Holds the lock until commit or rollback, keeping a snapshot to roll back to. """
+        self._lock.acquire()
+        return {"collections": copy.deepcopy(self.collections), "mutations": copy.deepcopy(self.mutations)}
+
+    def commit_transaction(self, session: Dict[str, Any]) -> None:
+        self._lock.release()
+
+    def rollback_transaction(self, session: Dict[str, Any]) -> None:
+        self.collections = session["collections"]
+        self.mutations = session["mutations"]
+        self._lock.release()
+
+    def atomic_write(self, writes: List[Dict[str, Any]]) -> bool:
+        """ Applies the writes under the lock, restoring the touched documents if one fails. """
+        with self._lock:
+            previous_documents = []
+            log_lengths = {swarm_id: len(log) for swarm_id, log in self.mutations.items()}
+            try:
+                for write in writes:
+                    category, write_type = write["category"], write["type"]
+                    if write_type == "update_many":
+                        for key in write["keys"]:
+                            self._check_guards(category, key, write)
+                            previous_documents.append((category, key, copy.deepcopy(self._collection(category).get(key))))
+                            self.update(category, key, {**write["updated_fields"]})
+                        continue
+                    key = write["key"]
+                    if write_type != "create":
+                        self._check_guards(category, key, write)
+                    previous_documents.append((category, key, copy.deepcopy(self._collection(category).get(key))))
+                    if write_type == "create":
+                        self.create(category, key, {**write["value"]})
+                    elif write_type == "update":
+                        self.update(category, key, {**write["updated_fields"]})
+                    elif write_type == "append_to_array":
+                        self.append_to_array(category, key, write["field"], write["value"])
+                    elif write_type == "increment":
+                        self.increment_many(category, key, write["amounts"])
+                    else:
+                        raise ValueError(f"Write type {write_type} not recognized.")
+                return True
+            except Exception as e:
+                for category, key, document in reversed(previous_documents):
+                    if document is None:
+                        self._collection(category).pop(key, None)
+                    else:
+                        self._collection(category)[key] = document
+                for swarm_id in list(self.mutations):
+                    if swarm_id in log_lengths:
+                        del self.mutations[swarm_id][log_lengths[swarm_id]:]
+                    else:
+                        del self.mutations[swarm_id]
+                if isinstance(e, FilterMismatch):
+                    return False
+                raise
+
+    def _check_guards(self, category: str, key: str, write: Dict[str, Any]) -> None:
+        """ Raise FilterMismatch if the document fails the write's filter or fencing token. """
+        document = self._collection(category).get(key)
+        if document is None:
+            return # The write raises its usual not found error
+        fencing_token = write.get("fencing_token")
+        if any(document.get(field) != value for field, value in write.get("filter", {}).items()) or \
+                (fencing_token is not None and document.get("lock_token", 0) > fencing_token):
+            raise FilterMismatch(f"{category}/{key} doesn't match the write's filter or fencing token.")
+
+    @staticmethod
+    def _check_fencing_token(category: str, key: str, document: Dict[str, Any], fencing_token: Optional[int]) -> None:
+        if fencing_token is not None and document.get("lock_token", 0) > fencing_token:
+            raise ValueError(f"Fencing token {fencing_token} for {category}/{key} is stale, a newer lease was taken.")
+
+
+
+    """                     Locks                     """
+    def lock(self, category: str, key: str, owner: str, ttl: float = 30.0) -> Optional[int]:
+        with self._lock:
+            document = self._document(category, key)
+            lease = document.get("lock")
+            if lease is not None and lease["owner"] != owner and lease["expires_at"] > time.time():
+                return None
+            document["lock"] = {"owner": owner, "expires_at": time.time() + ttl}
+            document["lock_token"] = document.get("lock_token", 0) + 1
+            return document["lock_token"]
+
+    def renew_lock(self, category: str, key: str, owner: str, ttl: float = 30.0) -> bool:
+        with self._lock:
+            lease = self._document(category, key).get("lock")
+            if lease is None or lease["owner"] != owner or lease["expires_at"] <= time.time():
+                return False
+            lease["expires_at"] = time.time() + ttl
+            return True
+
+    def unlock(self, category: str, key: str, owner: str) -> None:
+        with self._lock:
+            document = self._collection(category).get(key)
+            if document is not None and document.get("lock", {}).get("owner") == owner:
+                del document["lock"]
+
+
+
+    """                     Other common operations.                     """
+    def copy(self, category: str, key: str, new_key: str) -> None:
+        with self._lock:
+            document = copy.deepcopy(self._document(category, key))
+            document.pop("version", None)
+            document.pop("lock", None)
+            self.create(category, new_key, document)
+
+    def replace(
+        self,
+        category: str,
+        key: str,
+        new_value: Dict[str, Any],
+        fencing_token: Optional[int] = None
+    ) -> None:
+        with self._lock:
+            collection = self._collection(category)
+            current_document = self._document(category, key)
+            self._check_fencing_token(category, key, current_document, fencing_token)
+            new_value.pop("id", None)
+            replacement_document = copy.deepcopy(new_value)
+            replacement_document["version"] = current_document.get("version", 0) + 1
+            for lock_field in ("lock", "lock_token"):
+                if lock_field in current_document:
+                    replacement_document[lock_field] = current_document[lock_field]
+            collection[key] = replacement_document
+            changed_fields = [
+                field for field in sorted(set(current_document) | set(replacement_document))
+                if field != "version" and current_document.get(field) != replacement_document.get(field)
+            ]
+            bookkeeping = self.BOOKKEEPING_FIELDS
+            ops = self.diff_ops(
+                {field: value for field, value in current_document.items() if field not in bookkeeping},
+                {field: value for field, value in replacement_document.items() if field not in bookkeeping}
+            )
+            self._record_mutations(category, [
+                self.mutation_event(category, key, "update", changed_fields, replacement_document["version"], ops=ops)
+            ])
+
+    def get_field(self, category: str, key: str, field: str) -> Any:
+        with self._lock:
+            document = self._document(category, key)
+            if field not in document:
+                raise KeyError(f"Key '{field}' not found in the document with _id {key}.")
+            return copy.deepcopy(document[field])
+
+    def exists(self, category: str, key: str) -> bool:
+        with self._lock:
+            return key in self._collection(category)
+
+    def increment(self, category: str, key: str, field: str, amount: int = 1) -> int:
+        with self._lock:
+            return self.increment_many(category, key, {field: amount})[field]
+
+    def increment_many(self, category: str, key: str, amounts: Dict[str, int]) -> Dict[str, int]:
+        """ Increments several fields as one write, like a single $inc. Returns the original values. """
+        with self._lock:
+            document = self._document(category, key)
+            originals = {}
+            for field, amount in amounts.items():
+                # Dotted fields address nested documents, creating them as needed
+                *path, leaf = field.split(".")
+                target = document
+                for part in path:
+                    target = target.setdefault(part, {})
+                originals[field] = target.get(leaf, 0)
+                target[leaf] = originals[field] + amount
+            self._bump_version(category, key, document, list(amounts), [
+                {"op": "inc", "path": field.split("."), "amount": amount} for field, amount in amounts.items()
+            ])
+            return originals
+
+    def pop_field(self, category: str, key: str, field: str) -> Any:
+        with self._lock:
+            document = self._document(category, key)
+            value = document.pop(field, None)
+            self._bump_version(category, key, document, [field], [{"op": "unset", "path": [field]}])
+            return value
+
+    def _bump_version(
+        self,
+        category: str,
+        key: str,
+        document: Dict[str, Any],
+        fields: List[str],
+        ops: List[Dict[str, Any]]
+    ) -> None:
+        document["version"] = document.get("version", 0) + 1
+        self._record_mutations(category, [
+            self.mutation_event(category, key, "update", fields, document["version"], ops=ops)
+        ])
+
+
+
+    """                     List operations                     """
+    def _array(self, category: str, key: str, field: str) -> List[Any]:
+        document = self._document(category, key)
+        if field not in document:
+            raise KeyError(f"Field '{field}' not found in the document with _id {key}.")
+        return document[field]
+
+    def append_to_array(self, category: str, key: str, field: str, value: Any) -> None:
+        with self._lock:
+            document = self._document(category, key)
+            document.setdefault(field, []).append(copy.deepcopy(value))
+            self._bump_version(category, key, document, [field], [{"op": "push", "path": [field], "value": value}])
+
+    def remove_from_array_at_index(self, category: str, key: str, field: str, index: int) -> None:
+        with self._lock:
+            array = self._array(category, key, field)
+            if index < 0 or index >= len(array):
+                raise IndexError(f"Index {index} is out of range for the array in field '{field}' of document with _id {key}.")
+            del array[index]
+            self._bump_version(
+                category, key, self._document(category, key), [field],
+                [{"op": "remove_at", "path": [field], "index": index}]
+            )
+
+    def remove_value_from_array(self, category: str, key: str, field: str, value: Any) -> None:
+        with self._lock:
+            array = self._array(category, key, field)
+            if value not in array:
+                raise ValueError(f"Value '{value}' not found in the array of field '{field}' in the document with _id {key}.")
+            array[:] = [item for item in array if item != value]
+            self._bump_version(
+                category, key, self._document(category, key), [field],
+                [{"op": "pull", "path": [field], "value": value}]
+            )
+
+    def pop_array(self, category: str, key: str, field: str, index: int = -1) -> Any:
+        with self._lock:
+            array = self._array(category, key, field)
+            if not array:
+                raise IndexError(f"Cannot pop from the empty array in field '{field}' of document with _id {key}.")
+            value = array.pop(index)
+            self._bump_version(
+                category, key, self._document(category, key), [field],
+                [{"op": "remove_at", "path": [field], "index": index}]
+            )
+            return value
+
+    def array_length(self, category: str, key: str, field: str) -> int:
+        with self._lock:
+            return len(self._array(category, key, field))
+
+
+
+    """                     Batch operations                     """
+    def batch_create(self, category: str, keys: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock:
+            collection = self._collection(category)
+            if any(key in collection for key in keys):
+                raise ValueError(f"One or more documents already exist in collection {category}.")
+            for key, value in keys.items():
+                value.pop("id", None)
+                collection[key] = {"version": 1, **copy.deepcopy(value)}
+            self._record_mutations(category, [
+                self.mutation_event(category, key, "create", list(value), 1, values=value) for key, value in keys.items()
+            ])
+
+    def batch_read(self, category: str, keys: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            collection = self._collection(category)
+            return {key: self._output(key, collection[key], fields) for key in keys if key in collection}
+
+    def batch_update(self, category: str, updated_fields: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock:
+            collection = self._collection(category)
+            for key in updated_fields:
+                if key not in collection:
+                    raise ValueError(f"Failed to update documents: _id {key} not found in the collection {category}.")
+            events = []
+            for key, fields in updated_fields.items():
+                fields.pop("id", None)
+                document = collection[key]
+                document.update(copy.deepcopy(fields))
+                document["version"] = document.get("version", 0) + 1
+                events.append(self.mutation_event(
+                    category, key, "update", list(fields), document["version"], ops=self.set_ops(fields)
+                ))
+            self._record_mutations(category, events)
+
+    def batch_delete(self, category: str, keys: List[str]) -> None:
+        with self._lock:
+            collection = self._collection(category)
+            deleted = [key for key in keys if collection.pop(key, None) is not None]
+            self._record_mutations(category, [self.mutation_event(category, key, "delete", [], None) for key in deleted])
+            if len(deleted) != len(keys):
+                raise ValueError(f"One or more _ids not found in the collection {category}.")
+
+    def batch_copy(self, category: str, keys: List[str], new_keys: List[str]) -> None:
+        with self._lock:
+            collection = self._collection(category)
+            if any(key not in collection for key in keys):
+                raise ValueError(f"One or more _ids not found in the collection {category}.")
+            documents = {}
+            for key, new_key in zip(keys, new_keys):
+                document = copy.deepcopy(collection[key])
+                document.pop("version", None)
+                document.pop("lock", None)
+                documents[new_key] = document
+            self.batch_create(category, documents)
+
+
+
+    """                     Tree queries                     """
+    def ancestors(self, category: str, key: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """ Follows parent_id through the in-memory documents, copying only what's returned. """
+        with self._lock:
+            collection = self._collection(category)
+            ancestors, seen = [], {key}
+            parent_id = self._document(category, key).get("parent_id")
+            while parent_id is not None and parent_id not in seen and parent_id in collection:
+                seen.add(parent_id)
+                document = collection[parent_id]
+                ancestors.append({**self._output(parent_id, document, fields), "depth": len(ancestors) + 1})
+                parent_id = document.get("parent_id")
+            return ancestors
+
+    def descendants(
+        self,
+        category: str,
+        key: str,
+        max_depth: Optional[int] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """ Follows children_ids through the in-memory documents, level by level. """
+        with self._lock:
+            collection = self._collection(category)
+            descendants, seen = [], {key}
+            level_ids = list(self._document(category, key).get("children_ids") or [])
+            depth = 1
+            while level_ids and (max_depth is None or depth <= max_depth):
+                next_level_ids = []
+                for child_id in level_ids:
+                    if child_id in seen or child_id not in collection:
+                        continue
+                    seen.add(child_id)
+                    document = collection[child_id]
+                    descendants.append({**self._output(child_id, document, fields), "depth": depth})
+                    next_level_ids.extend(document.get("children_ids") or [])
+                level_ids = next_level_ids
+                depth += 1
+            return descendants
+
+
+
+    """                     Change feed                     """
+    def read_mutations(self, swarm_id: str, since: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            # Cursors are 1-based list positions, so the log can be sliced directly
+            log = self.mutations.get(swarm_id, [])
+            end = len(log) if limit is None else since + limit
+            return copy.deepcopy(log[since:end])
+
+    def mutation_cursor(self, swarm_id: str) -> int:
+        with self._lock:
+            return len(self.mutations.get(swarm_id, []))
+
+    def clear_mutations(self, swarm_id: str) -> None:
+        with self._lock:
+            self.mutations.pop(swarm_id, None)
+
+    def _record_mutations(self, category: str, events: List[Dict[str, Any]]) -> None:
+        if category in self.UNTRACKED_CATEGORIES:
+            return
+        for event in events:
+            # Events carry the values written, which the caller may still change
+            for payload in ("values", "ops"):
+                if payload in event:
+                    event[payload] = copy.deepcopy(event[payload])
+            swarm_id = self.get_swarm_id(category, event["id"])
+            log = self.mutations.setdefault(swarm_id, [])
+            log.append({"swarm_id": swarm_id, "cursor": len(log) + 1, **event})
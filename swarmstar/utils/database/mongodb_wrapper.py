@@ -5,13 +5,15 @@ from pymongo.client_session import ClientSession
 import pymongo
 from dotenv import load_dotenv
 import os
-from typing import Dict, Any, List
+import time
+from typing import Any, Callable, Dict, List, Optional
 
-from swarmstar.utils.database.abstract_database import Database
+from swarmstar.utils.database.abstract_database import Database, FilterMismatch
 
 load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI")
 MONGODB_DB_NAME = os.getenv("SWARMSTAR_PACKAGE_MONGODB_DB_NAME")
+MUTATION_GAP_TIMEOUT = 30.0 # Seconds a missing mutation event is waited for before readers skip it
 
 class MongoDBWrapper(Database):
     """
@@ -26,6 +28,10 @@ class MongoDBWrapper(Database):
 
         I also use the _version field to handle optimistic concurrency control. This is a simple way to handle
         concurrent updates to the same document.
+
+        Every write also appends compact events to the swarm's mutation log in the "mutations" collection,
+        so consumers can follow changes with read_mutations/subscribe instead of re-reading documents.
+        This works on standalone servers, unlike change streams which need a replica set.
     """
     _instance = None
 
@@ -51,18 +57,39 @@ class MongoDBWrapper(Database):
             raise ValueError(f"A document with _id {key} already exists in collection {category}.")
         except Exception as e:
             raise ValueError(f"Failed to create document: {str(e)}")
+        self._record_mutations(category, [self.mutation_event(category, key, "create", list(value), 1, values=value)])
+
+    def create_if_absent(self, category: str, key: str, value: Dict[str, Any]) -> bool:
+        """ $setOnInsert only writes when the upsert inserts, so concurrent callers can't clobber each other. """
+        collection = self.db[category]
+        value.pop("id", None)
+        result = collection.update_one(
+            {"_id": key},
+            {"$setOnInsert": {"version": 1, **value}},
+            upsert=True
+        )
+        if result.upserted_id is None:
+            return False
+        self._record_mutations(category, [self.mutation_event(category, key, "create", list(value), 1, values=value)])
+        return True
 
-    def read(self, category: str, key: str) -> Dict[str, Any]:
+    def read(self, category: str, key: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
         collection = self.db[category]
-        result = collection.find_one({"_id": key})
+        result = collection.find_one({"_id": key}, self._projection(fields))
         if result is None:
             raise ValueError(f"_id {key} not found in the collection {category}.")
         result.pop("_id")
-        result.pop("version")
+        result.pop("version", None)
         result["id"] = key
         return result
 
-    def update(self, category: str, key: str, updated_fields: Dict[str, Any]) -> None:
+    def update(
+        self,
+        category: str,
+        key: str,
+        updated_fields: Dict[str, Any],
+        fencing_token: Optional[int] = None
+    ) -> None:
         """
         Update a document in the database. If the document does not exist, raise a ValueError.
         Uses optimistic concurrency control to prevent concurrent updates.
@@ -77,14 +104,16 @@ class MongoDBWrapper(Database):
                 current_document = collection.find_one({"_id": key})
                 if current_document is None:
                     raise ValueError(f"_id {key} not found in the collection {category}.")
+                self._check_fencing_token(category, key, current_document, fencing_token)
 
                 new_version = current_document.get("version", 0) + 1
                 update_fields = {"version": new_version}
                 for field, value in updated_fields.items():
                     update_fields[field] = value
 
+                # Taking a lease doesn't bump the version, so the token is checked by the filter too
                 result = collection.update_one(
-                    {"_id": key, "version": current_document["version"]},
+                    {"_id": key, "version": current_document["version"], **self._fencing_filter(fencing_token)},
                     {"$set": update_fields},
                 )
 
@@ -94,12 +123,16 @@ class MongoDBWrapper(Database):
                     raise Exception("Failed to update document due to concurrent modification.")
         except Exception as e:
             raise ValueError(f"Failed to update document at {category}/{key}: {str(e)}")
+        self._record_mutations(category, [
+            self.mutation_event(category, key, "update", list(updated_fields), new_version, ops=self.set_ops(updated_fields))
+        ])
 
     def delete(self, category, key):
         collection = self.db[category]
         result = collection.delete_one({"_id": key})
         if result.deleted_count == 0:
             raise ValueError(f"_id {key} not found in the collection {category}.")
+        self._record_mutations(category, [self.mutation_event(category, key, "delete", [], None)])
     
     
     
@@ -115,22 +148,269 @@ class MongoDBWrapper(Database):
     def rollback_transaction(self, session: ClientSession):
         session.abort_transaction()
 
+    def atomic_write(self, writes: List[Dict[str, Any]]) -> bool:
+        """
+        On a replica set or sharded cluster all writes run inside one transaction.
+
+        Standalone servers don't support transactions, so the writes are applied one at a
+        time and, if one fails, the ones applied are undone in reverse: created documents
+        are deleted, increments reversed, pushed values pulled and updated fields restored.
+        Other clients can see the batch half applied in the meantime, and a crash partway
+        through leaves the writes applied so far in place.
+        """
+        try:
+            # Collections and indexes can't be created inside a transaction on older servers
+            self._ensure_mutation_index()
+            if self._supports_transactions():
+                with self.client.start_session() as session:
+                    session.with_transaction(lambda session: self._apply_writes(writes, session))
+            else:
+                undo: List[Callable[[], None]] = []
+                try:
+                    self._apply_writes(writes, undo=undo)
+                except Exception:
+                    for revert in reversed(undo):
+                        revert()
+                    raise
+            return True
+        except FilterMismatch:
+            return False
+        except DuplicateKeyError as e:
+            raise ValueError(f"Failed to apply atomic write, a document already exists: {str(e)}")
+
+    def _apply_writes(
+        self,
+        writes: List[Dict[str, Any]],
+        session: ClientSession = None,
+        undo: Optional[List[Callable[[], None]]] = None
+    ) -> None:
+        """
+        Apply writes in order and record them in the change feed, inside session if given.
+        Without a session, a function undoing each write is appended to undo as it's applied.
+        """
+        for write in writes:
+            category = write["category"]
+            if write["type"] == "update_many":
+                events = self._apply_update_many(write, session, undo)
+            else:
+                events = [self._apply_write(write, session, undo)]
+            self._record_mutations(category, events, session)
+
+    def _apply_update_many(
+        self,
+        write: Dict[str, Any],
+        session: ClientSession = None,
+        undo: Optional[List[Callable[[], None]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Sets the same fields on every key. Inside a transaction without a filter that's one
+        update_many. Otherwise the keys are updated one at a time, each only if it matches the
+        filter, so the ones updated are known and can be undone.
+        """
+        category = write["category"]
+        collection = self.db[category]
+        keys = write["keys"]
+        updated_fields = {**write["updated_fields"]}
+        updated_fields.pop("id", None)
+        ops = self.set_ops(updated_fields)
+
+        if session is not None and "filter" not in write and "fencing_token" not in write:
+            collection.update_many({"_id": {"$in": keys}}, {"$set": updated_fields, "$inc": {"version": 1}}, session=session)
+            versions = {
+                document["_id"]: document["version"]
+                for document in collection.find({"_id": {"$in": keys}}, {"version": 1}, session=session)
+            }
+            missing_keys = [key for key in keys if key not in versions]
+            if missing_keys:
+                raise ValueError(f"_ids {missing_keys} not found in the collection {category}.")
+            return [self.mutation_event(category, key, "update", list(updated_fields), versions[key], ops=ops) for key in keys]
+
+        events = []
+        for key in keys:
+            previous = collection.find_one_and_update(
+                {"_id": key, **write.get("filter", {}), **self._fencing_filter(write.get("fencing_token"))},
+                {"$set": updated_fields, "$inc": {"version": 1}},
+                projection={field: 1 for field in [*updated_fields, "version"]},
+                return_document=ReturnDocument.BEFORE,
+                session=session
+            )
+            if previous is None:
+                if collection.count_documents({"_id": key}, session=session) == 0:
+                    raise ValueError(f"_id {key} not found in the collection {category}.")
+                raise FilterMismatch(f"{category}/{key} doesn't match the write's filter or fencing token.")
+            if undo is not None:
+                undo.append(self._restore_fields(category, key, previous, list(updated_fields)))
+            events.append(self.mutation_event(
+                category, key, "update", list(updated_fields), previous.get("version", 0) + 1, ops=ops
+            ))
+        return events
+
+    def _apply_write(
+        self,
+        write: Dict[str, Any],
+        session: ClientSession = None,
+        undo: Optional[List[Callable[[], None]]] = None
+    ) -> Dict[str, Any]:
+        category = write["category"]
+        collection = self.db[category]
+        key = write["key"]
+        write_type = write["type"]
+
+        if write_type == "create":
+            value = {**write["value"]}
+            value.pop("id", None)
+            collection.insert_one({"_id": key, "version": 1, **value}, session=session)
+            if undo is not None:
+                undo.append(lambda: self.delete(category, key))
+            return self.mutation_event(category, key, "create", list(value), 1, values=value)
+        elif write_type == "update":
+            updated_fields = {**write["updated_fields"]}
+            updated_fields.pop("id", None)
+            update = {"$set": updated_fields, "$inc": {"version": 1}}
+            fields = list(updated_fields)
+            ops = self.set_ops(updated_fields)
+        elif write_type == "append_to_array":
+            field, value = write["field"], write["value"]
+            update = {"$push": {field: value}, "$inc": {"version": 1}}
+            fields = [field]
+            ops = [{"op": "push", "path": [field], "value": value}]
+            revert = ({"$pull": {field: value}}, [{"op": "pull", "path": [field], "value": value}])
+        elif write_type == "increment":
+            amounts = write["amounts"]
+            update = {"$inc": {**amounts, "version": 1}}
+            fields = list(amounts)
+            ops = [{"op": "inc", "path": field.split("."), "amount": amount} for field, amount in amounts.items()]
+            revert = (
+                {"$inc": {field: -amount for field, amount in amounts.items()}},
+                [{"op": "inc", "path": field.split("."), "amount": -amount} for field, amount in amounts.items()]
+            )
+        else:
+            raise ValueError(f"Write type {write_type} not recognized.")
+
+        previous = collection.find_one_and_update(
+            {"_id": key, **self._fencing_filter(write.get("fencing_token"))},
+            update,
+            projection={field: 1 for field in [*fields, "version"]} if write_type == "update" else {"version": 1},
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
+        if previous is None:
+            if "fencing_token" in write and collection.count_documents({"_id": key}, session=session):
+                raise FilterMismatch(f"Fencing token {write['fencing_token']} for {category}/{key} is stale.")
+            raise ValueError(f"_id {key} not found in the collection {category}.")
+        if undo is not None:
+            if write_type == "update":
+                undo.append(self._restore_fields(category, key, previous, fields))
+            else:
+                undo.append(lambda: self._revert(category, key, fields, *revert))
+        return self.mutation_event(category, key, "update", fields, previous.get("version", 0) + 1, ops=ops)
+
+    def _restore_fields(
+        self,
+        category: str,
+        key: str,
+        previous: Dict[str, Any],
+        fields: List[str]
+    ) -> Callable[[], None]:
+        """ A function putting fields back to their values in previous, removing the ones it lacks. """
+        restored, removed = {}, []
+        for field in fields:
+            # Dotted fields address nested documents
+            value, found = previous, True
+            for part in field.split("."):
+                if not isinstance(value, dict) or part not in value:
+                    found = False
+                    break
+                value = value[part]
+            if found:
+                restored[field] = value
+            else:
+                removed.append(field)
+        update = {"$set": restored, "$unset": {field: "" for field in removed}}
+        ops = self.set_ops(restored) + [{"op": "unset", "path": field.split(".")} for field in removed]
+        return lambda: self._revert(
+            category, key, fields, {name: part for name, part in update.items() if part}, ops
+        )
+
+    def _revert(self, category: str, key: str, fields: List[str], update: Dict[str, Any], ops: List[Dict[str, Any]]) -> None:
+        """ Undo a write applied outside a transaction, recording the undo in the change feed like any write. """
+        result = self.db[category].find_one_and_update(
+            {"_id": key},
+            {**update, "$inc": {**update.get("$inc", {}), "version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if result is not None:
+            self._record_mutations(category, [self.mutation_event(category, key, "update", fields, result["version"], ops=ops)])
+
+    @staticmethod
+    def _fencing_filter(fencing_token: Optional[int]) -> Dict[str, Any]:
+        """ Matches documents whose lease was last taken with fencing_token or an older one. """
+        if fencing_token is None:
+            return {}
+        return {"lock_token": {"$not": {"$gt": fencing_token}}}
+
+    @staticmethod
+    def _check_fencing_token(category: str, key: str, document: Dict[str, Any], fencing_token: Optional[int]) -> None:
+        if fencing_token is not None and document.get("lock_token", 0) > fencing_token:
+            raise ValueError(f"Fencing token {fencing_token} for {category}/{key} is stale, a newer lease was taken.")
+
+    def _supports_transactions(self) -> bool:
+        """ Transactions need a replica set member or a mongos router. """
+        if not hasattr(self, '_transactions_supported'):
+            hello = self.client.admin.command("hello")
+            self._transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+        return self._transactions_supported
+
 
 
     """                     Locks                     """
-    def lock(self, category: str, key: str) -> bool:
+    def lock(self, category: str, key: str, owner: str, ttl: float = 30.0) -> Optional[int]:
+        """
+        Leases live on the document as lock: {owner, expires_at}. Expiry is computed from the
+        server's clock ($$NOW) so workers with skewed clocks agree on when a lease is stale,
+        and a crashed holder's lease simply lapses. lock_token is never unset, so every
+        acquisition hands out a larger fencing token than the last.
+        """
+        collection = self.db[category]
+        result = collection.find_one_and_update(
+            {
+                "_id": key,
+                "$or": [
+                    {"lock": {"$exists": False}},
+                    {"lock.owner": owner},
+                    {"$expr": {"$lte": ["$lock.expires_at", "$$NOW"]}}
+                ]
+            },
+            [{"$set": {
+                "lock": {"owner": {"$literal": owner}, "expires_at": {"$add": ["$$NOW", int(ttl * 1000)]}},
+                "lock_token": {"$add": [{"$ifNull": ["$lock_token", 0]}, 1]}
+            }}],
+            projection={"lock_token": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if result is None:
+            if not self.exists(category, key):
+                raise ValueError(f"_id {key} not found in the collection {category}.")
+            return None
+        return result["lock_token"]
+
+    def renew_lock(self, category: str, key: str, owner: str, ttl: float = 30.0) -> bool:
         collection = self.db[category]
         result = collection.update_one(
-            {"_id": key, "lock": {"$exists": False}},
-            {"$set": {"lock": True}},
-            upsert=False
+            {
+                "_id": key,
+                "lock.owner": owner,
+                "$expr": {"$gt": ["$lock.expires_at", "$$NOW"]}
+            },
+            [{"$set": {"lock.expires_at": {"$add": ["$$NOW", int(ttl * 1000)]}}}]
         )
-        return result.modified_count > 0
+        return result.matched_count > 0
 
-    def unlock(self, category: str, key: str) -> None:
+    def unlock(self, category: str, key: str, owner: str) -> None:
         collection = self.db[category]
         collection.update_one(
-            {"_id": key},
+            {"_id": key, "lock.owner": owner},
             {"$unset": {"lock": ""}}
         )
 
@@ -156,8 +436,15 @@ class MongoDBWrapper(Database):
 
         if len(list(result)) == 0:
             raise ValueError(f"_id {key} not found in the collection {category}.")
-
-    def replace(self, category: str, key: str, replacement_document: Dict[str, Any]) -> None:
+        self._record_mutations(category, [self.mutation_event(category, new_key, "create", [], 1)])
+
+    def replace(
+        self,
+        category: str,
+        key: str,
+        replacement_document: Dict[str, Any],
+        fencing_token: Optional[int] = None
+    ) -> None:
         """
         Replace a document in the database. If the document does not exist, raise a ValueError.
         Uses optimistic concurrency control to prevent concurrent updates.
@@ -171,13 +458,18 @@ class MongoDBWrapper(Database):
                 current_document = collection.find_one({"_id": key})
                 if current_document is None:
                     raise ValueError(f"_id {key} not found in the collection {category}.")
+                self._check_fencing_token(category, key, current_document, fencing_token)
 
                 new_version = current_document.get("version", 0) + 1
                 replacement_document["version"] = new_version
                 replacement_document["_id"] = key
+                # Replacing the document must not drop a lease someone holds on it
+                for lock_field in ("lock", "lock_token"):
+                    if lock_field in current_document:
+                        replacement_document[lock_field] = current_document[lock_field]
 
                 result = collection.replace_one(
-                    {"_id": key, "version": current_document["version"]},
+                    {"_id": key, "version": current_document["version"], **self._fencing_filter(fencing_token)},
                     replacement_document
                 )
 
@@ -187,6 +479,17 @@ class MongoDBWrapper(Database):
                     raise Exception("Failed to replace document due to concurrent modification.")
         except Exception as e:
             raise ValueError(f"Failed to replace document at {category}/{key}: {str(e)}")
+        changed_fields = [
+            field for field in sorted(set(current_document) | set(replacement_document))
+            if field not in ("_id", "version") and current_document.get(field) != replacement_document.get(field)
+        ]
+        ops = self.diff_ops(
+            {field: value for field, value in current_document.items() if field not in self.BOOKKEEPING_FIELDS},
+            {field: value for field, value in replacement_document.items() if field not in self.BOOKKEEPING_FIELDS}
+        )
+        self._record_mutations(category, [
+            self.mutation_event(category, key, "update", changed_fields, new_version, ops=ops)
+        ])
 
     def get_field(self, category: str, key: str, field: str) -> Any:
         collection = self.db[category]
@@ -206,22 +509,31 @@ class MongoDBWrapper(Database):
         collection = self.db[category]
         result = collection.find_one_and_update(
             {"_id": key},
-            {"$inc": {field: amount}},
+            {"$inc": {field: amount, "version": 1}},
+            projection={field: 1, "version": 1},
             return_document=ReturnDocument.BEFORE
         )
         if result is None:
             raise ValueError(f"_id {key} not found in the collection {category}.")
+        self._record_mutations(category, [self.mutation_event(
+            category, key, "update", [field], result.get("version", 0) + 1,
+            ops=[{"op": "inc", "path": field.split("."), "amount": amount}]
+        )])
         return result.get(field, 0)
 
     def pop_field(self, category: str, key: str, field: str) -> Any:
         collection = self.db[category]
         result = collection.find_one_and_update(
             {"_id": key},
-            {"$unset": {field: ""}},
+            {"$unset": {field: ""}, "$inc": {"version": 1}},
+            projection={field: 1, "version": 1},
             return_document=ReturnDocument.BEFORE
         )
         if result is None:
             raise ValueError(f"_id {key} not found in the collection {category}.")
+        self._record_mutations(category, [self.mutation_event(
+            category, key, "update", [field], result.get("version", 0) + 1, ops=[{"op": "unset", "path": [field]}]
+        )])
         return result.get(field, None)
 
 
@@ -229,12 +541,17 @@ class MongoDBWrapper(Database):
     """                     List operations                     """
     def append_to_array(self, category: str, key: str, field: str, value: Any) -> None:
         collection = self.db[category]
-        result = collection.update_one(
+        result = collection.find_one_and_update(
             {"_id": key},
-            {"$push": {field: value}}
+            {"$push": {field: value}, "$inc": {"version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER
         )
-        if result.matched_count == 0:
+        if result is None:
             raise ValueError(f"_id {key} not found in the collection {category}.")
+        self._record_mutations(category, [self.mutation_event(
+            category, key, "update", [field], result["version"], ops=[{"op": "push", "path": [field], "value": value}]
+        )])
 
     def remove_from_array_at_index(self, category: str, key: str, field: str, index: int) -> None:
         collection = self.db[category]
@@ -250,10 +567,16 @@ class MongoDBWrapper(Database):
             {"_id": key},
             {"$unset": {f"{field}.{index}": ""}}
         )
-        collection.update_one(
+        result = collection.find_one_and_update(
             {"_id": key},
-            {"$pull": {field: None}}
+            {"$pull": {field: None}, "$inc": {"version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER
         )
+        self._record_mutations(category, [self.mutation_event(
+            category, key, "update", [field], result["version"],
+            ops=[{"op": "remove_at", "path": [field], "index": index}]
+        )])
 
     def remove_value_from_array(self, category: str, key: str, field: str, value: Any) -> None:
         collection = self.db[category]
@@ -265,24 +588,37 @@ class MongoDBWrapper(Database):
         if value not in document[field]:
             raise ValueError(f"Value '{value}' not found in the array of field '{field}' in the document with _id {key}.")
         
-        collection.update_one(
+        result = collection.find_one_and_update(
             {"_id": key},
-            {"$pull": {field: value}}
+            {"$pull": {field: value}, "$inc": {"version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER
         )
+        self._record_mutations(category, [self.mutation_event(
+            category, key, "update", [field], result["version"], ops=[{"op": "pull", "path": [field], "value": value}]
+        )])
 
     def pop_array(self, category: str, key: str, field: str, index: int = -1) -> Any:
+        # $pop can only take from either end: -1 removes the first element, 1 the last
+        if index not in (0, -1):
+            raise ValueError(f"pop_array only supports index 0 or -1, not {index}.")
         collection = self.db[category]
         result = collection.find_one_and_update(
             {"_id": key},
-            {"$pop": {field: 1 if index >= 0 else -1}},
-            projection={field: 1, "_id": 0},
+            {"$pop": {field: -1 if index == 0 else 1}, "$inc": {"version": 1}},
+            # Only the element popped is read back, not the whole array
+            projection={field: {"$slice": 1 if index == 0 else -1}, "version": 1, "_id": 0},
             return_document=ReturnDocument.BEFORE
         )
         if result is None:
             raise ValueError(f"_id {key} not found in the collection {category}.")
         if field not in result:
             raise KeyError(f"Field '{field}' not found in the document with _id {key}.")
-        return result[field][index]
+        self._record_mutations(category, [self.mutation_event(
+            category, key, "update", [field], result.get("version", 0) + 1,
+            ops=[{"op": "remove_at", "path": [field], "index": index}]
+        )])
+        return result[field][0]
 
     def array_length(self, category: str, key: str, field: str) -> int:
         collection = self.db[category]
@@ -314,10 +650,13 @@ class MongoDBWrapper(Database):
             raise ValueError(f"One or more documents already exist in collection {category}.")
         except Exception as e:
             raise ValueError(f"Failed to create documents: {str(e)}")
+        self._record_mutations(category, [
+            self.mutation_event(category, key, "create", list(value), 1, values=value) for key, value in keys.items()
+        ])
 
-    def batch_read(self, category: str, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    def batch_read(self, category: str, keys: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
         collection = self.db[category]
-        results = collection.find({"_id": {"$in": keys}})
+        results = collection.find({"_id": {"$in": keys}}, self._projection(fields))
         documents = {}
         for result in results:
             result_copy = result.copy()
@@ -331,6 +670,7 @@ class MongoDBWrapper(Database):
         try:
             collection = self.db[category]
             bulk_operations = []
+            events = []
             for key, fields in updated_fields.items():
                 fields.pop("id", None)
                 current_document = collection.find_one({"_id": key})
@@ -344,15 +684,20 @@ class MongoDBWrapper(Database):
                         {"$set": update_fields}
                     )
                 )
+                events.append(self.mutation_event(
+                    category, key, "update", list(fields), new_version, ops=self.set_ops(fields)
+                ))
             collection.bulk_write(bulk_operations)
         except pymongo.errors.BulkWriteError as e:
             raise ValueError(f"Failed to update one or more documents due to concurrent modification.")
         except Exception as e:
             raise ValueError(f"Failed to update documents: {str(e)}")
+        self._record_mutations(category, events)
 
     def batch_delete(self, category: str, keys: List[str]) -> None:
         collection = self.db[category]
         result = collection.delete_many({"_id": {"$in": keys}})
+        self._record_mutations(category, [self.mutation_event(category, key, "delete", [], None) for key in keys])
         if result.deleted_count != len(keys):
             raise ValueError(f"One or more _ids not found in the collection {category}.")
 
@@ -376,4 +721,153 @@ class MongoDBWrapper(Database):
         try:
             collection.bulk_write(bulk_operations, ordered=False)
         except pymongo.errors.BulkWriteError as e:
-            raise ValueError(f"One or more _ids not found in the collection {category}.")
\ No newline at end of file
+            raise ValueError(f"One or more _ids not found in the collection {category}.")
+        self._record_mutations(category, [self.mutation_event(category, new_key, "create", [], 1) for new_key in new_keys])
+
+
+
+
+    @staticmethod
+    def _projection(fields: Optional[List[str]]) -> Optional[Dict[str, int]]:
+        """ Only transfer the requested fields. None means the whole document. """
+        if fields is None:
+            return None
+        # An empty projection would return everything, so ask for just the _id instead
+        return {field: 1 for field in fields if field != "id"} or {"_id": 1}
+
+
+
+
+    """                     Tree queries                     """
+    def ancestors(self, category: str, key: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """ One $graphLookup up the parent_id links. """
+        return self._graph_lookup(category, key, "parent_id", None, fields)
+
+    def descendants(
+        self,
+        category: str,
+        key: str,
+        max_depth: Optional[int] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """ One $graphLookup down the children_ids links. """
+        if max_depth is not None and max_depth < 1:
+            self.read(category, key, [])
+            return []
+        return self._graph_lookup(category, key, "children_ids", max_depth, fields)
+
+    def _graph_lookup(
+        self,
+        category: str,
+        key: str,
+        link_field: str,
+        max_depth: Optional[int],
+        fields: Optional[List[str]]
+    ) -> List[Dict[str, Any]]:
+        graph_lookup = {
+            "from": category,
+            "startWith": f"${link_field}",
+            "connectFromField": link_field,
+            "connectToField": "_id",
+            "as": "found",
+            "depthField": "depth",
+        }
+        if max_depth is not None:
+            graph_lookup["maxDepth"] = max_depth - 1 # maxDepth 0 stops at the first hop
+        # $unwind straight after $graphLookup is folded into the lookup, so each node
+        # streams back as its own document and big subtrees are never gathered into
+        # one result document, which would be held to the document size limit
+        pipeline = [
+            {"$match": {"_id": key}},
+            {"$graphLookup": graph_lookup},
+            {"$unwind": "$found"},
+            {"$replaceRoot": {"newRoot": "$found"}},
+        ]
+        if fields is not None:
+            projection = {"_id": 1, "depth": 1}
+            projection.update({field: 1 for field in fields if field != "id"})
+            pipeline.append({"$project": projection})
+        pipeline.append({"$sort": {"depth": 1}})
+        cursor = self.db[category].aggregate(pipeline, allowDiskUse=True)
+
+        documents = []
+        for document in cursor:
+            document["id"] = document.pop("_id")
+            document.pop("version", None)
+            document["depth"] += 1
+            documents.append(document)
+        if not documents and not self.exists(category, key):
+            raise ValueError(f"_id {key} not found in the collection {category}.")
+        return documents
+
+
+
+    """                     Change feed                     """
+    def read_mutations(self, swarm_id: str, since: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Outside transactions a writer claims its cursors before inserting its events, so a
+        later writer's events can land first. Reading stops at such a gap until it fills. A
+        writer that died in between leaves the gap for good, so once the event after it is
+        MUTATION_GAP_TIMEOUT seconds old the gap is skipped.
+        """
+        cursor = self.db["mutations"].find(
+            {"swarm_id": swarm_id, "cursor": {"$gt": since}},
+            {"_id": 0}
+        ).sort("cursor", pymongo.ASCENDING)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        events = list(cursor)
+        expected_cursor = since + 1
+        for i, event in enumerate(events):
+            if event["cursor"] != expected_cursor and time.time() - event["timestamp"] < MUTATION_GAP_TIMEOUT:
+                return events[:i]
+            expected_cursor = event["cursor"] + 1
+        return events
+
+    def mutation_cursor(self, swarm_id: str) -> int:
+        counter = self.db["mutation_counters"].find_one({"_id": swarm_id})
+        return counter["cursor"] if counter else 0
+
+    def clear_mutations(self, swarm_id: str) -> None:
+        self.db["mutations"].delete_many({"swarm_id": swarm_id})
+        self.db["mutation_counters"].delete_one({"_id": swarm_id})
+
+    def _record_mutations(
+        self,
+        category: str,
+        events: List[Dict[str, Any]],
+        session: ClientSession = None
+    ) -> None:
+        """
+        Append events to their swarms' mutation logs. Cursors are claimed in one block per
+        swarm from a counter document, so a batch write costs two round trips per swarm.
+        """
+        if category in self.UNTRACKED_CATEGORIES or not events:
+            return
+        self._ensure_mutation_index()
+        events_by_swarm: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            events_by_swarm.setdefault(self.get_swarm_id(category, event["id"]), []).append(event)
+
+        for swarm_id, swarm_events in events_by_swarm.items():
+            counter = self.db["mutation_counters"].find_one_and_update(
+                {"_id": swarm_id},
+                {"$inc": {"cursor": len(swarm_events)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            first_cursor = counter["cursor"] - len(swarm_events) + 1
+            documents = [
+                {"swarm_id": swarm_id, "cursor": first_cursor + i, **event}
+                for i, event in enumerate(swarm_events)
+            ]
+            self.db["mutations"].insert_many(documents, session=session)
+
+    def _ensure_mutation_index(self) -> None:
+        if not hasattr(self, '_mutation_index_created'):
+            self.db["mutations"].create_index(
+                [("swarm_id", pymongo.ASCENDING), ("cursor", pymongo.ASCENDING)],
+                unique=True
+            )
+            self._mutation_index_created = True
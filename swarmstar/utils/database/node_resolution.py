@@ -0,0 +1,45 @@
+"""
+Metadata nodes live in one of three places:
+    - internal: in the package's internal metadata
+    - portal: an internal node whose swarm copy, {swarm_id}_{node_id}, is in the database
+    - external: only in the database
+
+Where an id lives never changes unless the node is deleted and created again, so
+once an id has been resolved, later lookups can go straight to the right store.
+The cache is partitioned by swarm, because portal copies belong to a swarm.
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+INTERNAL = "internal"
+PORTAL = "portal"
+EXTERNAL = "external"
+
+class NodeResolutionCache:
+    def __init__(self):
+        self._stores: Dict[str, Dict[Tuple[str, str], str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, swarm_id: Optional[str], collection: str, node_id: str) -> Optional[str]:
+        """ Returns internal, portal or external if the id was resolved before, else None. """
+        return self._stores.get(swarm_id or "", {}).get((collection, node_id))
+
+    def set(self, swarm_id: Optional[str], collection: str, node_id: str, store: str) -> None:
+        with self._lock:
+            self._stores.setdefault(swarm_id or "", {})[(collection, node_id)] = store
+
+    def invalidate(self, collection: str, node_id: str) -> None:
+        """ Forget an id in every swarm, for when a node is created or deleted. """
+        with self._lock:
+            for stores in self._stores.values():
+                stores.pop((collection, node_id), None)
+
+    def clear(self, swarm_id: Optional[str] = None) -> None:
+        """ Forget everything resolved for one swarm, or for all swarms. """
+        with self._lock:
+            if swarm_id is None:
+                self._stores.clear()
+            else:
+                self._stores.pop(swarm_id, None)
+
+node_resolution_cache = NodeResolutionCache()
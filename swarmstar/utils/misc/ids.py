@@ -13,10 +13,10 @@ And y represents the number of the node of that type.
 """
 import uuid
 
-from swarmstar.utils.database import MongoDBWrapper
+from swarmstar.utils.database import get_database
 from swarmstar.context import swarm_id_var
 
-db = MongoDBWrapper()
+db = get_database()
 
 def generate_uuid(identifier: str) -> str:
     id = str(uuid.uuid4())
@@ -42,8 +42,8 @@ def get_available_id(collection: str) -> str:
         inner_key = "action_count"
     else: raise ValueError(f"Collection {collection} not recognized.")
 
-    y = db.get_field("admin", swarm_id_var.get(), inner_key)
-    db.increment("admin", swarm_id_var.get(), inner_key)
+    # increment returns the value before incrementing, so this claims y in one round trip
+    y = db.increment("admin", swarm_id_var.get(), inner_key)
     return f"{swarm_id_var.get()}_{x}{y}"
 
 def get_x_given_collection(collection: str) -> str:
@@ -0,0 +1,11 @@
+"""
+Helpers for writing documents out as JSON.
+"""
+from enum import Enum
+from typing import Any
+
+def json_default(value: Any) -> Any:
+    """ Fallback for json.dumps. The local database keeps enum defaults of models as they are. """
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
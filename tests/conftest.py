@@ -0,0 +1,39 @@
+import os
+import uuid
+
+# The unit tests run against the in-memory backend, it has to be picked before swarmstar is imported
+os.environ.setdefault("SWARMSTAR_DATABASE", "local")
+
+import pytest
+
+from swarmstar.context import swarm_id_var
+from swarmstar.models import SwarmstarSpace
+from swarmstar.utils.database import get_database
+from swarmstar.utils.database.mongodb_wrapper import MongoDBWrapper
+
+@pytest.fixture
+def db():
+    return get_database()
+
+@pytest.fixture
+def mongodb():
+    """ MongoDB on mongomock, run as a standalone server without transactions. """
+    mongomock = pytest.importorskip("mongomock")
+    backend = object.__new__(MongoDBWrapper)
+    backend.client = mongomock.MongoClient()
+    backend.db = backend.client["swarmstar_test"]
+    backend._transactions_supported = False
+    return backend
+
+@pytest.fixture
+def swarm_id():
+    """ A fresh swarmstar space, deleted again after the test. """
+    swarm_id = f"test{uuid.uuid4().hex[:8]}"
+    SwarmstarSpace.instantiate_swarmstar_space(swarm_id)
+    token = swarm_id_var.set(swarm_id)
+    yield swarm_id
+    swarm_id_var.reset(token)
+    try:
+        SwarmstarSpace.delete_swarmstar_space(swarm_id)
+    except ValueError:
+        pass
@@ -0,0 +1,77 @@
+import uuid
+
+import pytest
+
+from swarmstar.utils.database.local_database import LocalDatabase
+
+@pytest.fixture(params=["local", "mongodb"])
+def backend(request):
+    if request.param == "local":
+        return LocalDatabase()
+    return request.getfixturevalue("mongodb")
+
+@pytest.fixture
+def node_id(backend):
+    node_id = f"aw{uuid.uuid4().hex[:8]}_n0"
+    backend.create("swarm_nodes", node_id, {"name": "node", "children_ids": [], "alive_children": 0})
+    return node_id
+
+def _writes(node_id, child_id):
+    return [
+        {"type": "create", "category": "swarm_nodes", "key": child_id, "value": {"name": "child"}},
+        {"type": "append_to_array", "category": "swarm_nodes", "key": node_id, "field": "children_ids", "value": child_id},
+        {"type": "increment", "category": "swarm_nodes", "key": node_id, "amounts": {"alive_children": 1}},
+        {"type": "update", "category": "swarm_nodes", "key": node_id, "updated_fields": {"name": "parent"}},
+    ]
+
+def test_failed_write_undoes_the_writes_before_it(backend, node_id):
+    swarm_id = node_id.split("_")[0]
+    child_id = f"{swarm_id}_n1"
+    missing = {"type": "update", "category": "swarm_nodes", "key": f"{swarm_id}_n9", "updated_fields": {"name": "missing"}}
+
+    with pytest.raises(ValueError):
+        backend.atomic_write([*_writes(node_id, child_id), missing])
+
+    assert not backend.exists("swarm_nodes", child_id)
+    assert backend.read("swarm_nodes", node_id, ["name", "children_ids", "alive_children"]) == {
+        "id": node_id, "name": "node", "children_ids": [], "alive_children": 0
+    }
+
+def test_local_rollback_drops_the_mutation_events(node_id):
+    backend = LocalDatabase()
+    swarm_id = node_id.split("_")[0]
+    cursor = backend.mutation_cursor(swarm_id)
+    missing = {"type": "update", "category": "swarm_nodes", "key": f"{swarm_id}_n9", "updated_fields": {"name": "missing"}}
+
+    with pytest.raises(ValueError):
+        backend.atomic_write([*_writes(node_id, f"{swarm_id}_n1"), missing])
+
+    assert backend.mutation_cursor(swarm_id) == cursor
+
+@pytest.mark.parametrize("guard", [{"filter": {"name": "renamed"}}, {"fencing_token": 0}])
+def test_guard_mismatch_returns_false_and_applies_nothing(backend, node_id, guard):
+    swarm_id = node_id.split("_")[0]
+    child_id = f"{swarm_id}_n1"
+    if "fencing_token" in guard:
+        backend.lock("swarm_nodes", node_id, "other owner")
+    # Filters are only part of the contract for update_many
+    writes = [*_writes(node_id, child_id)[:-1], {
+        "type": "update_many", "category": "swarm_nodes", "keys": [node_id], "updated_fields": {"name": "parent"}, **guard
+    }]
+
+    assert backend.atomic_write(writes) is False
+
+    assert not backend.exists("swarm_nodes", child_id)
+    assert backend.read("swarm_nodes", node_id, ["name", "children_ids", "alive_children"]) == {
+        "id": node_id, "name": "node", "children_ids": [], "alive_children": 0
+    }
+
+def test_successful_write_applies_everything(backend, node_id):
+    child_id = f"{node_id.split('_')[0]}_n1"
+
+    assert backend.atomic_write(_writes(node_id, child_id)) is True
+
+    assert backend.read("swarm_nodes", child_id, ["name"]) == {"id": child_id, "name": "child"}
+    assert backend.read("swarm_nodes", node_id, ["name", "children_ids", "alive_children"]) == {
+        "id": node_id, "name": "parent", "children_ids": [child_id], "alive_children": 1
+    }
@@ -0,0 +1,39 @@
+from swarmstar.utils.database.compiled_metadata import CompiledMetadata, compile_metadata
+
+TABLES = {
+    "action_metadata": {
+        "root": {"is_folder": True, "name": "Root", "description": "everything", "children_ids": ["a", "b"]},
+        "a": {"is_folder": True, "name": "A", "description": "first", "children_ids": ["a1"], "parent_id": "root"},
+        "a1": {"is_folder": False, "name": "A1", "description": "leaf", "parent_id": "a"},
+        "a2": {"is_folder": False, "name": "A2", "description": "named only by its parent_id", "parent_id": "a"},
+        "b": {"is_folder": False, "name": "B", "description": "second", "parent_id": "root"},
+    }
+}
+
+def _compiled() -> CompiledMetadata:
+    return CompiledMetadata(compile_metadata(TABLES))
+
+def test_nodes_round_trip():
+    compiled = _compiled()
+    assert compiled.tables() == ["action_metadata"]
+    assert compiled.get("action_metadata", "a1") == TABLES["action_metadata"]["a1"]
+
+def test_ancestors_and_depth():
+    compiled = _compiled()
+    assert compiled.ancestors("action_metadata", "a1") == ["root", "a"]
+    assert compiled.ancestors("action_metadata", "root") == []
+    assert compiled.depth("action_metadata", "a2") == 2
+
+def test_children_include_nodes_that_only_name_their_parent():
+    assert _compiled().children("action_metadata", "a") == ["a1", "a2"]
+
+def test_descendants_are_a_preorder_slice():
+    compiled = _compiled()
+    assert compiled.descendants("action_metadata", "root") == ["a", "a1", "a2", "b"]
+    assert compiled.descendants("action_metadata", "root", max_depth=1) == ["a", "b"]
+    assert compiled.descendants("action_metadata", "b") == []
+
+def test_option_text_lists_only_listed_children():
+    compiled = _compiled()
+    assert compiled.option_text("action_metadata", "a") == "0. A1: leaf"
+    assert compiled.option_text("action_metadata", "b") is None
@@ -0,0 +1,91 @@
+import uuid
+
+import pytest
+
+from swarmstar.models import SwarmNode, SwarmstarSpace
+from swarmstar.utils.database.forks import TOMBSTONE
+
+def _create_node(swarm_id: str, index: int, **fields) -> None:
+    SwarmNode(id=f"{swarm_id}_n{index}", name="node", type="test", message="test", **fields).create()
+
+@pytest.fixture
+def fork_id(db, swarm_id):
+    """ A fork of swarm_id after it got a root with one child. """
+    _create_node(swarm_id, 0, children_ids=[f"{swarm_id}_n1"])
+    _create_node(swarm_id, 1, parent_id=f"{swarm_id}_n0")
+    db.update("admin", swarm_id, {"node_count": 2})
+    fork_id = f"fork{uuid.uuid4().hex[:8]}"
+    SwarmstarSpace.fork_swarmstar_space(swarm_id, fork_id)
+    yield fork_id
+    if db.exists("admin", fork_id):
+        SwarmstarSpace.delete_swarmstar_space(fork_id)
+
+def test_fork_reads_through_to_the_parent_with_rebased_ids(db, swarm_id, fork_id):
+    node = db.read("swarm_nodes", f"{fork_id}_n0")
+    assert node["children_ids"] == [f"{fork_id}_n1"]
+    assert node["message"] == "test"
+    assert not db.backend.exists("swarm_nodes", f"{fork_id}_n0")
+
+def test_fork_writes_copy_and_leave_the_parent_alone(db, swarm_id, fork_id):
+    db.update("swarm_nodes", f"{fork_id}_n1", {"message": "forked"})
+    assert db.read("swarm_nodes", f"{fork_id}_n1")["message"] == "forked"
+    assert db.read("swarm_nodes", f"{swarm_id}_n1")["message"] == "test"
+    assert db.read("swarm_nodes", f"{fork_id}_n1")["parent_id"] == f"{fork_id}_n0"
+
+def test_forked_parent_is_sealed(db, swarm_id, fork_id):
+    with pytest.raises(ValueError, match="read-only"):
+        db.update("swarm_nodes", f"{swarm_id}_n1", {"message": "changed"})
+
+def test_deleting_the_fork_unseals_the_parent(db, swarm_id, fork_id):
+    SwarmstarSpace.delete_swarmstar_space(fork_id)
+    db.update("swarm_nodes", f"{swarm_id}_n1", {"message": "changed"})
+    assert db.read("swarm_nodes", f"{swarm_id}_n1")["message"] == "changed"
+
+def test_deleting_an_inherited_document_leaves_a_tombstone(db, swarm_id, fork_id):
+    db.delete("swarm_nodes", f"{fork_id}_n1")
+    assert not db.exists("swarm_nodes", f"{fork_id}_n1")
+    assert db.backend.read("swarm_nodes", f"{fork_id}_n1")[TOMBSTONE]
+    assert db.exists("swarm_nodes", f"{swarm_id}_n1")
+
+def test_fork_delete_removes_its_own_documents(db, swarm_id, fork_id):
+    db.update("swarm_nodes", f"{fork_id}_n1", {"message": "forked"})
+    SwarmstarSpace.delete_swarmstar_space(fork_id)
+    assert not db.backend.exists("swarm_nodes", f"{fork_id}_n1")
+    assert db.exists("swarm_nodes", f"{swarm_id}_n1")
+
+def test_writes_to_an_unforked_swarm_dont_read_admin(db, swarm_id, monkeypatch):
+    _create_node(swarm_id, 0)
+    db.update("swarm_nodes", f"{swarm_id}_n0", {"message": "warm"})
+    reads = []
+    backend_read = db.backend.read
+    monkeypatch.setattr(db.backend, "read", lambda category, *args, **kwargs: (
+        reads.append(category), backend_read(category, *args, **kwargs))[1])
+    for i in range(5):
+        db.update("swarm_nodes", f"{swarm_id}_n0", {"message": str(i)})
+    assert "admin" not in reads
+
+def test_clone_of_a_fork_stands_on_its_own(db, swarm_id, fork_id):
+    db.atomic_write([{"type": "increment", "category": "admin", "key": fork_id, "amounts": {
+        "stats.in_flight_llm_calls": 1, "stats.operations.spawn.running": 2, "stats.operations.spawn.pending": 1
+    }}])
+    clone_id = f"clone{uuid.uuid4().hex[:8]}"
+    SwarmstarSpace.clone_swarmstar_space(fork_id, clone_id)
+    try:
+        clone = SwarmstarSpace.read(clone_id)
+        assert clone.parent_swarm_id is None and clone.fork_cursor is None and clone.fork_ids == []
+        assert clone.stats.in_flight_llm_calls == 0
+        assert clone.stats.operations["spawn"] == {"pending": 3}
+        assert db.read("swarm_nodes", f"{clone_id}_n0")["children_ids"] == [f"{clone_id}_n1"]
+        db.update("swarm_nodes", f"{clone_id}_n1", {"message": "cloned"})
+        assert SwarmstarSpace.read(swarm_id).fork_ids == [fork_id]
+    finally:
+        SwarmstarSpace.delete_swarmstar_space(clone_id)
+
+def test_clone_of_a_forked_parent_is_writable(db, swarm_id, fork_id):
+    clone_id = f"clone{uuid.uuid4().hex[:8]}"
+    SwarmstarSpace.clone_swarmstar_space(swarm_id, clone_id)
+    try:
+        db.update("swarm_nodes", f"{clone_id}_n1", {"message": "cloned"})
+        assert db.read("swarm_nodes", f"{clone_id}_n1")["message"] == "cloned"
+    finally:
+        SwarmstarSpace.delete_swarmstar_space(clone_id)
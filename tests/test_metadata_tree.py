@@ -0,0 +1,52 @@
+import pytest
+
+from swarmstar.models import ActionMetadataTree, ExternalActionFolderMetadata, ExternalActionMetadata
+from swarmstar.models.metadata.action_metadata import ActionMetadata
+from swarmstar.utils.database import internal
+from swarmstar.utils.database.compiled_metadata import CompiledMetadata, compile_metadata
+
+@pytest.fixture
+def portal_id(monkeypatch):
+    """ Marks the internal action root as a portal node for the test. """
+    tables = internal.load_internal_metadata_from_sqlite()
+    tables["action_metadata"]["root"]["portal"] = True
+    snapshot = internal.InternalMetadataSnapshot(CompiledMetadata(compile_metadata(tables)))
+    monkeypatch.setattr(internal, "get_internal_metadata_snapshot", lambda: snapshot)
+    return "root"
+
+def _external_action(parent_id, **fields):
+    return ExternalActionMetadata(
+        name="external action", type="external_action", description="An external action.",
+        parent_id=parent_id, **fields
+    )
+
+def test_creating_a_node_attaches_it_to_an_external_folder(swarm_id, db):
+    folder = ExternalActionFolderMetadata(
+        name="external folder", type="external_folder", description="An external folder.", children_ids=[]
+    )
+    folder.create()
+    action = _external_action(folder.id)
+    action.create()
+
+    assert db.read(ActionMetadata.collection, folder.id)["children_ids"] == [action.id]
+
+def test_portal_is_only_copied_once_something_is_attached(swarm_id, db, portal_id):
+    internal_children_ids = ActionMetadata.get_node_dict(portal_id)["children_ids"]
+    assert not db.exists(ActionMetadata.collection, f"{swarm_id}_{portal_id}")
+
+    action = _external_action(portal_id)
+    action.create()
+
+    assert db.read(ActionMetadata.collection, f"{swarm_id}_{portal_id}")["children_ids"] == [*internal_children_ids, action.id]
+    assert ActionMetadata.get_node_dict(portal_id)["children_ids"] == [*internal_children_ids, action.id]
+
+def test_portal_is_copied_once_for_several_attachments(swarm_id, db, portal_id):
+    first, second = _external_action(portal_id), _external_action(portal_id)
+    first.create()
+    second.create()
+
+    assert ActionMetadata.get_node_dict(portal_id)["children_ids"][-2:] == [first.id, second.id]
+
+def test_attaching_to_an_internal_node_that_isnt_a_portal_fails(swarm_id):
+    with pytest.raises(ValueError):
+        ActionMetadataTree.add_child("root", f"{swarm_id}_a0")
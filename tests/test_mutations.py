@@ -0,0 +1,53 @@
+import time
+import uuid
+
+from swarmstar.utils.database.local_database import LocalDatabase
+from swarmstar.utils.database.mongodb_wrapper import MUTATION_GAP_TIMEOUT
+
+def _insert_events(backend, swarm_id, cursors, age=0.0):
+    backend.db["mutations"].insert_many([
+        {
+            "swarm_id": swarm_id, "cursor": cursor, "collection": "swarm_nodes", "id": f"{swarm_id}_n0",
+            "type": "update", "fields": ["name"], "version": cursor, "timestamp": time.time() - age
+        }
+        for cursor in cursors
+    ])
+
+def _cursors(events):
+    return [event["cursor"] for event in events]
+
+def test_reading_stops_at_a_gap_until_it_fills(mongodb):
+    _insert_events(mongodb, "gap", [1, 2, 4, 5])
+
+    assert _cursors(mongodb.read_mutations("gap")) == [1, 2]
+    assert mongodb.read_mutations("gap", since=2) == []
+
+    _insert_events(mongodb, "gap", [3])
+
+    assert _cursors(mongodb.read_mutations("gap")) == [1, 2, 3, 4, 5]
+    assert _cursors(mongodb.read_mutations("gap", since=2, limit=2)) == [3, 4]
+
+def test_gap_is_skipped_once_the_event_after_it_is_old(mongodb):
+    _insert_events(mongodb, "stale", [1, 2])
+    _insert_events(mongodb, "stale", [4], age=MUTATION_GAP_TIMEOUT + 1)
+    _insert_events(mongodb, "stale", [6])
+
+    assert _cursors(mongodb.read_mutations("stale")) == [1, 2, 4]
+
+def test_gap_right_after_since_holds_reading_back(mongodb):
+    _insert_events(mongodb, "since", [1, 3])
+
+    assert mongodb.read_mutations("since", since=1) == []
+
+def test_writes_produce_consecutive_cursors(mongodb):
+    for backend in (LocalDatabase(), mongodb):
+        swarm_id = f"mu{uuid.uuid4().hex[:8]}"
+        backend.create("swarm_nodes", f"{swarm_id}_n0", {"name": "node", "children_ids": []})
+        backend.update("swarm_nodes", f"{swarm_id}_n0", {"name": "renamed"})
+        backend.append_to_array("swarm_nodes", f"{swarm_id}_n0", "children_ids", f"{swarm_id}_n1")
+
+        events = backend.read_mutations(swarm_id)
+        assert _cursors(events) == [1, 2, 3]
+        assert [event["type"] for event in events] == ["create", "update", "update"]
+        assert backend.mutation_cursor(swarm_id) == 3
+        assert _cursors(backend.read_mutations(swarm_id, since=1, limit=1)) == [2]
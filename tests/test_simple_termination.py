@@ -0,0 +1,44 @@
+from swarmstar.models import TerminationOperation
+from swarmstar.operations.termination_operations import simple
+
+def _create_chain(db, swarm_id, policies):
+    """ A straight line of nodes, each with the termination policy given for its depth. """
+    node_ids = [f"{swarm_id}_n{index}" for index in range(len(policies))]
+    db.batch_create("swarm_nodes", {
+        node_id: {
+            "parent_id": node_ids[index - 1] if index else None,
+            "children_ids": node_ids[index + 1:index + 2],
+            "alive": True,
+            "alive_children": 1 if index < len(policies) - 1 else 0,
+            "type": "action",
+            "name": node_id,
+            "message": "",
+            "termination_policy": policy,
+            "context": {"depth": index},
+        }
+        for index, (node_id, policy) in enumerate(zip(node_ids, policies))
+    })
+    return node_ids
+
+def test_simple_chain_dies_in_one_pass(swarm_id, db):
+    node_ids = _create_chain(db, swarm_id, ["confirm_directive_completion", "simple", "simple", "simple"])
+
+    operation = simple.terminate(TerminationOperation(terminator_id=node_ids[3], node_id=node_ids[3]))
+
+    assert (operation.node_id, operation.terminator_id) == (node_ids[0], node_ids[1])
+    assert operation.context == {"depth": 1}
+    assert [db.read("swarm_nodes", node_id, ["alive"])["alive"] for node_id in node_ids] == [True, False, False, False]
+    assert simple.terminate(TerminationOperation(terminator_id=node_ids[3], node_id=node_ids[3])) is None
+
+def test_only_the_last_node_context_is_read(swarm_id, db, monkeypatch):
+    node_ids = _create_chain(db, swarm_id, ["confirm_directive_completion", "simple", "simple", "simple"])
+    reads = []
+    read = db.read
+    def recording_read(category, key, fields=None):
+        reads.append((key, fields))
+        return read(category, key, fields)
+    monkeypatch.setattr(db, "read", recording_read)
+
+    simple.terminate(TerminationOperation(terminator_id=node_ids[3], node_id=node_ids[3]))
+
+    assert [key for key, fields in reads if fields is None or "context" in fields] == [node_ids[1]]
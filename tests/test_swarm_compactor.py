@@ -0,0 +1,77 @@
+import pytest
+
+from swarmstar.models import BlockingOperation, SwarmCompactor, SwarmNode, SwarmOperation
+from swarmstar.models.swarm.swarm_compactor import ARCHIVE_CATEGORY, COMPACTION_CATEGORY
+
+TREE = {0: None, 1: 0, 2: 0, 3: 1, 4: 1, 5: 2} # {index: parent index}
+
+@pytest.fixture
+def tree(swarm_id, db):
+    """ Six nodes with working state, and a blocking operation on n3. Returns the operation id. """
+    node_ids = {index: f"{swarm_id}_n{index}" for index in TREE}
+    db.batch_create("swarm_nodes", {
+        node_ids[index]: SwarmNode(
+            id=node_ids[index], name="node", type="action", message="task", alive=True,
+            parent_id=None if parent is None else node_ids[parent],
+            children_ids=[node_ids[child] for child, child_parent in TREE.items() if child_parent == index],
+            execution_memory={"step": 1}, context={"key": "value"}, developer_logs=[{"role": "ai", "content": "log"}]
+        ).model_dump()
+        for index, parent in TREE.items()
+    })
+    db.update("admin", swarm_id, {"node_count": len(TREE)})
+    operation = BlockingOperation(
+        node_id=node_ids[3], blocking_type="openai_completion", args={"message": "prompt"}, next_function_to_call="next"
+    )
+    SwarmOperation.create(operation)
+    return operation.id
+
+def _documents(db, swarm_id, operation_id):
+    documents = {key: db.read("swarm_nodes", key) for key in (f"{swarm_id}_n{index}" for index in TREE)}
+    documents[operation_id] = db.read("swarm_operations", operation_id)
+    return documents
+
+@pytest.mark.parametrize("archive", [False, True])
+def test_compacting_again_changes_nothing(swarm_id, db, tree, archive):
+    SwarmNode.kill([f"{swarm_id}_n3", f"{swarm_id}_n4"])
+    SwarmNode.kill(f"{swarm_id}_n1")
+
+    compacted = SwarmCompactor.compact(swarm_id, grace_period=0, archive=archive)
+    assert sorted(compacted) == sorted(f"{swarm_id}_n{index}" for index in (1, 3, 4))
+    documents = _documents(db, swarm_id, tree)
+    archived = db.batch_read(ARCHIVE_CATEGORY, compacted) if archive else {}
+
+    assert SwarmCompactor.compact(swarm_id, grace_period=0, archive=archive) == []
+    assert _documents(db, swarm_id, tree) == documents
+    if archive:
+        assert db.batch_read(ARCHIVE_CATEGORY, compacted) == archived
+        assert archived[f"{swarm_id}_n3"]["node"]["context"] == {"key": "value"}
+        assert archived[f"{swarm_id}_n3"]["operations"][tree]["args"] == {"message": "prompt"}
+
+def test_walking_the_tree_again_skips_compacted_nodes(swarm_id, db, tree):
+    SwarmNode.kill([f"{swarm_id}_n3", f"{swarm_id}_n4"])
+    SwarmNode.kill(f"{swarm_id}_n1")
+    SwarmCompactor.compact(swarm_id, grace_period=0)
+    documents = _documents(db, swarm_id, tree)
+
+    # Without its saved state the next pass starts over from the whole tree
+    db.delete(COMPACTION_CATEGORY, swarm_id)
+
+    assert SwarmCompactor.compact(swarm_id, grace_period=0) == []
+    assert _documents(db, swarm_id, tree) == documents
+
+def test_later_passes_only_compact_what_died_since(swarm_id, db, tree):
+    assert SwarmCompactor.compact(swarm_id, grace_period=0) == []
+
+    SwarmNode.kill([f"{swarm_id}_n5", f"{swarm_id}_n2"])
+    assert sorted(SwarmCompactor.compact(swarm_id, grace_period=0)) == [f"{swarm_id}_n2", f"{swarm_id}_n5"]
+    assert SwarmCompactor.compact(swarm_id, grace_period=0) == []
+
+    node = db.read("swarm_nodes", f"{swarm_id}_n5")
+    assert (node["execution_memory"], node["context"], node["developer_logs"]) == ({}, {}, [])
+    assert node["message"] == "task"
+
+def test_grace_period_holds_compaction_back(swarm_id, db, tree):
+    SwarmNode.kill([f"{swarm_id}_n5", f"{swarm_id}_n2"])
+
+    assert SwarmCompactor.compact(swarm_id, grace_period=3600) == []
+    assert sorted(SwarmCompactor.compact(swarm_id, grace_period=0)) == [f"{swarm_id}_n2", f"{swarm_id}_n5"]
@@ -0,0 +1,85 @@
+import json
+import random
+
+import pytest
+
+from swarmstar.models import SwarmHistory
+from swarmstar.models.swarm import swarm_history
+from swarmstar.utils.misc.serialization import json_default
+
+@pytest.fixture
+def small_snapshots(monkeypatch):
+    monkeypatch.setattr(swarm_history, "SNAPSHOT_INTERVAL", 10)
+
+def _normalized(state):
+    return json.loads(json.dumps(state, default=json_default, sort_keys=True))
+
+def _live_state(db, created):
+    """ The swarm's nodes and operations as the database holds them now. """
+    state = {}
+    for collection, keys in created.items():
+        existing = [key for key in keys if db.exists(collection, key)]
+        documents = db.batch_read(collection, existing) if existing else {}
+        # History documents are keyed by id and don't repeat it
+        state[collection] = {
+            key: {field: value for field, value in document.items() if field != "id"}
+            for key, document in documents.items()
+        }
+    return _normalized(state)
+
+def _history_state(state):
+    return _normalized({collection: state.get(collection, {}) for collection in ("swarm_nodes", "swarm_operations")})
+
+def test_seek_rebuilds_the_live_state_after_every_event(swarm_id, db, small_snapshots):
+    created = {"swarm_nodes": [], "swarm_operations": []}
+    states = {db.mutation_cursor(swarm_id): _live_state(db, created)}
+    rng = random.Random(48)
+
+    def record():
+        states[db.mutation_cursor(swarm_id)] = _live_state(db, created)
+
+    for index in range(30):
+        node_id = f"{swarm_id}_n{index}"
+        db.create("swarm_nodes", node_id, {"name": "node", "children_ids": [], "alive": True, "stats": {"spawned": 0}})
+        created["swarm_nodes"].append(node_id)
+        record()
+        alive_ids = [key for key in created["swarm_nodes"] if db.exists("swarm_nodes", key)]
+        parent_id = rng.choice(alive_ids)
+        db.append_to_array("swarm_nodes", parent_id, "children_ids", node_id)
+        record()
+        db.atomic_write([
+            {"type": "increment", "category": "swarm_nodes", "key": parent_id, "amounts": {"stats.spawned": 1}},
+            {"type": "update", "category": "swarm_nodes", "key": node_id, "updated_fields": {"message": f"task {index}"}},
+        ])
+        record()
+        operation_id = f"{swarm_id}_o{index}"
+        db.create("swarm_operations", operation_id, {"operation_type": "spawn", "node_id": node_id})
+        created["swarm_operations"].append(operation_id)
+        record()
+        if index % 4 == 3 and db.read("swarm_nodes", parent_id, ["children_ids"])["children_ids"]:
+            db.pop_array("swarm_nodes", parent_id, "children_ids", rng.choice([0, -1]))
+            record()
+        if index % 5 == 4:
+            db.pop_field("swarm_nodes", node_id, "message")
+            record()
+        if index % 6 == 5:
+            db.delete("swarm_operations", rng.choice(created["swarm_operations"][:-1]))
+            record()
+
+    history = SwarmHistory(swarm_id)
+    cursors = sorted(states)
+    for cursor in [*cursors, *reversed(cursors), *rng.choices(cursors, k=50)]:
+        assert _history_state(history.seek(cursor)) == states[cursor], cursor
+
+def test_snapshots_are_used_by_a_fresh_history(swarm_id, db, small_snapshots):
+    for index in range(25):
+        db.create("swarm_nodes", f"{swarm_id}_n{index}", {"name": "node", "children_ids": []})
+    latest = db.mutation_cursor(swarm_id)
+    expected = _history_state(SwarmHistory(swarm_id).seek(latest))
+    assert db.read(swarm_history.SNAPSHOT_CATEGORY, f"{swarm_id}_index")["snapshots"]
+
+    assert _history_state(SwarmHistory(swarm_id).seek(latest)) == expected
+
+def test_seek_past_the_latest_event_fails(swarm_id, db):
+    with pytest.raises(ValueError):
+        SwarmHistory(swarm_id).seek(db.mutation_cursor(swarm_id) + 1)
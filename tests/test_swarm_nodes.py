@@ -0,0 +1,59 @@
+import pytest
+
+from swarmstar.models import SwarmNode
+from swarmstar.models.base_action import BaseAction
+
+def _create_node(swarm_id: str, index: int, **fields) -> SwarmNode:
+    node = SwarmNode(id=f"{swarm_id}_n{index}", name="node", type="test", message="test", **fields)
+    node.create()
+    return node
+
+def _attach_child(db, parent_id: str, child_id: str) -> None:
+    db.atomic_write([
+        {"type": "append_to_array", "category": "swarm_nodes", "key": parent_id, "field": "children_ids", "value": child_id},
+        {"type": "increment", "category": "swarm_nodes", "key": parent_id, "amounts": {"alive_children_count": 1}},
+    ])
+
+def test_stale_log_keeps_children_and_counters(db, swarm_id):
+    _create_node(swarm_id, 0)
+    stale = SwarmNode.read(f"{swarm_id}_n0")
+    _attach_child(db, stale.id, f"{swarm_id}_n1")
+
+    assert stale.log({"role": "ai", "content": "first"}) == [0]
+    assert stale.log({"role": "ai", "content": "nested"}, [1]) == [1, 0]
+
+    node = SwarmNode.read(stale.id)
+    assert node.children_ids == [f"{swarm_id}_n1"]
+    assert node.alive_children_count == 1
+    assert [log["content"] for log in node.developer_logs[:1]] == ["first"]
+    assert node.developer_logs[1][0]["content"] == "nested"
+
+def test_stale_log_sees_logs_written_since(swarm_id):
+    _create_node(swarm_id, 0)
+    first, second = SwarmNode.read(f"{swarm_id}_n0"), SwarmNode.read(f"{swarm_id}_n0")
+    first.log({"role": "ai", "content": "a"})
+    assert second.log({"role": "ai", "content": "b"}) == [1]
+    assert [log["content"] for log in SwarmNode.read(first.id).developer_logs] == ["a", "b"]
+
+class _Action(BaseAction):
+    def main(self):
+        pass
+
+@pytest.mark.parametrize("helper, kwargs, field, expected", [
+    ("report", {"report": "done"}, "report", "done"),
+    ("update_termination_policy", {"termination_policy": "confirm_directive_completion"}, "termination_policy", "confirm_directive_completion"),
+    ("add_value_to_execution_memory", {"attribute": "key", "value": 1}, "execution_memory", {"key": 1}),
+    ("replace_execution_memory", {"execution_memory": {"other": 2}}, "execution_memory", {"other": 2}),
+    ("clear_execution_memory", {}, "execution_memory", {}),
+])
+def test_action_helpers_write_only_their_fields(db, swarm_id, helper, kwargs, field, expected):
+    _create_node(swarm_id, 0)
+    action = _Action(SwarmNode.read(f"{swarm_id}_n0"))
+    _attach_child(db, action.node.id, f"{swarm_id}_n1")
+
+    getattr(action, helper)(**kwargs)
+
+    node = db.read("swarm_nodes", action.node.id)
+    assert node[field] == expected
+    assert node["children_ids"] == [f"{swarm_id}_n1"]
+    assert node["alive_children_count"] == 1
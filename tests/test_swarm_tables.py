@@ -0,0 +1,31 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq
+
+from swarmstar.models import SwarmTables
+
+def test_logs_keep_token_usage_and_latency(swarm_id, db, tmp_path):
+    db.create("swarm_nodes", f"{swarm_id}_n0", {
+        "parent_id": None,
+        "children_ids": [],
+        "type": "action",
+        "name": "root",
+        "alive": True,
+        "developer_logs": [
+            {"role": "swarmstar", "content": "question", "timestamp": 1.0},
+            {
+                "role": "ai", "content": "answer", "timestamp": 2.0,
+                "prompt_tokens": 12, "completion_tokens": 3, "latency": 0.5
+            },
+        ],
+    })
+
+    paths = SwarmTables.export([swarm_id], str(tmp_path))
+    logs = pq.read_table(paths["logs"])
+
+    assert logs.schema.field("prompt_tokens").type == pa.int32()
+    assert logs.schema.field("latency").type == pa.float64()
+    assert logs.column("prompt_tokens").to_pylist() == [None, 12]
+    assert logs.column("completion_tokens").to_pylist() == [None, 3]
+    assert logs.column("latency").to_pylist() == [None, 0.5]